@@ -83,6 +83,8 @@ class Renderer(object):
         )
         self._card_origins = None
         self._card_bboxs = None
+        self._card_bvh = card_bvh_lib.CardBVH.from_card_buffer(self._cards)
+        self._cards_dirty = True
 
         glClearColor(0.5, 0.5, 0.5, 0.0)
         glEnable(GL_DEPTH_TEST)
@@ -102,29 +104,28 @@ class Renderer(object):
         # Draw stencil-depth HiZ
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
-        new_origin, new_bboxs = card_bvh_lib.generate_compact_cards(self._cards)
+        if self._cards_dirty:
+            new_origin, new_bboxs = card_bvh_lib.generate_compact_cards(self._cards)
 
-        if self._card_origins is not None:
-            ptr = ctypes.c_int()
-            ptr.value = self._card_origins
-            glDeleteTextures(1, ptr)
+            if self._card_origins is not None:
+                ptr = ctypes.c_int()
+                ptr.value = self._card_origins
+                glDeleteTextures(1, ptr)
 
-        if self._card_bboxs is not None:
-            ptr = ctypes.c_int()
-            ptr.value = self._card_bboxs
-            glDeleteTextures(1, ptr)
+            if self._card_bboxs is not None:
+                ptr = ctypes.c_int()
+                ptr.value = self._card_bboxs
+                glDeleteTextures(1, ptr)
 
-        self._card_origins = new_origin
-        self._card_bboxs = new_bboxs
+            self._card_origins = new_origin
+            self._card_bboxs = new_bboxs
+            self._cards_dirty = False
 
 
         if False:
             # Does this work??!!
             # Be impressive if it does first try
-            # Very very slow thou (atleast on python)
-            bvh, debug_bboxes = card_bvh_lib.generate_bvh_python(
-                self._cards
-            )
+            debug_bboxes = self._card_bvh.debug_bboxes
 
 
             debug_bbox_texture = ctypes.c_int()
@@ -164,6 +165,18 @@ class Renderer(object):
 
         wnd.redraw()        
 
+    def update_cards(self, changed=None):
+        """Call after editing self._cards.data, refits the BVH (or rebuilds
+        it if it has degraded too much).
+
+        Args:
+            changed (iterable[int]): Indices of the cards which changed,
+                None if they all may have.
+        """
+        self._cards.upload(changed)
+        self._card_bvh.refit_from_card_buffer(self._cards, changed)
+        self._cards_dirty = True
+
     def _resize(self, wnd, width, height):
         self.dirty_base()
         glViewport(0, 0, width, height)
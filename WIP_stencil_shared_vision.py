@@ -9,6 +9,7 @@ from OpenGL.GL.EXT import texture_compression_s3tc
 
 import viewport
 import perf_overlay_lib
+import bcn_lib
 
 
 _DEBUGGING = False
@@ -187,29 +188,30 @@ void main()
 
 
 
+# BC1 3 colour mode palette, black and white endpoints
+_BW_BC1_COLOURS = numpy.array([
+    [0, 0, 0, 255],
+    [255, 255, 255, 255],
+    [128, 128, 128, 255],
+    [0, 0, 0, 0],
+], dtype=numpy.uint8)
+
+
 def generate_bw_bc1_block(
         a, b, c, d,
         e, f, g, h,
         i, j, k, l,
         m, n, o, p):
-    # value = [0, 3] 0 = black, 3 = white
+    # value = [0, 3] 0 = black, 1 = white, 2 = grey, 3 = transparent
     # https://docs.microsoft.com/en-us/windows/win32/direct3d10/d3d10-graphics-programming-guide-resources-block-compression
     # https://www.khronos.org/opengl/wiki/S3_Texture_Compression#:~:text=A%20DXT1%2Dcompressed%20image%20is,internal%20format%20of%20the%20image.
-    bits = 0
-    for x in (
-            d, c, b, a,
-            h, g, f, e,
-            l, k, j, i,
-            p, o, n, m
-    ):
-        bits <<= 2
-        bits |= x
-
-    return numpy.array([
-        0xffff0000,    # colour 1, 2
-        # bits,
-        bits
-    ], dtype=numpy.uint32)
+    # Rows are stored bottom up, as GL expects
+    return _BW_BC1_COLOURS[numpy.array([
+        [m, n, o, p],
+        [i, j, k, l],
+        [e, f, g, h],
+        [a, b, c, d],
+    ])]
 
 
 def generate_fog_of_war_texture():
@@ -317,7 +319,8 @@ def generate_fog_of_war_texture():
         W, W, W, W,
         W, W, W, W,
     )
-    return numpy.concatenate((
+    # Stacked as a 4x64 image, so each mask is a block of the output
+    masks = numpy.concatenate((
         m0000,
         m0001,
         m0010,
@@ -334,7 +337,8 @@ def generate_fog_of_war_texture():
         m1101,
         m1110,
         m1111,
-    )).tobytes()
+    ))
+    return bcn_lib.encode_bc1(masks, bcn_lib.QUALITY_HIGH, processes=0)
 
 
 
@@ -199,6 +199,7 @@ class Renderer(object):
                 udim_vt_lib.Image(r"C:\Users\thoth\Desktop\im2.png")
             ),
         ])
+        self._udim_ind_data = udim_ind_data
 
         self.udim_offset = (
             udim_ind_data.udim_offset[0],
@@ -326,7 +327,11 @@ class Renderer(object):
                     8 * count,
                     tiles_data_ptr
                 )
-                uniq_tiles = set(tiles_data_ptr)
+                uniq_tiles = udim_vt_lib.decode_feedback(
+                    numpy.frombuffer(tiles_data_ptr, dtype=numpy.uint64),
+                    self._udim_ind_data.udim_info_start,
+                    self._udim_ind_data.udim_info
+                )
                 if self.UNIQUE_TMP != len(uniq_tiles):
                     print("uniq: ", len(uniq_tiles))
                     self.UNIQUE_TMP = len(uniq_tiles)
@@ -0,0 +1,38 @@
+from .bc4 import (
+    encode_bc4,
+    encode_bc5,
+    encode_bc4_blocks,
+    decode_bc4,
+    decode_bc5,
+    image_to_blocks,
+    blocks_to_image,
+    psnr,
+    QUALITY_FAST,
+    QUALITY_NORMAL,
+    QUALITY_HIGH,
+)
+from .bc1 import (
+    encode_bc1,
+    encode_bc3,
+    encode_bc1_blocks,
+    encode_bc3_blocks,
+    decode_bc1,
+    decode_bc3,
+)
+from .dds import (
+    write_blocks,
+    read_dds,
+    make_dds_header,
+    get_compressed_size,
+    FORMAT_BC1,
+    FORMAT_BC3,
+    FORMAT_BC4,
+    FORMAT_BC5,
+)
+from .texture_cache import (
+    compress_texture,
+    compress_texture_cached,
+    hash_pixels,
+    get_texture_cache_dir,
+    get_texture_cache_path,
+)
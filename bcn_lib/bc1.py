@@ -0,0 +1,381 @@
+"""
+BC1/BC3 encoding on the CPU
+---------------------------
+
+Colour endpoints start out as the ends of the block's principal axis
+(found by power iteration on the colour covariance), then get refined by
+least squares, re-fitting the endpoints to the palette indices picked:
+
+    QUALITY_FAST    principal axis only, 4 colour mode only.
+    QUALITY_NORMAL  2 refinements, also trying the 3 colour mode.
+    QUALITY_HIGH    8 refinements, also trying the 3 colour mode.
+
+BC1 blocks with any alpha below 128 use the 3 colour mode with index 3
+as transparent. BC3 is a BC4 block of the alpha followed by a BC1 block
+which is always decoded in the 4 colour mode.
+"""
+from functools import partial
+
+import numpy
+
+from .bc4 import (
+    image_to_blocks,
+    blocks_to_image,
+    encode_bc4_blocks,
+    decode_bc4_blocks,
+    map_blocks,
+    BC4_BLOCK_BYTES,
+    DEFAULT_CHUNK_BLOCKS,
+    DEFAULT_SHARD_BLOCKS,
+    QUALITY_FAST,
+    QUALITY_NORMAL,
+    QUALITY_HIGH,
+)
+
+
+BC1_BLOCK_BYTES = 8
+BC3_BLOCK_BYTES = 16
+
+_REFINE_ITERATIONS = {
+    QUALITY_FAST: 0,
+    QUALITY_NORMAL: 2,
+    QUALITY_HIGH: 8,
+}
+
+_POWER_ITERATIONS = 8
+
+# Weight of endpoint 0 for each palette index
+_WEIGHTS4 = numpy.array([1.0, 0.0, 2.0 / 3.0, 1.0 / 3.0], dtype=numpy.float32)
+_WEIGHTS3 = numpy.array([1.0, 0.0, 0.5], dtype=numpy.float32)
+
+
+def _principal_endpoints(colors, weights):
+    """Get the ends of the weighted colours' principal axis.
+
+    Args:
+        colors (numpy.ndarray): (count, 16, 3) float32 colours.
+        weights (numpy.ndarray): (count, 16) float32 pixel weights.
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray): (count, 3) endpoints.
+    """
+    total = numpy.maximum(weights.sum(axis=1), 1.0)[:, None]
+    mean = (colors * weights[:, :, None]).sum(axis=1) / total
+    centered = (colors - mean[:, None]) * weights[:, :, None]
+    covariance = numpy.einsum("nki,nkj->nij", centered, centered)
+
+    axis = numpy.ones_like(mean)
+    for _ in range(_POWER_ITERATIONS):
+        axis = numpy.einsum("nij,nj->ni", covariance, axis)
+        length = numpy.linalg.norm(axis, axis=1, keepdims=True)
+        axis = numpy.where(length > 1e-6, axis / numpy.maximum(length, 1e-6), 1.0 / numpy.sqrt(3.0))
+
+    # Only opaque pixels count for the extents
+    projected = numpy.einsum("nki,ni->nk", centered, axis)
+    hi = numpy.where(weights > 0, projected, -numpy.inf).max(axis=1)
+    lo = numpy.where(weights > 0, projected, numpy.inf).min(axis=1)
+    hi = numpy.where(numpy.isfinite(hi), hi, 0.0)[:, None]
+    lo = numpy.where(numpy.isfinite(lo), lo, 0.0)[:, None]
+    return mean + axis * hi, mean + axis * lo
+
+
+def _to_565(colors):
+    """Quantize (count, 3) colours.
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray): uint16 codes and the float32
+            colours they expand to.
+    """
+    colors = numpy.clip(colors, 0.0, 255.0)
+    red = numpy.rint(colors[:, 0] * (31.0 / 255.0)).astype(numpy.uint16)
+    green = numpy.rint(colors[:, 1] * (63.0 / 255.0)).astype(numpy.uint16)
+    blue = numpy.rint(colors[:, 2] * (31.0 / 255.0)).astype(numpy.uint16)
+    codes = (red << 11) | (green << 5) | blue
+    return codes, _expand_565(codes)
+
+
+def _expand_565(codes):
+    codes = codes.astype(numpy.uint16)
+    red = (codes >> 11) & 0x1f
+    green = (codes >> 5) & 0x3f
+    blue = codes & 0x1f
+    return numpy.stack(
+        ((red << 3) | (red >> 2), (green << 2) | (green >> 4), (blue << 3) | (blue >> 2)),
+        axis=1
+    ).astype(numpy.float32)
+
+
+def _palette(color0, color1, weights):
+    """Get the (count, len(weights), 3) palette of endpoints."""
+    weights = weights[None, :, None]
+    return color0[:, None] * weights + color1[:, None] * (1.0 - weights)
+
+
+def _assign(colors, opaque, palette):
+    """Pick the nearest palette entry of every pixel.
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray): (count, 16) indices and
+            (count,) squared errors over opaque pixels.
+    """
+    distances = colors[:, :, None, :] - palette[:, None, :, :]
+    distances = (distances * distances).sum(axis=3)
+    indices = numpy.argmin(distances, axis=2)
+    error = numpy.take_along_axis(distances, indices[:, :, None], axis=2)[:, :, 0]
+    return indices, (error * opaque).sum(axis=1)
+
+
+def _least_squares(colors, opaque, indices, weights, color0, color1):
+    """Re-fit endpoints to the picked palette indices, keeping the old
+    endpoints where the fit is degenerate."""
+    alpha = weights[indices] * opaque
+    beta = (1.0 - weights[indices]) * opaque
+    aa = (alpha * alpha).sum(axis=1)
+    bb = (beta * beta).sum(axis=1)
+    ab = (alpha * beta).sum(axis=1)
+    ac = (alpha[:, :, None] * colors).sum(axis=1)
+    bc = (beta[:, :, None] * colors).sum(axis=1)
+    det = aa * bb - ab * ab
+    valid = (numpy.abs(det) > 1e-6)[:, None]
+    det = numpy.where(valid[:, 0], det, 1.0)[:, None]
+    new0 = (ac * bb[:, None] - bc * ab[:, None]) / det
+    new1 = (bc * aa[:, None] - ac * ab[:, None]) / det
+    return numpy.where(valid, new0, color0), numpy.where(valid, new1, color1)
+
+
+def _pack_color_blocks(code0, code1, indices):
+    shifts = numpy.arange(16, dtype=numpy.uint64) * numpy.uint64(2) + numpy.uint64(32)
+    packed = (
+        code0.astype(numpy.uint64)
+        | (code1.astype(numpy.uint64) << numpy.uint64(16))
+        | numpy.bitwise_or.reduce(indices.astype(numpy.uint64) << shifts, axis=1)
+    )
+    return packed.astype("<u8").view(numpy.uint8).reshape((-1, BC1_BLOCK_BYTES))
+
+
+def _encode_color_blocks(blocks, quality, allow_alpha):
+    """Encode (count, 16, 4) uint8 blocks as BC1 colour blocks.
+
+    Args:
+        blocks (numpy.ndarray): RGBA blocks.
+        quality (int): Quality level.
+        allow_alpha (bool): Use the 3 colour mode's transparent index for
+            pixels with alpha < 128, False for BC3 where the colour block
+            is always decoded in the 4 colour mode.
+
+    Returns:
+        numpy.ndarray: (count, 8) uint8 blocks.
+    """
+    colors = blocks[:, :, :3].astype(numpy.float32)
+    if allow_alpha:
+        transparent = blocks[:, :, 3] < 128
+    else:
+        transparent = numpy.zeros(blocks.shape[:2], dtype=bool)
+    opaque = (~transparent).astype(numpy.float32)
+    needs3 = transparent.any(axis=1)
+    try3 = allow_alpha and quality >= QUALITY_NORMAL
+
+    color0, color1 = _principal_endpoints(colors, opaque)
+
+    count = len(blocks)
+    best_error = numpy.full(count, numpy.inf, dtype=numpy.float32)
+    best_code0 = numpy.zeros(count, dtype=numpy.uint16)
+    best_code1 = numpy.zeros(count, dtype=numpy.uint16)
+    best_indices = numpy.zeros((count, 16), dtype=numpy.int64)
+    best_mode3 = numpy.zeros(count, dtype=bool)
+
+    for iteration in range(_REFINE_ITERATIONS[quality] + 1):
+        code0, expanded0 = _to_565(color0)
+        code1, expanded1 = _to_565(color1)
+
+        modes = []
+        if not needs3.all():
+            indices, error = _assign(colors, opaque, _palette(expanded0, expanded1, _WEIGHTS4))
+            modes.append((False, indices, numpy.where(needs3, numpy.inf, error)))
+        if try3 or needs3.any():
+            indices, error = _assign(colors, opaque, _palette(expanded0, expanded1, _WEIGHTS3))
+            indices = numpy.where(transparent, 3, indices)
+            if not try3:
+                error = numpy.where(needs3, error, numpy.inf)
+            modes.append((True, indices, error))
+
+        for mode3, indices, error in modes:
+            better = error < best_error
+            best_error = numpy.where(better, error, best_error)
+            best_code0 = numpy.where(better, code0, best_code0)
+            best_code1 = numpy.where(better, code1, best_code1)
+            best_indices = numpy.where(better[:, None], indices, best_indices)
+            best_mode3 = numpy.where(better, mode3, best_mode3)
+
+        if iteration < _REFINE_ITERATIONS[quality]:
+            color0, color1 = _refit(colors, opaque, best_indices, best_mode3, color0, color1)
+
+    return _finalize_color_blocks(best_code0, best_code1, best_indices, best_mode3)
+
+
+def _refit(colors, opaque, indices, mode3, color0, color1):
+    """Least squares refit for blocks in either mode."""
+    fit4 = _least_squares(colors, opaque, indices, _WEIGHTS4, color0, color1)
+    # Transparent pixels have no weight, so their index 3 doesn't matter
+    fit3 = _least_squares(
+        colors, opaque, numpy.minimum(indices, 2), _WEIGHTS3, color0, color1
+    )
+    mode3 = mode3[:, None]
+    return (
+        numpy.where(mode3, fit3[0], fit4[0]),
+        numpy.where(mode3, fit3[1], fit4[1])
+    )
+
+
+def _finalize_color_blocks(code0, code1, indices, mode3):
+    """Order endpoints for the mode used (4 colour needs code0 > code1,
+    3 colour code0 <= code1) and remap indices to match."""
+    indices = indices.copy()
+
+    # 4 colour with equal endpoints decodes as 3 colour, every entry but
+    # the transparent one is the same colour anyway
+    equal = (code0 == code1) & ~mode3
+    indices[equal] = 0
+
+    swap4 = ~mode3 & (code0 < code1)
+    swap3 = mode3 & (code0 > code1)
+    swap = swap4 | swap3
+    remap4 = numpy.array([1, 0, 3, 2])
+    remap3 = numpy.array([1, 0, 2, 3])
+    indices = numpy.where(swap4[:, None], remap4[indices], indices)
+    indices = numpy.where(swap3[:, None], remap3[indices], indices)
+    code0, code1 = numpy.where(swap, code1, code0), numpy.where(swap, code0, code1)
+    return _pack_color_blocks(code0, code1, indices)
+
+
+def encode_bc1_blocks(blocks, quality=QUALITY_NORMAL, chunk_blocks=DEFAULT_CHUNK_BLOCKS):
+    """Encode (count, 16, 4) uint8 RGBA blocks as BC1 in this process.
+
+    Returns:
+        numpy.ndarray: (count, 8) uint8 BC1 blocks.
+    """
+    blocks = numpy.asarray(blocks, dtype=numpy.uint8)
+    out = numpy.empty((len(blocks), BC1_BLOCK_BYTES), dtype=numpy.uint8)
+    for start in range(0, len(blocks), chunk_blocks):
+        out[start:start + chunk_blocks] = _encode_color_blocks(
+            blocks[start:start + chunk_blocks], quality, True
+        )
+    return out
+
+
+def encode_bc3_blocks(blocks, quality=QUALITY_NORMAL, chunk_blocks=DEFAULT_CHUNK_BLOCKS):
+    """Encode (count, 16, 4) uint8 RGBA blocks as BC3 in this process.
+
+    Returns:
+        numpy.ndarray: (count, 16) uint8 BC3 blocks.
+    """
+    blocks = numpy.asarray(blocks, dtype=numpy.uint8)
+    out = numpy.empty((len(blocks), BC3_BLOCK_BYTES), dtype=numpy.uint8)
+    for start in range(0, len(blocks), chunk_blocks):
+        chunk = blocks[start:start + chunk_blocks]
+        out[start:start + chunk_blocks, :BC4_BLOCK_BYTES] = encode_bc4_blocks(
+            chunk[:, :, 3], quality, chunk_blocks
+        )
+        out[start:start + chunk_blocks, BC4_BLOCK_BYTES:] = _encode_color_blocks(
+            chunk, quality, False
+        )
+    return out
+
+
+def _to_rgba(pixels):
+    """Pad greyscale / RGB arrays out to RGBA8 with opaque alpha."""
+    pixels = numpy.asarray(pixels, dtype=numpy.uint8)
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, None]
+    channels = pixels.shape[2]
+    if channels == 4:
+        return pixels
+    rgba = numpy.empty(pixels.shape[:2] + (4,), dtype=numpy.uint8)
+    rgba[:, :, :3] = pixels[:, :, :3] if channels >= 3 else pixels[:, :, :1]
+    rgba[:, :, 3] = pixels[:, :, 3] if channels > 3 else 0xff
+    return rgba
+
+
+def encode_bc1(pixels, quality=QUALITY_NORMAL, processes=None, shard_blocks=DEFAULT_SHARD_BLOCKS):
+    """Encode an image as BC1 (alpha below 128 becomes transparent).
+
+    Args:
+        pixels (numpy.ndarray): (height, width, 4) uint8 RGBA, greyscale
+            or RGB is padded with opaque alpha.
+        quality (int): QUALITY_FAST, QUALITY_NORMAL or QUALITY_HIGH.
+        processes (int): Worker processes, None for one per CPU, 0 to
+            encode in this process.
+        shard_blocks (int): Blocks handed to a worker at a time.
+
+    Returns:
+        bytes: BC1 blocks in row major order.
+    """
+    blocks = image_to_blocks(_to_rgba(pixels))
+    return map_blocks(
+        partial(encode_bc1_blocks, quality=quality), blocks, processes, shard_blocks
+    ).tobytes()
+
+
+def encode_bc3(pixels, quality=QUALITY_NORMAL, processes=None, shard_blocks=DEFAULT_SHARD_BLOCKS):
+    """Encode an image as BC3.
+
+    Args:
+        pixels (numpy.ndarray): (height, width, 4) uint8 RGBA, greyscale
+            or RGB is padded with opaque alpha.
+        quality (int): QUALITY_FAST, QUALITY_NORMAL or QUALITY_HIGH.
+        processes (int): Worker processes, None for one per CPU, 0 to
+            encode in this process.
+        shard_blocks (int): Blocks handed to a worker at a time.
+
+    Returns:
+        bytes: BC3 blocks in row major order.
+    """
+    blocks = image_to_blocks(_to_rgba(pixels))
+    return map_blocks(
+        partial(encode_bc3_blocks, quality=quality), blocks, processes, shard_blocks
+    ).tobytes()
+
+
+def _decode_color_blocks(data, force4):
+    packed = numpy.frombuffer(bytes(data), dtype="<u8").astype(numpy.uint64)
+    code0 = (packed & numpy.uint64(0xffff)).astype(numpy.uint16)
+    code1 = ((packed >> numpy.uint64(16)) & numpy.uint64(0xffff)).astype(numpy.uint16)
+    color0 = _expand_565(code0)
+    color1 = _expand_565(code1)
+
+    palette4 = _palette(color0, color1, _WEIGHTS4)
+    palette3 = numpy.concatenate(
+        (_palette(color0, color1, _WEIGHTS3), numpy.zeros((len(packed), 1, 3), dtype=numpy.float32)),
+        axis=1
+    )
+    mode4 = (code0 > code1) | force4
+    palette = numpy.where(mode4[:, None, None], palette4, palette3)
+    alpha = numpy.full((len(packed), 4), 255.0, dtype=numpy.float32)
+    alpha[:, 3] = numpy.where(mode4, 255.0, 0.0)
+    palette = numpy.concatenate((palette, alpha[:, :, None]), axis=2)
+
+    shifts = numpy.arange(16, dtype=numpy.uint64) * numpy.uint64(2) + numpy.uint64(32)
+    indices = ((packed[:, None] >> shifts) & numpy.uint64(3)).astype(numpy.intp)
+    values = numpy.take_along_axis(palette, indices[:, :, None], axis=1)
+    return numpy.rint(values).astype(numpy.uint8)
+
+
+def decode_bc1(data, width, height):
+    """Decode a BC1 image.
+
+    Returns:
+        numpy.ndarray: (height, width, 4) uint8 RGBA.
+    """
+    return blocks_to_image(_decode_color_blocks(data, False), width, height)
+
+
+def decode_bc3(data, width, height):
+    """Decode a BC3 image.
+
+    Returns:
+        numpy.ndarray: (height, width, 4) uint8 RGBA.
+    """
+    blocks = numpy.frombuffer(bytes(data), dtype=numpy.uint8).reshape((-1, BC3_BLOCK_BYTES))
+    values = _decode_color_blocks(blocks[:, BC4_BLOCK_BYTES:].tobytes(), True)
+    values[:, :, 3] = decode_bc4_blocks(blocks[:, :BC4_BLOCK_BYTES].tobytes())
+    return blocks_to_image(values, width, height)
@@ -0,0 +1,367 @@
+"""
+BC4/BC5 encoding on the CPU
+---------------------------
+
+Same exhaustive search brute_force_bc4.py does on the GPU:
+
+    Every endpoint pair lo < hi is tried in both BC4 modes, the 8 value
+    mode (red0 > red1, 6 interpolated values) and the 6 value mode
+    (red0 <= red1, 4 interpolated values plus 0 and 255), and the pair and
+    mode with the smallest squared error wins.
+
+    Values are quantized by projecting onto the evenly spaced palette, the
+    error of each of the 256 values for every pair and mode is tabulated
+    once, so a block's error for all 2 * 32640 candidates is just the sum
+    of 16 table rows, which is done for many blocks at once as
+    (blocks, candidates) arrays.
+
+
+BC5 is just two BC4 blocks (red then green) per 4x4 block.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy
+
+
+BLOCK_SIZE = 4
+BC4_BLOCK_BYTES = 8
+BC5_BLOCK_BYTES = 16
+
+# Blocks evaluated at once, each one needs a 255KB row of errors
+DEFAULT_CHUNK_BLOCKS = 64
+
+# Blocks sent to a worker process at a time
+DEFAULT_SHARD_BLOCKS = 256
+
+# Quality levels the encoders share, BC4 only searches exhaustively at
+# QUALITY_HIGH and otherwise uses the block's min and max as endpoints
+QUALITY_FAST = 0
+QUALITY_NORMAL = 1
+QUALITY_HIGH = 2
+
+
+def _get_candidate_pairs():
+    lo, hi = numpy.triu_indices(256, k=1)
+    return lo.astype(numpy.float32), hi.astype(numpy.float32)
+
+
+_CANDIDATE_LO, _CANDIDATE_HI = _get_candidate_pairs()
+
+
+def image_to_blocks(pixels):
+    """Split an image into 4x4 blocks, edge padding if needed.
+
+    Args:
+        pixels (numpy.ndarray): (height, width, ...) values.
+
+    Returns:
+        numpy.ndarray: (blocks_y * blocks_x, 16, ...) values, blocks and
+            the texels within each in row major order.
+    """
+    height, width = pixels.shape[:2]
+    extra = pixels.shape[2:]
+    blocks_x = -(-width // BLOCK_SIZE)
+    blocks_y = -(-height // BLOCK_SIZE)
+    pixels = numpy.pad(
+        pixels,
+        ((0, blocks_y * BLOCK_SIZE - height), (0, blocks_x * BLOCK_SIZE - width))
+        + ((0, 0),) * len(extra),
+        mode="edge"
+    )
+    axes = tuple(range(4, 4 + len(extra)))
+    return (
+        pixels.reshape((blocks_y, BLOCK_SIZE, blocks_x, BLOCK_SIZE) + extra)
+        .transpose((0, 2, 1, 3) + axes)
+        .reshape((-1, BLOCK_SIZE * BLOCK_SIZE) + extra)
+    )
+
+
+def blocks_to_image(blocks, width, height):
+    """Inverse of image_to_blocks."""
+    blocks_x = -(-width // BLOCK_SIZE)
+    blocks_y = -(-height // BLOCK_SIZE)
+    extra = blocks.shape[2:]
+    axes = tuple(range(4, 4 + len(extra)))
+    return (
+        blocks.reshape((blocks_y, blocks_x, BLOCK_SIZE, BLOCK_SIZE) + extra)
+        .transpose((0, 2, 1, 3) + axes)
+        .reshape((blocks_y * BLOCK_SIZE, blocks_x * BLOCK_SIZE) + extra)
+        [:height, :width]
+    )
+
+
+def _quantize(values, lo, hi, steps):
+    """Project values onto steps + 1 evenly spaced values from lo to hi.
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray): Step ids and squared errors.
+    """
+    scale = steps / (hi - lo)
+    quant = numpy.rint((values - lo) * scale)
+    numpy.clip(quant, 0, steps, out=quant)
+    error = quant / scale + lo - values
+    error *= error
+    return quant, error
+
+
+def _build_error_table():
+    """Get the squared error of every value for every candidate, pairs in
+    the 8 value mode followed by pairs in the 6 value mode.
+
+    Returns:
+        numpy.ndarray: (256, 2 * pairs) float32 errors.
+    """
+    values = numpy.arange(256, dtype=numpy.float32)[:, None]
+    lo = _CANDIDATE_LO[None, :]
+    hi = _CANDIDATE_HI[None, :]
+    _, error8 = _quantize(values, lo, hi, 7)
+    _, error6 = _quantize(values, lo, hi, 5)
+    extreme_error = numpy.minimum(values, 255.0 - values)
+    numpy.minimum(error6, extreme_error * extreme_error, out=error6)
+    return numpy.ascontiguousarray(numpy.concatenate((error8, error6), axis=1))
+
+
+_ERROR_TABLE = None
+
+
+def _get_error_table():
+    # Built on first use, so worker processes build their own
+    global _ERROR_TABLE
+    if _ERROR_TABLE is None:
+        _ERROR_TABLE = _build_error_table()
+    return _ERROR_TABLE
+
+
+def _search_blocks(values):
+    """Find the best endpoints and mode of (count, 16) uint8 blocks.
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray): lo, hi and
+            whether the 6 value mode is used, per block.
+    """
+    table = _get_error_table()
+    error = table[values[:, 0]]
+    for texel in range(1, values.shape[1]):
+        error += table[values[:, texel]]
+
+    # argmin picks the first, so the 8 value mode wins ties like the shader
+    best = numpy.argmin(error, axis=1)
+    pair_count = len(_CANDIDATE_LO)
+    use6 = best >= pair_count
+    best = best % pair_count
+    return _CANDIDATE_LO[best], _CANDIDATE_HI[best], use6
+
+
+def _min_max_endpoints(values):
+    """Use the min and max of (count, 16) blocks as 8 value mode endpoints
+    (the shader's "fast mode")."""
+    values = values.astype(numpy.float32)
+    lo = values.min(axis=1)
+    hi = values.max(axis=1)
+    # Flat blocks still need lo < hi for the 8 value mode
+    flat = lo == hi
+    lo = numpy.where(flat & (lo > 0), lo - 1, lo)
+    hi = numpy.where(flat & (hi == lo), hi + 1, hi)
+    return lo, hi, numpy.zeros(len(values), dtype=bool)
+
+
+def _pack_blocks(values, lo, hi, use6):
+    """Build BC4 blocks from chosen endpoints.
+
+    Returns:
+        numpy.ndarray: (count, 8) uint8 blocks.
+    """
+    lo = lo[:, None]
+    hi = hi[:, None]
+
+    # 8 value mode: red0 = hi, red1 = lo, palette 2..7 steps down from hi
+    quant8, _ = _quantize(values, lo, hi, 7)
+    quant8 = quant8.astype(numpy.uint64)
+    index8 = numpy.where(quant8 == 7, 0, numpy.where(quant8 == 0, 1, 8 - quant8))
+
+    # 6 value mode: red0 = lo, red1 = hi, palette 2..5 steps up from lo,
+    # 6 is 0 and 7 is 255
+    quant6, error6 = _quantize(values, lo, hi, 5)
+    quant6 = quant6.astype(numpy.uint64)
+    index6 = numpy.where(quant6 == 0, 0, numpy.where(quant6 == 5, 1, quant6 + 1))
+    to_zero = values * values < error6
+    to_one = (255.0 - values) ** 2 < numpy.minimum(error6, values * values)
+    index6 = numpy.where(to_one, 7, numpy.where(to_zero, 6, index6))
+
+    use6 = use6[:, None]
+    indices = numpy.where(use6, index6, index8).astype(numpy.uint64)
+    red0 = numpy.where(use6, lo, hi).astype(numpy.uint64)
+    red1 = numpy.where(use6, hi, lo).astype(numpy.uint64)
+
+    shifts = numpy.arange(16, dtype=numpy.uint64) * numpy.uint64(3) + numpy.uint64(16)
+    packed = (
+        red0[:, 0]
+        | (red1[:, 0] << numpy.uint64(8))
+        | numpy.bitwise_or.reduce(indices << shifts, axis=1)
+    )
+    return packed.astype("<u8").view(numpy.uint8).reshape((-1, BC4_BLOCK_BYTES))
+
+
+def encode_bc4_blocks(blocks, quality=QUALITY_HIGH, chunk_blocks=DEFAULT_CHUNK_BLOCKS):
+    """Encode (count, 16) uint8 blocks (see image_to_blocks) in this
+    process.
+
+    Returns:
+        numpy.ndarray: (count, 8) uint8 BC4 blocks.
+    """
+    search = _search_blocks if quality >= QUALITY_HIGH else _min_max_endpoints
+    blocks = numpy.asarray(blocks, dtype=numpy.uint8)
+    out = numpy.empty((len(blocks), BC4_BLOCK_BYTES), dtype=numpy.uint8)
+    for start in range(0, len(blocks), chunk_blocks):
+        values = blocks[start:start + chunk_blocks]
+        lo, hi, use6 = search(values)
+        out[start:start + chunk_blocks] = _pack_blocks(
+            values.astype(numpy.float32), lo, hi, use6
+        )
+    return out
+
+
+def map_blocks(encode_blocks, blocks, processes=None, shard_blocks=DEFAULT_SHARD_BLOCKS):
+    """Encode blocks in shards over worker processes.
+
+    Args:
+        encode_blocks (callable): Picklable function encoding an array of
+            blocks into (count, block bytes) uint8.
+        blocks (numpy.ndarray): Blocks, see image_to_blocks.
+        processes (int): Worker processes, None for one per CPU, 0 to
+            encode in this process.
+        shard_blocks (int): Blocks handed to a worker at a time.
+
+    Returns:
+        numpy.ndarray: (count, block bytes) uint8 blocks.
+    """
+    if processes == 0 or len(blocks) <= shard_blocks:
+        return encode_blocks(blocks)
+    shards = [
+        blocks[start:start + shard_blocks]
+        for start in range(0, len(blocks), shard_blocks)
+    ]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return numpy.concatenate(list(executor.map(encode_blocks, shards)))
+
+
+def encode_bc4(pixels, quality=QUALITY_HIGH, processes=None, shard_blocks=DEFAULT_SHARD_BLOCKS):
+    """Encode a single channel image as BC4.
+
+    Args:
+        pixels (numpy.ndarray): (height, width) uint8 values.
+        quality (int): QUALITY_FAST, QUALITY_NORMAL or QUALITY_HIGH.
+        processes (int): Worker processes, None for one per CPU, 0 to
+            encode in this process.
+        shard_blocks (int): Blocks handed to a worker at a time.
+
+    Returns:
+        bytes: BC4 blocks in row major order, as glCompressedTexSubImage2D
+            expects them.
+    """
+    blocks = image_to_blocks(numpy.asarray(pixels, dtype=numpy.uint8))
+    return map_blocks(
+        partial(encode_bc4_blocks, quality=quality), blocks, processes, shard_blocks
+    ).tobytes()
+
+
+def encode_bc5(pixels, quality=QUALITY_HIGH, processes=None, shard_blocks=DEFAULT_SHARD_BLOCKS):
+    """Encode the first two channels of an image as BC5.
+
+    Args:
+        pixels (numpy.ndarray): (height, width, channels >= 2) uint8 values.
+        quality (int): QUALITY_FAST, QUALITY_NORMAL or QUALITY_HIGH.
+        processes (int): Worker processes, None for one per CPU, 0 to
+            encode in this process.
+        shard_blocks (int): Blocks handed to a worker at a time.
+
+    Returns:
+        bytes: BC5 blocks in row major order.
+    """
+    pixels = numpy.asarray(pixels, dtype=numpy.uint8)
+    red = image_to_blocks(pixels[:, :, 0])
+    green = image_to_blocks(pixels[:, :, 1])
+    encoded = map_blocks(
+        partial(encode_bc4_blocks, quality=quality),
+        numpy.concatenate((red, green)),
+        processes,
+        shard_blocks
+    )
+    return numpy.concatenate(
+        (encoded[:len(red)], encoded[len(red):]), axis=1
+    ).tobytes()
+
+
+def decode_bc4_blocks(data):
+    """Decode BC4 blocks.
+
+    Args:
+        data (bytes or numpy.ndarray): BC4 blocks.
+
+    Returns:
+        numpy.ndarray: (count, 16) uint8 values.
+    """
+    packed = numpy.frombuffer(bytes(data), dtype="<u8").astype(numpy.uint64)
+    red0 = (packed & numpy.uint64(0xff)).astype(numpy.float32)[:, None]
+    red1 = ((packed >> numpy.uint64(8)) & numpy.uint64(0xff)).astype(numpy.float32)[:, None]
+
+    steps8 = numpy.arange(1, 7, dtype=numpy.float32)
+    palette8 = numpy.concatenate(
+        (red0, red1, ((7 - steps8) * red0 + steps8 * red1) / 7),
+        axis=1
+    )
+    steps6 = numpy.arange(1, 5, dtype=numpy.float32)
+    palette6 = numpy.concatenate(
+        (
+            red0,
+            red1,
+            ((5 - steps6) * red0 + steps6 * red1) / 5,
+            numpy.zeros_like(red0),
+            numpy.full_like(red0, 255.0)
+        ),
+        axis=1
+    )
+    palette = numpy.where(red0 > red1, palette8, palette6)
+
+    shifts = numpy.arange(16, dtype=numpy.uint64) * numpy.uint64(3) + numpy.uint64(16)
+    indices = ((packed[:, None] >> shifts) & numpy.uint64(7)).astype(numpy.intp)
+    values = numpy.take_along_axis(palette, indices, axis=1)
+    return numpy.rint(values).astype(numpy.uint8)
+
+
+def decode_bc4(data, width, height):
+    """Decode a BC4 image.
+
+    Returns:
+        numpy.ndarray: (height, width) uint8 values.
+    """
+    return blocks_to_image(decode_bc4_blocks(data), width, height)
+
+
+def decode_bc5(data, width, height):
+    """Decode a BC5 image.
+
+    Returns:
+        numpy.ndarray: (height, width, 2) uint8 values.
+    """
+    blocks = numpy.frombuffer(bytes(data), dtype=numpy.uint8).reshape((-1, BC5_BLOCK_BYTES))
+    return numpy.stack(
+        (
+            decode_bc4(blocks[:, :BC4_BLOCK_BYTES].tobytes(), width, height),
+            decode_bc4(blocks[:, BC4_BLOCK_BYTES:].tobytes(), width, height),
+        ),
+        axis=2
+    )
+
+
+def psnr(reference, values):
+    """Peak signal to noise ratio of 8bit values, in dB."""
+    error = (
+        numpy.asarray(reference, dtype=numpy.float64)
+        - numpy.asarray(values, dtype=numpy.float64)
+    )
+    mse = numpy.mean(error * error)
+    if mse == 0.0:
+        return float("inf")
+    return float(10.0 * numpy.log10(255.0 * 255.0 / mse))
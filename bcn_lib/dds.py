@@ -0,0 +1,99 @@
+import struct
+
+
+FORMAT_BC1 = "DXT1"
+FORMAT_BC3 = "DXT5"
+FORMAT_BC4 = "BC4U"
+FORMAT_BC5 = "BC5U"
+
+_BLOCK_BYTES = {
+    FORMAT_BC1: 8,
+    FORMAT_BC3: 16,
+    FORMAT_BC4: 8,
+    FORMAT_BC5: 16,
+}
+
+_DDS_MAGIC = b"DDS "
+
+# size, flags, height, width, pitch or linear size, depth, mip count,
+# 11 reserved, pixel format (size, flags, fourcc, bit count, 4 masks),
+# caps, caps2, caps3, caps4, reserved
+_DDS_HEADER = struct.Struct("<7I44x2I4s5I5I")
+
+_DDSD_CAPS = 0x1
+_DDSD_HEIGHT = 0x2
+_DDSD_WIDTH = 0x4
+_DDSD_PIXELFORMAT = 0x1000
+_DDSD_LINEARSIZE = 0x80000
+_DDPF_FOURCC = 0x4
+_DDSCAPS_TEXTURE = 0x1000
+
+
+def get_compressed_size(fmt, width, height):
+    """Get the number of bytes a single mip takes."""
+    return (-(-width // 4)) * (-(-height // 4)) * _BLOCK_BYTES[fmt]
+
+
+def make_dds_header(fmt, width, height):
+    """Make the header of a single mip DDS file.
+
+    Args:
+        fmt (str): One of the FORMAT_* fourccs.
+        width (int): Width.
+        height (int): Height.
+
+    Returns:
+        bytes: Magic and header.
+    """
+    return _DDS_MAGIC + _DDS_HEADER.pack(
+        _DDS_HEADER.size,
+        _DDSD_CAPS | _DDSD_HEIGHT | _DDSD_WIDTH | _DDSD_PIXELFORMAT | _DDSD_LINEARSIZE,
+        height,
+        width,
+        get_compressed_size(fmt, width, height),
+        0,
+        0,
+        32,
+        _DDPF_FOURCC,
+        fmt.encode("ascii"),
+        0, 0, 0, 0, 0,
+        _DDSCAPS_TEXTURE, 0, 0, 0, 0
+    )
+
+
+def read_dds(filepath):
+    """Read a single mip DDS file written by write_blocks.
+
+    Returns:
+        tuple(str, int, int, bytes): Format, width, height and blocks.
+    """
+    with open(filepath, "rb") as in_fp:
+        data = in_fp.read()
+    if data[:4] != _DDS_MAGIC:
+        raise ValueError("Not a DDS file: {0}".format(filepath))
+    header = _DDS_HEADER.unpack_from(data, 4)
+    height, width = header[2], header[3]
+    fmt = header[9].decode("ascii")
+    if fmt not in _BLOCK_BYTES:
+        raise ValueError("Unsupported DDS format: {0}".format(fmt))
+    start = 4 + _DDS_HEADER.size
+    return fmt, width, height, data[start:start + get_compressed_size(fmt, width, height)]
+
+
+def write_blocks(filepath, data, fmt, width, height):
+    """Write compressed blocks, as a DDS file if filepath ends with .dds
+    otherwise just the raw blocks (like brute_force_bc4.py's .bc4 files).
+
+    Args:
+        filepath (str): Output path.
+        data (bytes): Blocks.
+        fmt (str): One of the FORMAT_* fourccs.
+        width (int): Width.
+        height (int): Height.
+    """
+    if len(data) != get_compressed_size(fmt, width, height):
+        raise ValueError("Block data doesn't match {0}x{1} {2}".format(width, height, fmt))
+    with open(filepath, "wb") as out_fp:
+        if filepath.lower().endswith(".dds"):
+            out_fp.write(make_dds_header(fmt, width, height))
+        out_fp.write(data)
@@ -0,0 +1,145 @@
+import hashlib
+import os
+
+import numpy
+
+from .bc1 import encode_bc1, encode_bc3
+from .bc4 import encode_bc4, encode_bc5, QUALITY_NORMAL
+from .dds import (
+    read_dds,
+    write_blocks,
+    FORMAT_BC1,
+    FORMAT_BC3,
+    FORMAT_BC4,
+    FORMAT_BC5,
+)
+
+
+# Bump if the encoders change their output
+TEXTURE_CACHE_VERSION = 1
+
+_DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "glref", "textures"
+)
+
+_ENCODERS = {
+    FORMAT_BC1: encode_bc1,
+    FORMAT_BC3: encode_bc3,
+    FORMAT_BC4: lambda pixels, *args, **kwargs: encode_bc4(
+        pixels if pixels.ndim == 2 else pixels[:, :, 0], *args, **kwargs
+    ),
+    FORMAT_BC5: encode_bc5,
+}
+
+
+def compress_texture(pixels, fmt, quality=QUALITY_NORMAL, processes=None):
+    """Block compress an image.
+
+    Args:
+        pixels (numpy.ndarray): (height, width[, channels]) uint8 values,
+            RGBA for BC1/BC3, the first channel for BC4 and the first two
+            for BC5.
+        fmt (str): One of the FORMAT_* fourccs.
+        quality (int): QUALITY_FAST, QUALITY_NORMAL or QUALITY_HIGH.
+        processes (int): Worker processes, None for one per CPU, 0 to
+            encode in this process.
+
+    Returns:
+        bytes: Blocks in row major order.
+    """
+    if fmt not in _ENCODERS:
+        raise ValueError("Unsupported format: {0}".format(fmt))
+    pixels = numpy.asarray(pixels, dtype=numpy.uint8)
+    return _ENCODERS[fmt](pixels, quality, processes=processes)
+
+
+def hash_pixels(pixels):
+    """Hash an image's contents and dimensions.
+
+    Args:
+        pixels (numpy.ndarray): uint8 values.
+
+    Returns:
+        bytes: sha256 digest.
+    """
+    pixels = numpy.ascontiguousarray(pixels, dtype=numpy.uint8)
+    hasher = hashlib.sha256()
+    hasher.update(repr(pixels.shape).encode("utf-8"))
+    hasher.update(pixels.tobytes())
+    return hasher.digest()
+
+
+def get_texture_cache_dir():
+    """Get the directory compressed textures are cached in, this can be
+    controlled via the GLREF_TEXTURE_CACHE_DIR environment variable, an
+    empty string disables caching.
+
+    Returns:
+        str or None: Cache directory.
+    """
+    cache_dir = os.environ.get("GLREF_TEXTURE_CACHE_DIR", _DEFAULT_CACHE_DIR)
+    return cache_dir or None
+
+
+def get_texture_cache_path(source_hash, fmt, quality):
+    """Get where a compressed texture lives in the cache.
+
+    Args:
+        source_hash (bytes): Hash of the source pixels.
+        fmt (str): Format.
+        quality (int): Quality level.
+
+    Returns:
+        str or None: Cache file path, None if caching is disabled.
+    """
+    cache_dir = get_texture_cache_dir()
+    if not cache_dir:
+        return None
+    key = hashlib.sha256(
+        source_hash + "{0},{1},{2}".format(fmt, quality, TEXTURE_CACHE_VERSION).encode("utf-8")
+    ).hexdigest()
+    return os.path.join(cache_dir, "{0}.dds".format(key))
+
+
+def compress_texture_cached(pixels, fmt, quality=QUALITY_NORMAL, processes=None, source_hash=None):
+    """Block compress an image, reusing the result of a previous run if
+    the same pixels were compressed the same way before.
+
+    Args:
+        pixels (numpy.ndarray): See compress_texture.
+        fmt (str): One of the FORMAT_* fourccs.
+        quality (int): QUALITY_FAST, QUALITY_NORMAL or QUALITY_HIGH.
+        processes (int): Worker processes, None for one per CPU, 0 to
+            encode in this process.
+        source_hash (bytes): Hash of the source, hash_pixels(pixels) if
+            not given.
+
+    Returns:
+        bytes: Blocks in row major order.
+    """
+    pixels = numpy.asarray(pixels, dtype=numpy.uint8)
+    height, width = pixels.shape[:2]
+    if source_hash is None:
+        source_hash = hash_pixels(pixels)
+
+    cache_path = get_texture_cache_path(source_hash, fmt, quality)
+    if cache_path is not None:
+        try:
+            cached = read_dds(cache_path)
+        except (IOError, OSError, ValueError):
+            cached = None
+        if cached is not None and cached[:3] == (fmt, width, height):
+            return cached[3]
+
+    data = compress_texture(pixels, fmt, quality, processes)
+
+    if cache_path is not None:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            # Write to a temp file and move, so a crash never leaves a partial file
+            tmp_path = "{0}.{1}.tmp".format(cache_path, os.getpid())
+            write_blocks(tmp_path + ".dds", data, fmt, width, height)
+            os.replace(tmp_path + ".dds", cache_path)
+        except (IOError, OSError):
+            pass
+    return data
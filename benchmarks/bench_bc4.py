@@ -0,0 +1,79 @@
+"""Encode the blue noise texture as BC4 and compare against the GPU
+encoded one and a min/max endpoint reference.
+
+Usage:
+    python -m benchmarks.bench_bc4 --processes 0 4
+    python -m benchmarks.bench_bc4 --out data/bn/BlueNoise64Tiled.dds
+"""
+import argparse
+import os
+import time
+
+import numpy
+from PIL import Image
+
+from bcn_lib import encode_bc4, decode_bc4, psnr, write_blocks, FORMAT_BC4
+from bcn_lib.bc4 import QUALITY_FAST
+
+
+_DATA_DIR = os.path.abspath(
+    os.path.join(__file__, "..", "..", "data", "bn")
+)
+
+
+def load_red(filepath):
+    """Load the red channel of an image, as brute_force_bc4.py does."""
+    return numpy.asarray(Image.open(filepath).convert("RGBA"), dtype=numpy.uint8)[:, :, 0]
+
+
+def run(processes, image_path, out_path=None):
+    pixels = load_red(image_path)
+    height, width = pixels.shape
+    print("{0} ({1}x{2})".format(image_path, width, height))
+
+    reference = decode_bc4(encode_bc4(pixels, QUALITY_FAST, processes=0), width, height)
+    print("  min/max   psnr {0:7.3f}dB".format(psnr(pixels, reference)))
+
+    gpu_path = os.path.splitext(image_path)[0] + ".bc4"
+    if os.path.exists(gpu_path):
+        with open(gpu_path, "rb") as in_fp:
+            gpu_data = in_fp.read()
+        gpu = decode_bc4(gpu_data, width, height)
+        print("  gpu       psnr {0:7.3f}dB".format(psnr(pixels, gpu)))
+
+    data = None
+    for process_count in processes:
+        start = time.perf_counter()
+        data = encode_bc4(pixels, processes=process_count, shard_blocks=64)
+        elapsed = time.perf_counter() - start
+        decoded = decode_bc4(data, width, height)
+        print("  numpy     psnr {0:7.3f}dB  {1:8.3f}s  processes={2}".format(
+            psnr(pixels, decoded), elapsed, process_count
+        ))
+
+    if out_path is not None and data is not None:
+        write_blocks(out_path, data, FORMAT_BC4, width, height)
+        print("Wrote {0}".format(out_path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--processes",
+        type=int,
+        nargs="+",
+        default=[0, 4],
+        help="Worker process counts to time, 0 encodes in this process."
+    )
+    parser.add_argument(
+        "--image",
+        default=os.path.join(_DATA_DIR, "BlueNoise64Tiled.png"),
+        help="Image to encode the red channel of."
+    )
+    parser.add_argument(
+        "--out",
+        default=None,
+        help="Write the encoded blocks, as DDS if it ends with .dds."
+    )
+    args = parser.parse_args()
+    run(args.processes, args.image, args.out)
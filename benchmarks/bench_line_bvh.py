@@ -0,0 +1,93 @@
+"""Compare the level by level line BVH builder against the recursive one.
+
+Usage:
+    python -m benchmarks.bench_line_bvh --counts 1000 100000 1000000
+    python -m benchmarks.bench_line_bvh --split-mode sah
+"""
+import argparse
+import time
+
+import numpy
+
+from line_bvh.v1 import (
+    build_line_bvh_v1,
+    build_line_bvh_v1_recursive,
+    line_bvh_v1_expected_cost,
+    SPLIT_MEDIAN,
+    SPLIT_SAH,
+)
+
+
+def make_random_lines(count, seed=0, max_length=0.05):
+    """Generate random short lines in [0, 1].
+
+    Args:
+        count (int): Number of lines.
+        seed (int): Random seed.
+        max_length (float): Max line length.
+
+    Returns:
+        numpy.ndarray: (count, 4) float32 lines.
+    """
+    rng = numpy.random.default_rng(seed)
+    p0 = rng.random((count, 2))
+    p1 = p0 + (rng.random((count, 2)) - 0.5) * max_length
+    return numpy.column_stack((p0, p1)).astype(numpy.float32)
+
+
+def run(counts, fast_build=True, reference_limit=100000, split_mode=SPLIT_MEDIAN):
+    print("{0:>10} {1:>12} {2:>16} {3:>9} {4:>10}".format(
+        "lines", "flat (s)", "recursive (s)", "speedup", "ray cost"
+    ))
+    for count in counts:
+        lines = make_random_lines(count)
+
+        start = time.perf_counter()
+        bvh_data = build_line_bvh_v1(lines, fast_build, split_mode)
+        flat_time = time.perf_counter() - start
+
+        # The recursive builder only does median splits
+        recursive_time = float("nan")
+        if split_mode == SPLIT_MEDIAN and count <= reference_limit:
+            start = time.perf_counter()
+            reference = build_line_bvh_v1_recursive(lines, fast_build)
+            recursive_time = time.perf_counter() - start
+            assert bvh_data.tobytes() == reference.tobytes()
+
+        print("{0:>10} {1:>12.3f} {2:>16.3f} {3:>8.1f}x {4:>10.2f}".format(
+            count,
+            flat_time,
+            recursive_time,
+            recursive_time / flat_time,
+            line_bvh_v1_expected_cost(bvh_data)["cost"]
+        ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--counts",
+        type=int,
+        nargs="+",
+        default=[1000, 100000, 1000000],
+        help="Number of lines to build BVHs from."
+    )
+    parser.add_argument(
+        "--slow-build",
+        action="store_true",
+        help="Use the mean based split rather than fast_build."
+    )
+    parser.add_argument(
+        "--reference-limit",
+        type=int,
+        default=100000,
+        help="Skip the recursive builder above this many lines."
+    )
+    parser.add_argument(
+        "--split-mode",
+        choices=(SPLIT_MEDIAN, SPLIT_SAH),
+        default=SPLIT_MEDIAN,
+        help="How nodes are split."
+    )
+    args = parser.parse_args()
+    run(args.counts, not args.slow_build, args.reference_limit, args.split_mode)
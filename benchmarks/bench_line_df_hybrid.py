@@ -0,0 +1,92 @@
+"""Compare the tiled line distance field builder against the brute force one.
+
+Usage:
+    python -m benchmarks.bench_line_df_hybrid --res 64 128 256 --lines 2000
+"""
+import argparse
+import time
+
+import numpy
+
+from line_df_hybrid.v1 import (
+    build_line_df_hybrid_v1,
+    build_line_df_hybrid_v1_bruteforce,
+)
+
+
+def make_wall_lines(count, seed=0, min_length=0.01, max_length=0.06):
+    """Generate axis aligned wall segments in [0, 1].
+
+    Args:
+        count (int): Number of lines.
+        seed (int): Random seed.
+        min_length (float): Min line length.
+        max_length (float): Max line length.
+
+    Returns:
+        numpy.ndarray: (count, 4) lines.
+    """
+    rng = numpy.random.default_rng(seed)
+    p0 = rng.random((count, 2))
+    angles = rng.integers(0, 4, count) * (numpy.pi / 2)
+    lengths = min_length + rng.random(count) * (max_length - min_length)
+    p1 = p0 + numpy.column_stack((numpy.cos(angles), numpy.sin(angles))) * lengths[:, None]
+    return numpy.column_stack((p0, p1))
+
+
+def run(resolutions, line_count, reference_limit=128):
+    lines = make_wall_lines(line_count)
+    print("{0:>6} {1:>8} {2:>12} {3:>17} {4:>9} {5:>14} {6:>12}".format(
+        "res", "lines", "tiled (s)", "brute force (s)", "speedup", "buffer lines", "compression"
+    ))
+    for res in resolutions:
+        start = time.perf_counter()
+        df_texture, lines_buffer, stats = build_line_df_hybrid_v1(
+            lines,
+            res,
+            return_stats=True
+        )
+        tiled_time = time.perf_counter() - start
+
+        bruteforce_time = float("nan")
+        if res <= reference_limit:
+            start = time.perf_counter()
+            ref_df_texture, ref_lines_buffer = build_line_df_hybrid_v1_bruteforce(lines, res)
+            bruteforce_time = time.perf_counter() - start
+            assert df_texture.tobytes() == ref_df_texture.tobytes()
+            assert lines_buffer.tobytes() == ref_lines_buffer.tobytes()
+
+        print("{0:>6} {1:>8} {2:>12.3f} {3:>17.3f} {4:>8.1f}x {5:>14} {6:>11.2f}x".format(
+            res,
+            line_count,
+            tiled_time,
+            bruteforce_time,
+            bruteforce_time / tiled_time,
+            stats["compressed_line_count"],
+            stats["compression_ratio"]
+        ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--res",
+        type=int,
+        nargs="+",
+        default=[64, 128, 256],
+        help="Distance field resolutions."
+    )
+    parser.add_argument(
+        "--lines",
+        type=int,
+        default=1000,
+        help="Number of lines."
+    )
+    parser.add_argument(
+        "--reference-limit",
+        type=int,
+        default=128,
+        help="Skip the brute force builder above this resolution."
+    )
+    args = parser.parse_args()
+    run(args.res, args.lines, args.reference_limit)
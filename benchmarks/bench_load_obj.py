@@ -0,0 +1,122 @@
+"""Compare the numpy OBJ reader against the pywavefront path.
+
+Usage:
+    python -m benchmarks.bench_load_obj --copies 1000 10000 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy
+
+from viewport.geometry import read_obj, read_obj_pywavefront, ObjGeomAttr
+
+
+_DATA_DIR = os.path.abspath(os.path.join(__file__, "..", "..", "data"))
+
+
+def write_scaled_obj(src_filepath, dst_filepath, copies):
+    """Write an OBJ made up of offset copies of another OBJ.
+
+    Args:
+        src_filepath (str): OBJ to duplicate.
+        dst_filepath (str): Output path.
+        copies (int): Number of copies.
+    """
+    positions, uvs, normals, faces = [], [], [], []
+    with open(src_filepath, "r") as in_fp:
+        for line in in_fp:
+            tokens = line.split()
+            if not tokens:
+                continue
+            if tokens[0] == "v":
+                positions.append(tuple(map(float, tokens[1:4])))
+            elif tokens[0] == "vt":
+                uvs.append(tuple(map(float, tokens[1:3])))
+            elif tokens[0] == "vn":
+                normals.append(tuple(map(float, tokens[1:4])))
+            elif tokens[0] == "f":
+                faces.append([
+                    tuple(int(x) for x in token.split("/"))
+                    for token in tokens[1:]
+                ])
+
+    positions = numpy.array(positions)
+    side = int(numpy.ceil(copies ** (1.0 / 3.0)))
+    with open(dst_filepath, "w") as out_fp:
+        for copy in range(copies):
+            offset = numpy.array((copy % side, (copy // side) % side, copy // (side * side)))
+            for p in positions + offset * 1.5:
+                out_fp.write("v {0:.6f} {1:.6f} {2:.6f}\n".format(*p))
+        for uv in uvs:
+            out_fp.write("vt {0:.6f} {1:.6f}\n".format(*uv))
+        for n in normals:
+            out_fp.write("vn {0:.6f} {1:.6f} {2:.6f}\n".format(*n))
+        for copy in range(copies):
+            base = copy * len(positions)
+            for face in faces:
+                out_fp.write("f {0}\n".format(" ".join(
+                    "{0}/{1}/{2}".format(v + base, t, n)
+                    for v, t, n in face
+                )))
+
+
+def run(copies_list, attrs, skip_pywavefront=False):
+    src_filepath = os.path.join(_DATA_DIR, "cubeWithNormals.obj")
+    attr_names = [attr.name for attr in attrs]
+    print("{0:>10} {1:>12} {2:>14} {3:>16} {4:>9}".format(
+        "copies", "triangles", "numpy (s)", "pywavefront (s)", "speedup"
+    ))
+    for copies in copies_list:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            obj_filepath = os.path.join(tmp_dir, "scaled.obj")
+            write_scaled_obj(src_filepath, obj_filepath, copies)
+
+            start = time.perf_counter()
+            mesh_data = read_obj(obj_filepath, attr_names)
+            numpy_time = time.perf_counter() - start
+            triangles = sum(len(indices) // 3 for indices, _ in mesh_data)
+
+            pywavefront_time = float("nan")
+            if not skip_pywavefront:
+                start = time.perf_counter()
+                reference = read_obj_pywavefront(obj_filepath, attrs)
+                pywavefront_time = time.perf_counter() - start
+
+                # Same triangles, regardless of vertex ordering
+                stride = sum(3 if attr != ObjGeomAttr.UV else 2 for attr in attrs)
+                for (indices, vertices), (ref_indices, ref_vertices) in zip(mesh_data, reference):
+                    expanded = vertices.reshape((-1, stride))[indices]
+                    ref_expanded = ref_vertices.reshape((-1, stride))[ref_indices]
+                    assert numpy.array_equal(expanded, ref_expanded)
+
+            print("{0:>10} {1:>12} {2:>14.3f} {3:>16.3f} {4:>8.1f}x".format(
+                copies,
+                triangles,
+                numpy_time,
+                pywavefront_time,
+                pywavefront_time / numpy_time
+            ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--copies",
+        type=int,
+        nargs="+",
+        default=[100, 1000, 10000],
+        help="Number of copies of data/cubeWithNormals.obj to load."
+    )
+    parser.add_argument(
+        "--skip-pywavefront",
+        action="store_true",
+        help="Only time the numpy reader."
+    )
+    args = parser.parse_args()
+    run(
+        args.copies,
+        (ObjGeomAttr.P, ObjGeomAttr.N, ObjGeomAttr.UV),
+        args.skip_pywavefront
+    )
@@ -0,0 +1,51 @@
+"""Report post-transform cache efficiency before and after mesh optimization.
+
+Usage:
+    python -m benchmarks.bench_mesh_optimize data/armadillo.obj --cache-size 16 32
+"""
+import argparse
+import time
+
+from viewport.obj_reader import read_obj
+from viewport.mesh_optimize import optimize_mesh, DEFAULT_CACHE_SIZE
+
+
+def run(obj_filepaths, cache_sizes):
+    print("{0:<32} {1:>5} {2:>10} {3:>15} {4:>15} {5:>9}".format(
+        "mesh", "cache", "triangles", "ACMR", "ATVR", "time (s)"
+    ))
+    for obj_filepath in obj_filepaths:
+        meshes = read_obj(obj_filepath, ["P", "N"])
+        for mesh_index, (indices, vertices) in enumerate(meshes):
+            for cache_size in cache_sizes:
+                start = time.perf_counter()
+                _, _, stats = optimize_mesh(indices, vertices, 6, cache_size)
+                elapsed = time.perf_counter() - start
+                print("{0:<32} {1:>5} {2:>10} {3:>6.3f} -> {4:<6.3f} {5:>6.3f} -> {6:<6.3f} {7:>9.3f}".format(
+                    "{0}[{1}]".format(obj_filepath, mesh_index)[-32:],
+                    cache_size,
+                    stats["triangles"],
+                    stats["acmr_before"],
+                    stats["acmr_after"],
+                    stats["atvr_before"],
+                    stats["atvr_after"],
+                    elapsed
+                ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "objs",
+        nargs="+",
+        help="OBJ files to optimize (needs positions and normals)."
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        nargs="+",
+        default=[DEFAULT_CACHE_SIZE],
+        help="Simulated FIFO cache sizes."
+    )
+    args = parser.parse_args()
+    run(args.objs, args.cache_size)
@@ -0,0 +1,83 @@
+"""Pack the mip indirections of a large UDIM asset.
+
+Usage:
+    python -m benchmarks.bench_udim_page --udims 1000
+"""
+import argparse
+import time
+
+import numpy
+
+from udim_vt_lib.indirection import UdimIndirectionBuilder, UdimEntry
+
+
+class _FakeImage(object):
+    """Just enough of an Image for UdimIndirectionBuilder."""
+
+    def __init__(self, size):
+        self.size = size
+        self.mips = int(numpy.log2(max(size))) + 1
+
+
+def make_udim_entries(count, seed=0, sizes=(1024, 2048, 4096)):
+    """Generate udims with random power of two resolutions.
+
+    Args:
+        count (int): Number of udims.
+        seed (int): Random seed.
+        sizes (tuple[int]): Resolutions to pick from.
+
+    Returns:
+        list(UdimEntry): Entries, 10 udims per row.
+    """
+    rng = numpy.random.default_rng(seed)
+    widths = rng.choice(sizes, count)
+    heights = rng.choice(sizes, count)
+    return [
+        UdimEntry((i % 10, i // 10), _FakeImage((int(width), int(height))))
+        for i, (width, height) in enumerate(zip(widths, heights))
+    ]
+
+
+def run(udim_counts):
+    print("{0:>8} {1:>10} {2:>12} {3:>8} {4:>12}".format(
+        "udims", "mips", "time (s)", "pages", "efficiency"
+    ))
+    for count in udim_counts:
+        entries = make_udim_entries(count)
+
+        start = time.perf_counter()
+        builder = UdimIndirectionBuilder(entries)
+        build_time = time.perf_counter() - start
+
+        mip_count = 0
+        used_tiles = 0
+        for entry in entries:
+            width, height = entry.image.size
+            for mip in range(entry.image.mips):
+                used_tiles += ((width + 63) // 64) * ((height + 63) // 64)
+                width = max(1, width >> 1)
+                height = max(1, height >> 1)
+                mip_count += 1
+
+        size_x, size_y, pages = builder.mip_indirection_size
+        print("{0:>8} {1:>10} {2:>12.3f} {3:>8} {4:>11.1f}%".format(
+            count,
+            mip_count,
+            build_time,
+            pages,
+            100.0 * used_tiles / (size_x * size_y * pages)
+        ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--udims",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000],
+        help="Number of udims in the asset."
+    )
+    args = parser.parse_args()
+    run(args.udims)
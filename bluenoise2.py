@@ -177,45 +177,18 @@ class Renderer(object):
         dft_image = os.path.join(self._store_pixels_dir, dft_image_name)
 
 
+        # Lossless recompression, slow so off by default
+        do_compression = False
         to_rgb_image(self._value_texture, self._texture_size).save(
-            value_image
+            value_image,
+            optimize=do_compression
         )
 
         to_rgb_image(self._fft2_p2_fb_target.texture, self._texture_size).save(
-            dft_image
+            dft_image,
+            optimize=do_compression
         )
 
-        do_compression = False
-        if do_compression:
-            import subprocess
-            subprocess.check_output(
-                [
-                    "curl",
-                    "-X",
-                    "POST",
-                    "--form",
-                    "input=@{0};type=image/png".format(value_image_name),
-                    "https://www.toptal.com/developers/pngcrush/crush",
-                    "--output",
-                    value_image_name
-                ],
-                cwd=self._store_pixels_dir
-            )
-
-            subprocess.check_output(
-                [
-                    "curl",
-                    "-X",
-                    "POST",
-                    "--form",
-                    "input=@{0};type=image/png".format(dft_image),
-                    "https://www.toptal.com/developers/pngcrush/crush",
-                    "--output",
-                    dft_image
-                ],
-                cwd=self._store_pixels_dir
-            )
-
         self._store_pixels_it += 1
 
 
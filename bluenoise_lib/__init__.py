@@ -0,0 +1,11 @@
+from .void_and_cluster import (
+    generate_bluenoise,
+    generate_many,
+    save_bluenoise,
+    compute_dft,
+    to_unorm8,
+    get_bluenoise_filenames,
+    ENERGY_WINDOW,
+    ENERGY_FFT,
+)
+from .spectrum import periodogram, radial_spectrum, summarize_spectrum
@@ -0,0 +1,224 @@
+"""Generate blue noise offline and write a spectral report.
+
+Usage:
+    python -m bluenoise_lib.batch out_dir --tile-sizes 16 32 --dimensions 64x64 --count 4
+
+Every tile size / dimension pair is generated count times (with
+consecutive seeds) on worker processes, each texture is written with the
+same bn_*_v.png/_d.png naming bluenoise2.py's store_pixels uses, and
+out_dir/report.json (settings, timings and spectrum summaries) plus
+out_dir/report.npz (full radial spectra) describe the batch.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+from .void_and_cluster import (
+    generate_bluenoise,
+    save_bluenoise,
+    ENERGY_WINDOW,
+    ENERGY_FFT,
+    DEFAULT_SIGMA,
+)
+from .spectrum import radial_spectrum, summarize_spectrum
+
+
+def parse_dimensions(text):
+    """Parse "WxH" (or just "W" for square) dimensions."""
+    parts = text.lower().split("x")
+    if len(parts) == 1:
+        parts = parts * 2
+    if len(parts) != 2:
+        raise argparse.ArgumentTypeError("Bad dimensions: {0}".format(text))
+    return (int(parts[0]), int(parts[1]))
+
+
+def make_jobs(tile_sizes, dimensions, count, seed=0, **settings):
+    """Get a job per texture to generate.
+
+    Args:
+        tile_sizes (list[int]): Tile sizes.
+        dimensions (list[tuple(int, int)]): Texture dimensions, None to use
+            a single tile.
+        count (int): Textures per tile size and dimensions.
+        seed (int): Seed of the first texture.
+        **settings: Passed to generate_bluenoise.
+
+    Returns:
+        list(dict): Jobs.
+    """
+    jobs = []
+    for tile_size in tile_sizes:
+        for size in (dimensions or [(tile_size, tile_size)]):
+            if size[0] % tile_size or size[1] % tile_size:
+                raise ValueError("{0}x{1} isn't a multiple of the tile size {2}".format(
+                    size[0], size[1], tile_size
+                ))
+            for index in range(count):
+                jobs.append(dict(
+                    settings,
+                    tile_size=tile_size,
+                    num_tiles=(size[0] // tile_size, size[1] // tile_size),
+                    seed=seed + len(jobs),
+                    index=index,
+                ))
+    return jobs
+
+
+def run_job(job, out_dir, channels=1, optimize=True):
+    """Generate, save and analyse a single texture (in a worker process).
+
+    Returns:
+        tuple(dict, tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray)):
+            Report entry and radial spectrum.
+    """
+    settings = dict(job)
+    index = settings.pop("index")
+
+    start = time.perf_counter()
+    values = generate_bluenoise(**settings)
+    elapsed = time.perf_counter() - start
+
+    # Each texture gets a run of indices, so slices don't collide
+    images_per_texture = -(-len(values) // channels)
+    files = save_bluenoise(
+        values,
+        out_dir,
+        settings["tile_size"],
+        index=index * images_per_texture,
+        channels=channels,
+        optimize=optimize
+    )
+    spectrum = radial_spectrum(values)
+
+    entry = dict(settings)
+    entry["num_tiles"] = list(settings["num_tiles"])
+    entry["size"] = [values.shape[2], values.shape[1]]
+    entry["seconds"] = elapsed
+    entry["files"] = [
+        [os.path.basename(value_path), os.path.basename(dft_path)]
+        for value_path, dft_path in files
+    ]
+    entry.update(summarize_spectrum(*spectrum))
+    return entry, spectrum
+
+
+def _run_job(args):
+    return run_job(*args)
+
+
+def main(out_dir, tile_sizes, dimensions, count, workers=None, channels=1, optimize=True, **settings):
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = make_jobs(tile_sizes, dimensions, count, **settings)
+    job_args = [(job, out_dir, channels, optimize) for job in jobs]
+
+    start = time.perf_counter()
+    if workers == 0:
+        results = [_run_job(args) for args in job_args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_run_job, job_args))
+    elapsed = time.perf_counter() - start
+
+    spectra = {}
+    entries = []
+    for job_id, (entry, (frequencies, power, anisotropy)) in enumerate(results):
+        key = "{0}_{1}x{2}_{3}".format(
+            entry["tile_size"], entry["size"][0], entry["size"][1], entry["seed"]
+        )
+        entry["spectrum"] = key
+        spectra[key + "_frequencies"] = frequencies
+        spectra[key + "_power"] = power
+        spectra[key + "_anisotropy"] = anisotropy
+        entries.append(entry)
+        print("{0:8.3f}s  {1}  low {2:.4f}  anisotropy {3:.2f}dB".format(
+            entry["seconds"],
+            key,
+            entry["low_frequency_power"],
+            entry["mean_anisotropy_db"]
+        ))
+
+    numpy.savez_compressed(os.path.join(out_dir, "report.npz"), **spectra)
+    with open(os.path.join(out_dir, "report.json"), "w") as f:
+        json.dump({"seconds": elapsed, "textures": entries}, f, indent=2)
+    print("Generated {0} textures in {1:.3f}s".format(len(entries), elapsed))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("out_dir", help="Directory to write images and the report to.")
+    parser.add_argument(
+        "-t",
+        "--tile-sizes",
+        type=int,
+        nargs="+",
+        default=[64],
+        help="Tile sizes to generate."
+    )
+    parser.add_argument(
+        "-d",
+        "--dimensions",
+        type=parse_dimensions,
+        nargs="+",
+        default=None,
+        help="Texture dimensions as WxH, multiples of the tile size "
+             "(default: a single tile)."
+    )
+    parser.add_argument(
+        "-n",
+        "--count",
+        type=int,
+        default=1,
+        help="Textures per tile size and dimensions."
+    )
+    parser.add_argument(
+        "--depth",
+        type=int,
+        default=1,
+        help="Slices per texture, for spatiotemporal noise."
+    )
+    parser.add_argument(
+        "--channels",
+        type=int,
+        default=1,
+        choices=(1, 3, 4),
+        help="Slices packed into each image."
+    )
+    parser.add_argument("--sigma", type=float, default=DEFAULT_SIGMA)
+    parser.add_argument(
+        "--energy-mode",
+        default=ENERGY_WINDOW,
+        choices=(ENERGY_WINDOW, ENERGY_FFT)
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: cpu count, 0 to run inline)."
+    )
+    parser.add_argument(
+        "--no-optimize",
+        action="store_true",
+        help="Skip the lossless PNG recompression."
+    )
+
+    args = parser.parse_args()
+    main(
+        args.out_dir,
+        args.tile_sizes,
+        args.dimensions,
+        args.count,
+        workers=args.workers,
+        channels=args.channels,
+        optimize=not args.no_optimize,
+        depth=args.depth,
+        sigma=args.sigma,
+        energy_mode=args.energy_mode,
+        seed=args.seed
+    )
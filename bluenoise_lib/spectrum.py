@@ -0,0 +1,102 @@
+"""
+Spectral checks of blue noise, after Ulichney's "Dithering with blue noise":
+
+    The radially averaged power spectrum (RAPS) is the mean periodogram
+    power over rings of equal frequency, blue noise should have little
+    power at low frequencies and be flat above its principal frequency.
+
+    Anisotropy is the variance of the power within each ring over the
+    squared mean (in dB). Periodogram power is exponentially distributed,
+    so isotropic noise sits around 0dB for a single texture, and
+    10*log10(depth) lower when averaging slices, anything higher has
+    directional structure.
+
+Only complete rings (up to 0.5 cycles per pixel) are kept.
+"""
+import numpy
+
+
+def periodogram(values):
+    """Get the centered power spectrum, averaged over slices.
+
+    Args:
+        values (numpy.ndarray): (height, width) or (depth, height, width)
+            values.
+
+    Returns:
+        numpy.ndarray: (height, width) power, DC in the middle.
+    """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    values = values.reshape((-1,) + values.shape[-2:])
+    values = values - values.mean(axis=(1, 2), keepdims=True)
+    height, width = values.shape[1:]
+    power = numpy.abs(numpy.fft.fft2(values)) ** 2 / (width * height)
+    return numpy.fft.fftshift(power.mean(axis=0))
+
+
+def _radial_bins(height, width):
+    """Get the ring of every periodogram element, in units of the shortest
+    axis' frequency step."""
+    freq_y = numpy.fft.fftshift(numpy.fft.fftfreq(height))
+    freq_x = numpy.fft.fftshift(numpy.fft.fftfreq(width))
+    radius = numpy.hypot(freq_y[:, None], freq_x[None, :])
+    step = 1.0 / min(width, height)
+    return numpy.round(radius / step).astype(numpy.int64), step
+
+
+def radial_spectrum(values):
+    """Get the radially averaged power spectrum and anisotropy.
+
+    Args:
+        values (numpy.ndarray): (height, width) or (depth, height, width)
+            values.
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray): Ring
+            frequencies (in cycles per pixel), mean power and
+            anisotropy (in dB) of each ring, the DC ring is skipped.
+    """
+    power = periodogram(values)
+    rings, step = _radial_bins(*power.shape)
+    rings = rings.ravel()
+    power = power.ravel()
+
+    counts = numpy.bincount(rings)
+    sums = numpy.bincount(rings, weights=power)
+    squares = numpy.bincount(rings, weights=power * power)
+
+    # Skip the DC, empty rings and the partial rings in the corners
+    valid = counts > 0
+    valid[0] = False
+    valid[int(0.5 / step) + 1:] = False
+    counts = counts[valid]
+    mean = sums[valid] / counts
+    variance = numpy.maximum(squares[valid] / counts - mean * mean, 0.0)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        anisotropy = 10.0 * numpy.log10(variance / (mean * mean))
+
+    frequencies = numpy.nonzero(valid)[0] * step
+    return frequencies, mean, anisotropy
+
+
+def summarize_spectrum(frequencies, power, anisotropy, low_frequency=0.125):
+    """Reduce a radial spectrum to a few numbers for reports.
+
+    Args:
+        frequencies (numpy.ndarray): Ring frequencies.
+        power (numpy.ndarray): Ring mean power.
+        anisotropy (numpy.ndarray): Ring anisotropy.
+        low_frequency (float): Frequencies below this count as low.
+
+    Returns:
+        dict: low_frequency_power (mean power below low_frequency relative
+            to the mean of all rings), peak_frequency and mean_anisotropy_db.
+    """
+    low = frequencies < low_frequency
+    mean_power = float(power.mean())
+    finite = numpy.isfinite(anisotropy)
+    return {
+        "low_frequency_power": float(power[low].mean() / mean_power) if low.any() else 0.0,
+        "peak_frequency": float(frequencies[numpy.argmax(power)]),
+        "mean_anisotropy_db": float(anisotropy[finite].mean()) if finite.any() else 0.0,
+    }
@@ -0,0 +1,314 @@
+"""
+Headless void and cluster blue noise
+------------------------------------
+
+Same algorithm as bluenoise2.py, without needing a GL context:
+
+    The texture is split into tiles, every iteration each tile picks its
+    emptiest (lowest energy) unfilled pixel and writes a value into it,
+    starting at 1 and ending at 0, so each tile ends up holding every
+    value once. Picks add energy to their neighbourhood via a toroidal
+    gaussian (exp(-r^2 / sigma^2)).
+
+    Tiles are processed in a 2x2 checkerboard, so tiles picking at the
+    same time are atleast a tile apart.
+
+
+Energy can either be splatted into a window around each pick
+(ENERGY_WINDOW), or recomputed with an FFT convolution (ENERGY_FFT) which
+has no cutoff, but costs O(N log N) per pick.
+
+With depth > 1, a stack of textures is generated where each pixel is also
+blue noise over the stack (spatiotemporal blue noise), the energy being a
+spatial gaussian within a slice plus a temporal gaussian (exp(-t^2 /
+temporal_sigma^2)) along each pixel.
+"""
+import os
+from math import ceil, log
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+from PIL import Image
+
+
+ENERGY_WINDOW = "window"
+ENERGY_FFT = "fft"
+
+DEFAULT_SIGMA = 1.9
+DEFAULT_TEMPORAL_SIGMA = 1.0
+
+# How much of the gaussian's energy the window covers (see shaders/bluenoise/notes.txt)
+DEFAULT_ACCURACY = 0.99
+
+# Same order bluenoise2.py dispatches in
+_TILE_PHASES = ((0, 0), (1, 1), (1, 0), (0, 1))
+
+
+def _get_update_span(sigma, accuracy, size):
+    """Get the radius energy is splatted out to."""
+    if accuracy >= 1.0 or accuracy <= 0.0:
+        return size
+    return min(size, int(ceil(-log(1 - accuracy) * sigma ** 2)))
+
+
+def _toroidal_gaussian(offsets, size, sigma):
+    """Gaussian of the wrapped distance of offsets."""
+    offsets = numpy.abs(offsets) % size
+    offsets = numpy.minimum(offsets, size - offsets)
+    return numpy.exp(-(offsets ** 2) / (sigma ** 2))
+
+
+class _Generator(object):
+    """State of a single generation, see generate_bluenoise."""
+
+    def __init__(self, tile_size, num_tiles, depth, sigma, temporal_sigma, accuracy, energy_mode, rng):
+        self.tile_size = tile_size
+        self.num_tiles = num_tiles
+        self.depth = depth
+        self.width = num_tiles[0] * tile_size
+        self.height = num_tiles[1] * tile_size
+        self.energy_mode = energy_mode
+
+        # Noise breaks ties, so the first picks are random
+        shape = (depth, self.height, self.width)
+        self.energy = rng.random(shape) * 1e-6
+        self.values = numpy.full(shape, -1.0, dtype=numpy.float32)
+
+        # Temporal energy along each pixel of the stack
+        self.temporal_kernel = None
+        if depth > 1:
+            self.temporal_kernel = _toroidal_gaussian(
+                numpy.arange(depth), depth, temporal_sigma
+            )
+            self.temporal_kernel[0] = 0.0
+
+        if energy_mode == ENERGY_FFT:
+            self.base_energy = self.energy.copy()
+            spatial = (
+                _toroidal_gaussian(numpy.arange(self.height), self.height, sigma)[:, None]
+                * _toroidal_gaussian(numpy.arange(self.width), self.width, sigma)[None, :]
+            )
+            kernel = numpy.zeros(shape)
+            kernel[0] = spatial
+            if self.temporal_kernel is not None:
+                kernel[:, 0, 0] += self.temporal_kernel
+            self.kernel_fft = numpy.fft.rfftn(kernel)
+        else:
+            span_x = _get_update_span(sigma, accuracy, self.width // 2)
+            span_y = _get_update_span(sigma, accuracy, self.height // 2)
+            self.window_x = numpy.arange(-span_x, span_x + 1)
+            self.window_y = numpy.arange(-span_y, span_y + 1)
+            self.window = (
+                _toroidal_gaussian(self.window_y, self.height, sigma)[:, None]
+                * _toroidal_gaussian(self.window_x, self.width, sigma)[None, :]
+            )
+
+    def _active_tiles(self, phase):
+        """Get the tile ids picking in a phase."""
+        offset_x, offset_y = phase
+        step_x = 2 if self.num_tiles[0] > 1 else 1
+        step_y = 2 if self.num_tiles[1] > 1 else 1
+        if offset_x >= step_x or offset_y >= step_y:
+            return None
+        tiles_y, tiles_x = numpy.meshgrid(
+            numpy.arange(offset_y, self.num_tiles[1], step_y),
+            numpy.arange(offset_x, self.num_tiles[0], step_x),
+            indexing="ij"
+        )
+        return tiles_x.ravel(), tiles_y.ravel()
+
+    def _pick(self, layer, tiles_x, tiles_y):
+        """Find the emptiest unfilled pixel of each tile."""
+        tile_size = self.tile_size
+        inner = numpy.arange(tile_size)
+        rows = tiles_y[:, None] * tile_size + inner
+        cols = tiles_x[:, None] * tile_size + inner
+        energy = self.energy[layer][rows[:, :, None], cols[:, None, :]]
+        filled = self.values[layer][rows[:, :, None], cols[:, None, :]] >= 0.0
+        energy = numpy.where(filled, numpy.inf, energy).reshape((len(tiles_x), -1))
+        best = numpy.argmin(energy, axis=1)
+        return (
+            tiles_x * tile_size + best % tile_size,
+            tiles_y * tile_size + best // tile_size
+        )
+
+    def _splat(self, layer, pick_x, pick_y):
+        """Add the energy of new picks."""
+        if self.energy_mode == ENERGY_FFT:
+            filled = (self.values >= 0.0).astype(numpy.float64)
+            self.energy = self.base_energy + numpy.fft.irfftn(
+                numpy.fft.rfftn(filled) * self.kernel_fft,
+                s=filled.shape
+            )
+            return
+
+        rows = (pick_y[:, None] + self.window_y) % self.height
+        cols = (pick_x[:, None] + self.window_x) % self.width
+        numpy.add.at(
+            self.energy[layer],
+            (rows[:, :, None], cols[:, None, :]),
+            self.window
+        )
+        if self.temporal_kernel is not None:
+            layers = (layer + numpy.arange(self.depth)) % self.depth
+            numpy.add.at(
+                self.energy,
+                (layers[None, :], pick_y[:, None], pick_x[:, None]),
+                self.temporal_kernel[None, :]
+            )
+
+    def run(self):
+        iterations = self.tile_size * self.tile_size
+        phases = [
+            tiles for tiles in
+            (self._active_tiles(phase) for phase in _TILE_PHASES)
+            if tiles is not None
+        ]
+        for iteration in range(iterations):
+            write_value = 1.0 - iteration / max(1, iterations - 1)
+            for tiles_x, tiles_y in phases:
+                for layer in range(self.depth):
+                    pick_x, pick_y = self._pick(layer, tiles_x, tiles_y)
+                    self.values[layer, pick_y, pick_x] = write_value
+                    self._splat(layer, pick_x, pick_y)
+        return self.values
+
+
+def generate_bluenoise(
+        tile_size,
+        num_tiles=(1, 1),
+        depth=1,
+        sigma=DEFAULT_SIGMA,
+        temporal_sigma=DEFAULT_TEMPORAL_SIGMA,
+        accuracy=DEFAULT_ACCURACY,
+        energy_mode=ENERGY_WINDOW,
+        seed=None):
+    """Generate blue noise via void and cluster.
+
+    Args:
+        tile_size (int): Size of each tile, every tile holds each of the
+            tile_size^2 values once.
+        num_tiles (tuple(int, int)): Tiles along x and y, either 1 or a
+            multiple of 2.
+        depth (int): Number of slices, for spatiotemporal noise.
+        sigma (float): Spatial energy falloff.
+        temporal_sigma (float): Energy falloff between slices.
+        accuracy (float): Fraction of the energy the splat window covers
+            with ENERGY_WINDOW, >= 1 to update everything.
+        energy_mode (str): ENERGY_WINDOW or ENERGY_FFT.
+        seed (int): Random seed.
+
+    Returns:
+        numpy.ndarray: (depth, height, width) float32 values in [0, 1].
+    """
+    if energy_mode not in (ENERGY_WINDOW, ENERGY_FFT):
+        raise ValueError("Unknown energy mode: {0}".format(energy_mode))
+    for count in num_tiles:
+        if count != 1 and (count & 1):
+            raise ValueError("Bad num tiles, must be 1 or aligned to 2")
+    generator = _Generator(
+        tile_size,
+        tuple(num_tiles),
+        depth,
+        sigma,
+        temporal_sigma,
+        accuracy,
+        energy_mode,
+        numpy.random.default_rng(seed)
+    )
+    return generator.run()
+
+
+def to_unorm8(values):
+    """Convert values in [0, 1] to uint8, as GL would."""
+    return numpy.round(numpy.clip(values, 0.0, 1.0) * 255.0).astype(numpy.uint8)
+
+
+def compute_dft(values):
+    """Compute the centered 2D DFT magnitude the same way the fft2 shaders
+    do (orthonormal scaling, DC in the middle).
+
+    Args:
+        values (numpy.ndarray): (height, width) values.
+
+    Returns:
+        numpy.ndarray: (height, width) magnitudes.
+    """
+    return numpy.abs(
+        numpy.fft.fftshift(numpy.fft.fft2(values, norm="ortho"))
+    )
+
+
+def get_bluenoise_filenames(tile_size, width, height, index):
+    """Get the value and DFT image names bluenoise2.py stores pixels as.
+
+    Returns:
+        tuple(str, str): Value and DFT filenames.
+    """
+    base = "bn_{0}_{1}x{2}_{3}".format(tile_size, width, height, index)
+    return base + "_v.png", base + "_d.png"
+
+
+def save_bluenoise(values, out_dir, tile_size, index=0, channels=1, optimize=False):
+    """Save blue noise the same way bluenoise2.py's store_pixels does.
+
+    Args:
+        values (numpy.ndarray): (depth, height, width) values.
+        out_dir (str): Directory to write to.
+        tile_size (int): Tile size (for the filename).
+        index (int): Index of the first image.
+        channels (int): Slices packed into each image (1, 3 or 4),
+            the DFT image is of the first.
+        optimize (bool): Losslessly recompress the PNGs (slower to write).
+
+    Returns:
+        list(tuple(str, str)): Value and DFT paths written.
+    """
+    if channels not in (1, 3, 4):
+        raise ValueError("channels must be 1, 3 or 4")
+    values = numpy.asarray(values).reshape((-1,) + numpy.shape(values)[-2:])
+    height, width = values.shape[1:]
+    written = []
+    for image_index, start in enumerate(range(0, len(values), channels)):
+        group = values[start:start + channels]
+        value_name, dft_name = get_bluenoise_filenames(
+            tile_size, width, height, index + image_index
+        )
+        value_path = os.path.join(out_dir, value_name)
+        dft_path = os.path.join(out_dir, dft_name)
+
+        if channels == 1:
+            pixels = to_unorm8(group[0])
+        else:
+            pixels = numpy.zeros((height, width, channels), dtype=numpy.uint8)
+            pixels[:, :, :len(group)] = to_unorm8(group).transpose((1, 2, 0))
+            if channels == 4 and len(group) < 4:
+                pixels[:, :, 3] = 0xff
+        Image.fromarray(pixels).save(value_path, optimize=optimize)
+        Image.fromarray(to_unorm8(compute_dft(group[0]))).save(dft_path, optimize=optimize)
+        written.append((value_path, dft_path))
+    return written
+
+
+def _generate_job(kwargs):
+    return generate_bluenoise(**kwargs)
+
+
+def generate_many(count, processes=None, seed=0, **kwargs):
+    """Generate several blue noise textures in parallel worker processes.
+
+    Args:
+        count (int): Number of textures.
+        processes (int): Worker processes, None for one per CPU,
+            0 to generate in this process.
+        seed (int): Seed of the first texture, others follow on.
+        **kwargs: Passed to generate_bluenoise.
+
+    Returns:
+        list(numpy.ndarray): Generated values.
+    """
+    jobs = [dict(kwargs, seed=seed + i) for i in range(count)]
+    if processes == 0:
+        return [_generate_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(_generate_job, jobs))
@@ -1,3 +1,14 @@
 
-from .bvh import generate_compact_cards, generate_bvh_python
-from .card import Card, CardBuffer
+from .bvh import (
+    generate_compact_cards,
+    generate_bvh_python,
+    generate_bvh,
+    build_card_bvh,
+    get_card_bboxes,
+    get_card_bvh_levels,
+    card_bvh_sah_cost,
+    CardBVH,
+    SPLIT_MIDPOINT,
+    SPLIT_SAH,
+)
+from .card import Card, CardBuffer, pack_exported_cards
@@ -183,4 +183,580 @@ def generate_bvh_python(card_buffer):
     return data_stream, debug_bboxes
 
 
+BVH_NODE_TYPE_NODE = 0
+BVH_NODE_TYPE_LEAF = 1
+
+# Nodes are 4 texels (16 words), leaves are a single texel of card indices
+BVH_NODE_TEXEL_SIZE = 4
+BVH_LEAF_SIZE = 4
+BVH_INVALID_INDEX = 0xffffffff
+
+# Split modes for build_card_bvh
+SPLIT_MIDPOINT = "midpoint"
+SPLIT_SAH = "sah"
+
+SAH_BIN_COUNT = 16
+
+_EMPTY_BBOX_MIN = numpy.float32(1e+35)
+_EMPTY_BBOX_MAX = numpy.float32(-1e+35)
+
+
+def get_card_bboxes(card_data):
+    """Get the world space bboxes of packed cards.
+
+    Matches the math PythonBVHCard does, so results are bit identical
+    for float32 cards.
+
+    Args:
+        card_data (numpy.ndarray): (N, 16) float32 packed cards (see Card.pack).
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray): (N, 3) bbox min and max.
+    """
+    card_data = numpy.asarray(card_data, dtype=numpy.float32).reshape((-1, 16))
+    axis_x = card_data[:, 0:3]
+    axis_y = card_data[:, 4:7]
+    axis_z = card_data[:, 8:11]
+    origin = card_data[:, 3:12:4]
+    local_extent = card_data[:, 12:15]
+
+    offset = origin + axis_z * local_extent[:, 2:3]
+    X = axis_x * local_extent[:, 0:1]
+    Y = axis_y * local_extent[:, 1:2]
+    p0 =  X - Y
+    p1 =  X + Y
+    p2 = -X - Y
+    p3 = -X + Y
+    bbox_min = numpy.minimum(
+        numpy.minimum(p0, p1),
+        numpy.minimum(p2, p3)
+    ) + offset
+    bbox_max = numpy.maximum(
+        numpy.maximum(p0, p1),
+        numpy.maximum(p2, p3)
+    ) + offset
+    return bbox_min, bbox_max
+
+
+def _midpoint_sides(centers, node_ids, offsets):
+    """Split nodes at the middle of their centers, along the widest axis.
+
+    Args:
+        centers (numpy.ndarray): (M, 3) centers, grouped by node.
+        node_ids (numpy.ndarray): Node of each center.
+        offsets (numpy.ndarray): First center of each node.
+
+    Returns:
+        numpy.ndarray: Whether each center goes into the left child.
+    """
+    extent_min = numpy.minimum.reduceat(centers, offsets)
+    extent_max = numpy.maximum.reduceat(centers, offsets)
+    split_w = (extent_min + extent_max) * numpy.float32(0.5)
+    delta = extent_max - extent_min
 
+    # Same tie breaking as generate_bvh_python_subdivde
+    axis = numpy.where(
+        delta[:, 0] > delta[:, 1],
+        numpy.where(delta[:, 0] > delta[:, 2], 0, 2),
+        numpy.where(delta[:, 1] > delta[:, 2], 1, 2)
+    )
+    element_axis = axis[node_ids]
+    return (
+        centers[numpy.arange(len(centers)), element_axis]
+        > split_w[node_ids, element_axis]
+    )
+
+
+def _sah_sides(centers, bbox_min, bbox_max, node_ids, offsets, lengths, bin_count=SAH_BIN_COUNT):
+    """Split nodes along whichever binned centroid boundary minimizes the
+    surface area heuristic.
+
+    Args:
+        centers (numpy.ndarray): (M, 3) centers, grouped by node.
+        bbox_min (numpy.ndarray): (M, 3) bbox min of each entry.
+        bbox_max (numpy.ndarray): (M, 3) bbox max of each entry.
+        node_ids (numpy.ndarray): Node of each center.
+        offsets (numpy.ndarray): First center of each node.
+        lengths (numpy.ndarray): Entries in each node.
+        bin_count (int): Number of bins per axis.
+
+    Returns:
+        numpy.ndarray: Whether each center goes into the left child, nodes
+            which can't be split (all centers equal) go entirely right.
+    """
+    node_count = len(offsets)
+    nodes = numpy.arange(node_count)
+    centers = centers.astype(numpy.float64)
+    bbox_min = bbox_min.astype(numpy.float64)
+    bbox_max = bbox_max.astype(numpy.float64)
+
+    best_cost = numpy.full(node_count, numpy.inf)
+    best_axis = numpy.zeros(node_count, dtype=numpy.int64)
+    best_split = numpy.full(node_count, bin_count, dtype=numpy.int64)
+    element_bins = []
+
+    for axis in range(3):
+        values = centers[:, axis]
+        lower = numpy.minimum.reduceat(values, offsets)
+        extent = numpy.maximum.reduceat(values, offsets) - lower
+        scale = bin_count / numpy.where(extent > 0, extent, 1.0)
+        bins = numpy.minimum(
+            ((values - lower[node_ids]) * scale[node_ids]).astype(numpy.int64),
+            bin_count - 1
+        )
+        element_bins.append(bins)
+        groups = node_ids * bin_count + bins
+
+        counts = numpy.bincount(
+            groups,
+            minlength=node_count * bin_count
+        ).reshape((node_count, bin_count))
+        bin_min = numpy.full((node_count * bin_count, 3), numpy.inf)
+        bin_max = numpy.full((node_count * bin_count, 3), -numpy.inf)
+        numpy.minimum.at(bin_min, groups, bbox_min)
+        numpy.maximum.at(bin_max, groups, bbox_max)
+        bin_min = bin_min.reshape((node_count, bin_count, 3))
+        bin_max = bin_max.reshape((node_count, bin_count, 3))
+
+        # Split k puts bins [0, k] in one child and [k+1, bin_count) in the other
+        lower_counts = numpy.cumsum(counts, axis=1)[:, :-1]
+        upper_counts = lengths[:, None] - lower_counts
+        lower_size = (
+            numpy.maximum.accumulate(bin_max, axis=1)
+            - numpy.minimum.accumulate(bin_min, axis=1)
+        )[:, :-1]
+        upper_size = (
+            numpy.maximum.accumulate(bin_max[:, ::-1], axis=1)
+            - numpy.minimum.accumulate(bin_min[:, ::-1], axis=1)
+        )[:, -2::-1]
+
+        valid = (lower_counts > 0) & (upper_counts > 0)
+        lower_size = numpy.where(valid[:, :, None], lower_size, 0)
+        upper_size = numpy.where(valid[:, :, None], upper_size, 0)
+        lower_area = (
+            lower_size[:, :, 0] * lower_size[:, :, 1]
+            + lower_size[:, :, 1] * lower_size[:, :, 2]
+            + lower_size[:, :, 2] * lower_size[:, :, 0]
+        )
+        upper_area = (
+            upper_size[:, :, 0] * upper_size[:, :, 1]
+            + upper_size[:, :, 1] * upper_size[:, :, 2]
+            + upper_size[:, :, 2] * upper_size[:, :, 0]
+        )
+        cost = numpy.where(
+            valid,
+            lower_area * lower_counts + upper_area * upper_counts,
+            numpy.inf
+        )
+        splits = numpy.argmin(cost, axis=1)
+        cost = cost[nodes, splits]
+        better = cost < best_cost
+        best_cost[better] = cost[better]
+        best_axis[better] = axis
+        best_split[better] = splits[better]
+
+    element_bins = numpy.stack(element_bins, axis=1)
+    return (
+        element_bins[numpy.arange(len(node_ids)), best_axis[node_ids]]
+        > best_split[node_ids]
+    )
+
+
+def build_card_bvh(bbox_min, bbox_max, split_mode=SPLIT_MIDPOINT):
+    """Build a card BVH one level at a time, on struct of arrays data.
+
+    The layout is what bvh_common.glsl reads, addresses being in texels
+    (4 words):
+
+        Node (4 texels):
+            float4 V0;  // .xyz = left bbox min, .w = left type
+            float4 V1;  // .xyz = left bbox max, .w = left address
+            float4 V2;  // .xyz = right bbox min, .w = right type
+            float4 V3;  // .xyz = right bbox max, .w = right address
+
+        Leaf (1 texel):
+            uint4 cards;    // Card indices, padded with 0xffffffff
+
+    Children follow their parent depth first, left subtree before right,
+    so with SPLIT_MIDPOINT the output is identical to generate_bvh_python.
+
+    SPLIT_SAH instead picks the binned centroid split with the lowest
+    surface area cost, across all three axes.
+
+    Args:
+        bbox_min (numpy.ndarray): (N, 3) card bbox mins.
+        bbox_max (numpy.ndarray): (N, 3) card bbox maxs.
+        split_mode (str): SPLIT_MIDPOINT or SPLIT_SAH.
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray): uint32 BVH data and the
+            float32 debug bboxes (min.xyz, 0, max.xyz, 0) of every child
+            with a non zero volume, one level at a time.
+    """
+    if split_mode not in (SPLIT_MIDPOINT, SPLIT_SAH):
+        raise ValueError("Unknown split mode: {0}".format(split_mode))
+
+    bbox_min = numpy.ascontiguousarray(bbox_min, dtype=numpy.float32).reshape((-1, 3))
+    bbox_max = numpy.ascontiguousarray(bbox_max, dtype=numpy.float32).reshape((-1, 3))
+    card_count = len(bbox_min)
+    card_centers = (bbox_min + bbox_max) * numpy.float32(0.5)
+    perm = numpy.arange(card_count, dtype=numpy.int64)
+
+    # Nodes being split, as ranges of perm, always ordered by start
+    starts = numpy.zeros(1, dtype=numpy.int64)
+    lengths = numpy.full(1, card_count, dtype=numpy.int64)
+    levels = []
+
+    while len(starts):
+        node_count = len(starts)
+        offsets = numpy.cumsum(lengths) - lengths
+        node_ids = numpy.repeat(numpy.arange(node_count), lengths)
+        positions = (
+            numpy.arange(len(node_ids))
+            - numpy.repeat(offsets - starts, lengths)
+        )
+        indices = perm[positions]
+
+        if len(indices) == 0:
+            goes_left = numpy.zeros(0, dtype=bool)
+        elif split_mode == SPLIT_SAH:
+            goes_left = _sah_sides(
+                card_centers[indices],
+                bbox_min[indices],
+                bbox_max[indices],
+                node_ids,
+                offsets,
+                lengths
+            )
+        else:
+            goes_left = _midpoint_sides(card_centers[indices], node_ids, offsets)
+
+        left_lengths = numpy.bincount(
+            node_ids,
+            weights=goes_left,
+            minlength=node_count
+        ).astype(numpy.int64)
+
+        # A split leaving a big node whole would never terminate, halve it
+        stuck = (
+            (lengths > BVH_LEAF_SIZE)
+            & ((left_lengths == 0) | (left_lengths == lengths))
+        )
+        if stuck.any():
+            local = numpy.arange(len(node_ids)) - offsets[node_ids]
+            goes_left = numpy.where(
+                stuck[node_ids],
+                local < (lengths // 2)[node_ids],
+                goes_left
+            )
+            left_lengths = numpy.where(stuck, lengths // 2, left_lengths)
+
+        # Stable partition, left before right within each node
+        order = numpy.argsort(node_ids * 2 + ~goes_left, kind="stable")
+        indices = indices[order]
+        perm[positions] = indices
+
+        child_starts = numpy.stack((starts, starts + left_lengths), axis=1)
+        child_lengths = numpy.stack((left_lengths, lengths - left_lengths), axis=1)
+        child_offsets = numpy.stack((offsets, offsets + left_lengths), axis=1)
+
+        child_min = numpy.empty((node_count, 2, 3), dtype=numpy.float32)
+        child_max = numpy.empty((node_count, 2, 3), dtype=numpy.float32)
+        child_min[:] = _EMPTY_BBOX_MIN
+        child_max[:] = _EMPTY_BBOX_MAX
+        filled = child_lengths > 0
+        if filled.any():
+            child_min[filled] = numpy.minimum.reduceat(bbox_min[indices], child_offsets[filled])
+            child_max[filled] = numpy.maximum.reduceat(bbox_max[indices], child_offsets[filled])
+
+        is_node = child_lengths > BVH_LEAF_SIZE
+        next_ids = numpy.full((node_count, 2), -1, dtype=numpy.int64)
+        next_ids[is_node] = numpy.arange(numpy.count_nonzero(is_node))
+        levels.append((child_starts, child_lengths, child_min, child_max, is_node, next_ids))
+
+        starts = child_starts[is_node]
+        lengths = child_lengths[is_node]
+
+    # Subtree sizes bottom up, then addresses top down
+    node_sizes = []
+    next_sizes = numpy.zeros(0, dtype=numpy.int64)
+    for _, _, _, _, is_node, next_ids in reversed(levels):
+        child_sizes = numpy.ones(is_node.shape, dtype=numpy.int64)
+        child_sizes[is_node] = next_sizes[next_ids[is_node]]
+        next_sizes = BVH_NODE_TEXEL_SIZE + child_sizes.sum(axis=1)
+        node_sizes.append(child_sizes)
+    node_sizes.reverse()
+
+    total_size = int(next_sizes[0])
+    data = numpy.empty(total_size * 4, dtype=numpy.uint32)
+    debug_bboxes = []
+    word_offsets = numpy.arange(16)
+
+    # Leaf slots past the last card read padding
+    padded_perm = numpy.append(perm, numpy.full(BVH_LEAF_SIZE, BVH_INVALID_INDEX))
+
+    addresses = numpy.zeros(1, dtype=numpy.int64)
+    for (child_starts, child_lengths, child_min, child_max, is_node, next_ids), child_sizes in zip(levels, node_sizes):
+        node_count = len(addresses)
+        child_addresses = numpy.stack((
+            addresses + BVH_NODE_TEXEL_SIZE,
+            addresses + BVH_NODE_TEXEL_SIZE + child_sizes[:, 0]
+        ), axis=1)
+
+        words = numpy.empty((node_count, 2, 2, 4), dtype=numpy.uint32)
+        words[:, :, 0, :3] = child_min.view(numpy.uint32)
+        words[:, :, 0, 3] = numpy.where(is_node, BVH_NODE_TYPE_NODE, BVH_NODE_TYPE_LEAF)
+        words[:, :, 1, :3] = child_max.view(numpy.uint32)
+        words[:, :, 1, 3] = child_addresses
+        data[(addresses * 4)[:, None] + word_offsets] = words.reshape((node_count, 16))
+
+        is_leaf = ~is_node
+        leaf_slots = child_starts[is_leaf][:, None] + numpy.arange(BVH_LEAF_SIZE)
+        leaf_cards = numpy.where(
+            numpy.arange(BVH_LEAF_SIZE) < child_lengths[is_leaf][:, None],
+            padded_perm[leaf_slots],
+            BVH_INVALID_INDEX
+        )
+        data[(child_addresses[is_leaf] * 4)[:, None] + numpy.arange(4)] = leaf_cards
+
+        has_volume = (child_min < child_max).all(axis=2)
+        debug = numpy.zeros((numpy.count_nonzero(has_volume), 8), dtype=numpy.float32)
+        debug[:, 0:3] = child_min[has_volume]
+        debug[:, 4:7] = child_max[has_volume]
+        debug_bboxes.append(debug.ravel())
+
+        # next_ids are allocated in row major order, so this lines up
+        addresses = child_addresses[is_node]
+
+    return data, numpy.concatenate(debug_bboxes)
+
+
+def generate_bvh(card_buffer, split_mode=SPLIT_MIDPOINT):
+    """Vectorized replacement for generate_bvh_python.
+
+    Args:
+        card_buffer (CardBuffer): Cards to build a BVH of.
+        split_mode (str): SPLIT_MIDPOINT or SPLIT_SAH.
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray): uint32 BVH data and float32
+            debug bboxes.
+    """
+    bbox_min, bbox_max = get_card_bboxes(card_buffer.data)
+    return build_card_bvh(bbox_min, bbox_max, split_mode)
+
+
+# How much the SAH cost can grow by before CardBVH.refit rebuilds instead
+DEFAULT_REBUILD_THRESHOLD = 1.5
+
+
+def get_card_bvh_levels(bvh_data):
+    """Walk a card BVH one level at a time.
+
+    Args:
+        bvh_data (numpy.ndarray): uint32 BVH data.
+
+    Returns:
+        list(tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray)): Per level,
+            the node addresses, the (n, 2) child types and (n, 2) child
+            addresses, in the order build_card_bvh allocates them.
+    """
+    texels = bvh_data.reshape((-1, 4))
+    levels = []
+    addresses = numpy.zeros(1, dtype=numpy.int64)
+    while len(addresses):
+        nodes = texels[addresses[:, None] + numpy.arange(BVH_NODE_TEXEL_SIZE)]
+        child_types = nodes[:, 0::2, 3]
+        child_addresses = nodes[:, 1::2, 3].astype(numpy.int64)
+        levels.append((addresses, child_types, child_addresses))
+        addresses = child_addresses[child_types == BVH_NODE_TYPE_NODE]
+    return levels
+
+
+def card_bvh_sah_cost(bvh_data, levels=None):
+    """Estimate how expensive a card BVH is to trace, via the surface area
+    heuristic, every entry costs its area relative to the root and leaves
+    that again per card.
+
+    Args:
+        bvh_data (numpy.ndarray): uint32 BVH data.
+        levels (list): Result of get_card_bvh_levels if already known.
+
+    Returns:
+        float: Cost.
+    """
+    if levels is None:
+        levels = get_card_bvh_levels(bvh_data)
+    texels = bvh_data.reshape((-1, 4))
+    float_texels = texels.view(numpy.float32)
+
+    def area(bbox_min, bbox_max):
+        size = numpy.maximum(bbox_max.astype(numpy.float64) - bbox_min, 0.0)
+        return (
+            size[..., 0] * size[..., 1]
+            + size[..., 1] * size[..., 2]
+            + size[..., 2] * size[..., 0]
+        )
+
+    root = float_texels[0:4, :3]
+    root_area = area(
+        numpy.minimum(root[0], root[2]),
+        numpy.maximum(root[1], root[3])
+    )
+    if root_area <= 0.0:
+        return 0.0
+
+    cost = 0.0
+    for addresses, child_types, child_addresses in levels:
+        nodes = float_texels[addresses[:, None] + numpy.arange(BVH_NODE_TEXEL_SIZE), :3]
+        entry_area = area(nodes[:, 0::2], nodes[:, 1::2])
+        is_leaf = child_types == BVH_NODE_TYPE_LEAF
+        leaf_sizes = numpy.count_nonzero(
+            texels[child_addresses[is_leaf]] != BVH_INVALID_INDEX,
+            axis=1
+        )
+        cost += entry_area[~is_leaf].sum() + (entry_area[is_leaf] * leaf_sizes).sum()
+    return cost / root_area
+
+
+class CardBVH(object):
+    """A card BVH which can be refit in place when cards move.
+
+    Refitting keeps the node layout and only recomputes the bboxes of
+    nodes above changed cards, one level at a time from the bottom up.
+    Once the SAH cost has grown past rebuild_threshold times what it was
+    when built, it is rebuilt from scratch instead.
+    """
+
+    def __init__(self, bbox_min, bbox_max, split_mode=SPLIT_MIDPOINT, rebuild_threshold=DEFAULT_REBUILD_THRESHOLD):
+        self.split_mode = split_mode
+        self.rebuild_threshold = rebuild_threshold
+        self.data = None
+        self.num_cards = 0
+        self.build_cost = 0.0
+        self.cost = 0.0
+        self.rebuild(bbox_min, bbox_max)
+
+
+    @classmethod
+    def from_card_buffer(cls, card_buffer, split_mode=SPLIT_MIDPOINT, rebuild_threshold=DEFAULT_REBUILD_THRESHOLD):
+        bbox_min, bbox_max = get_card_bboxes(card_buffer.data)
+        return cls(bbox_min, bbox_max, split_mode, rebuild_threshold)
+
+
+    def rebuild(self, bbox_min, bbox_max):
+        """Build the BVH from scratch.
+
+        Args:
+            bbox_min (numpy.ndarray): (N, 3) card bbox mins.
+            bbox_max (numpy.ndarray): (N, 3) card bbox maxs.
+        """
+        self.data, _ = build_card_bvh(bbox_min, bbox_max, self.split_mode)
+        self.num_cards = len(bbox_min)
+        self._levels = get_card_bvh_levels(self.data)
+
+        texels = self.data.reshape((-1, 4))
+        leaf_addresses = numpy.concatenate([
+            child_addresses[child_types == BVH_NODE_TYPE_LEAF]
+            for _, child_types, child_addresses in self._levels
+        ])
+        leaf_cards = texels[leaf_addresses]
+        valid = leaf_cards != BVH_INVALID_INDEX
+        self._leaf_addresses = leaf_addresses
+        self._card_leaves = numpy.zeros(self.num_cards, dtype=numpy.int64)
+        self._card_leaves[leaf_cards[valid]] = numpy.repeat(
+            leaf_addresses,
+            valid.sum(axis=1)
+        )
+
+        self.build_cost = self.cost = card_bvh_sah_cost(self.data, self._levels)
+
+
+    def refit(self, bbox_min, bbox_max, changed=None):
+        """Update the BVH after cards have moved.
+
+        Args:
+            bbox_min (numpy.ndarray): (N, 3) card bbox mins.
+            bbox_max (numpy.ndarray): (N, 3) card bbox maxs.
+            changed (iterable[int]): Indices of the cards which changed,
+                None if they all may have.
+
+        Returns:
+            bool: True if the BVH had to be rebuilt.
+        """
+        bbox_min = numpy.asarray(bbox_min, dtype=numpy.float32).reshape((-1, 3))
+        bbox_max = numpy.asarray(bbox_max, dtype=numpy.float32).reshape((-1, 3))
+        if len(bbox_min) != self.num_cards:
+            self.rebuild(bbox_min, bbox_max)
+            return True
+
+        texels = self.data.reshape((-1, 4))
+        float_texels = texels.view(numpy.float32)
+        dirty = numpy.zeros(len(texels), dtype=bool)
+        if changed is None:
+            dirty[self._leaf_addresses] = True
+        else:
+            changed = numpy.asarray(changed, dtype=numpy.int64).ravel()
+            if not len(changed):
+                return False
+            dirty[self._card_leaves[changed]] = True
+
+        for addresses, child_types, child_addresses in reversed(self._levels):
+            update = dirty[child_addresses].any(axis=1)
+            if not update.any():
+                continue
+            addresses = addresses[update]
+            child_types = child_types[update]
+            child_addresses = child_addresses[update]
+
+            child_min = numpy.empty((len(addresses), 2, 3), dtype=numpy.float32)
+            child_max = numpy.empty((len(addresses), 2, 3), dtype=numpy.float32)
+
+            is_leaf = child_types == BVH_NODE_TYPE_LEAF
+            leaf_cards = texels[child_addresses[is_leaf]]
+            valid = (leaf_cards != BVH_INVALID_INDEX)[:, :, None]
+            leaf_cards = numpy.where(valid[:, :, 0], leaf_cards, 0)
+            child_min[is_leaf] = numpy.where(valid, bbox_min[leaf_cards], _EMPTY_BBOX_MIN).min(axis=1)
+            child_max[is_leaf] = numpy.where(valid, bbox_max[leaf_cards], _EMPTY_BBOX_MAX).max(axis=1)
+
+            # Deeper levels are already up to date
+            is_node = ~is_leaf
+            nodes = float_texels[child_addresses[is_node][:, None] + numpy.arange(BVH_NODE_TEXEL_SIZE), :3]
+            child_min[is_node] = numpy.minimum(nodes[:, 0], nodes[:, 2])
+            child_max[is_node] = numpy.maximum(nodes[:, 1], nodes[:, 3])
+
+            float_texels[addresses, :3] = child_min[:, 0]
+            float_texels[addresses + 1, :3] = child_max[:, 0]
+            float_texels[addresses + 2, :3] = child_min[:, 1]
+            float_texels[addresses + 3, :3] = child_max[:, 1]
+            dirty[addresses] = True
+
+        self.cost = card_bvh_sah_cost(self.data, self._levels)
+        if self.cost > self.build_cost * self.rebuild_threshold:
+            self.rebuild(bbox_min, bbox_max)
+            return True
+        return False
+
+
+    def refit_from_card_buffer(self, card_buffer, changed=None):
+        """Refit from a CardBuffer's data, see refit."""
+        bbox_min, bbox_max = get_card_bboxes(card_buffer.data)
+        return self.refit(bbox_min, bbox_max, changed)
+
+
+    @property
+    def debug_bboxes(self):
+        """numpy.ndarray: float32 (min.xyz, 0, max.xyz, 0) of every entry
+        with a non zero volume."""
+        float_texels = self.data.reshape((-1, 4)).view(numpy.float32)
+        debug_bboxes = []
+        for addresses, _, _ in self._levels:
+            nodes = float_texels[addresses[:, None] + numpy.arange(BVH_NODE_TEXEL_SIZE), :3]
+            child_min = nodes[:, 0::2]
+            child_max = nodes[:, 1::2]
+            has_volume = (child_min < child_max).all(axis=2)
+            debug = numpy.zeros((numpy.count_nonzero(has_volume), 8), dtype=numpy.float32)
+            debug[:, 0:3] = child_min[has_volume]
+            debug[:, 4:7] = child_max[has_volume]
+            debug_bboxes.append(debug.ravel())
+        return numpy.concatenate(debug_bboxes)
@@ -53,18 +53,56 @@ class Card(object):
         return data.tobytes()
 
 
+# Floats per card, packed (see Card.pack) and as exported by data/card_bvh/export_cards.py
+CARD_PACKED_FLOAT_COUNT = 16
+CARD_EXPORTED_FLOAT_COUNT = 15
+
+
+def pack_exported_cards(exported):
+    """Convert exported card data into the packed layout.
+
+    Args:
+        exported (numpy.ndarray): (N, 15) float32 cards
+            (axis_x, axis_y, axis_z, origin, local_extent).
+
+    Returns:
+        numpy.ndarray: (N, 16) float32 packed cards.
+    """
+    exported = numpy.asarray(exported, dtype=numpy.float32).reshape(
+        (-1, CARD_EXPORTED_FLOAT_COUNT)
+    )
+    data = numpy.zeros((len(exported), CARD_PACKED_FLOAT_COUNT), dtype=numpy.float32)
+    data[:, 0:3] = exported[:, 0:3]
+    data[:, 4:7] = exported[:, 3:6]
+    data[:, 8:11] = exported[:, 6:9]
+    data[:, 3:12:4] = exported[:, 9:12]
+    data[:, 12:15] = exported[:, 12:15]
+    return data
+
+
 class CardBuffer(object):
+    """Cards stored as a single (N, 16) float32 array, which is what gets
+    uploaded, Card objects are only made when asked for."""
 
     def __init__(self, cards):
-        self.cards = cards
-        self.num_cards = len(cards)
+        if isinstance(cards, numpy.ndarray):
+            data = cards
+        else:
+            # frombuffer views are read-only, so copy into a fresh array
+            data = numpy.array(
+                [numpy.frombuffer(card.pack(), dtype=numpy.float32) for card in cards],
+                dtype=numpy.float32
+            )
+        self.data = numpy.ascontiguousarray(data, dtype=numpy.float32).reshape(
+            (-1, CARD_PACKED_FLOAT_COUNT)
+        )
+        # data gets edited in place before upload(), so it has to be writable
+        if not self.data.flags.writeable:
+            self.data = self.data.copy()
+        self.num_cards = len(self.data)
         self.ssbo = None
 
-        card_data = b''
-        for card in cards:
-            card_data += card.pack()
-
-        self.ssbo_size = len(card_data)
+        self.ssbo_size = self.data.nbytes
         ssbo_ptr = ctypes.c_int()
         glCreateBuffers(1, ssbo_ptr)
         self.ssbo = ssbo_ptr.value
@@ -72,30 +110,63 @@ class CardBuffer(object):
         glNamedBufferStorage(
             self.ssbo,
             self.ssbo_size,
-            card_data,
-            0,
+            self.data,
+            GL_DYNAMIC_STORAGE_BIT,
         )
 
 
     @classmethod
     def load_from_file(cls, filepath):
-        with open(filepath, "rb") as in_fp:
-            data = numpy.frombuffer(in_fp.read(), dtype=numpy.float32)
-        cards = []
-        for idx in range(0, len(data), 15):
-            axis_x = data[idx:idx+3]
-            axis_y = data[idx+3:idx+6]
-            axis_z = data[idx+6:idx+9]
-            origin = data[idx+9:idx+12]
-            local_extent = data[idx+12:idx+15]
-            cards.append(Card(
-                axis_x = axis_x,
-                axis_y = axis_y,
-                axis_z = axis_z,
-                origin = origin,
-                local_extent = local_extent,
-            ))
-        return cls(cards)
+        exported = numpy.fromfile(filepath, dtype=numpy.float32)
+        return cls(pack_exported_cards(exported))
+
+
+    def get_card(self, index):
+        """Get a card, its attributes are views into the buffer data.
+
+        Args:
+            index (int): Card index.
+
+        Returns:
+            Card: Card.
+        """
+        card_data = self.data[index]
+        return Card(
+            axis_x = card_data[0:3],
+            axis_y = card_data[4:7],
+            axis_z = card_data[8:11],
+            origin = card_data[3:12:4],
+            local_extent = card_data[12:15],
+        )
+
+
+    def upload(self, changed=None):
+        """Upload cards after editing data.
+
+        Args:
+            changed (iterable[int]): Indices of the cards which changed,
+                None to upload everything.
+        """
+        if changed is None:
+            first, last = 0, self.num_cards
+        else:
+            changed = numpy.asarray(changed, dtype=numpy.int64).ravel()
+            if not len(changed):
+                return
+            first, last = int(changed.min()), int(changed.max()) + 1
+
+        card_size = CARD_PACKED_FLOAT_COUNT * 4
+        glNamedBufferSubData(
+            self.ssbo,
+            first * card_size,
+            (last - first) * card_size,
+            self.data[first:last]
+        )
+
+
+    @property
+    def cards(self):
+        return [self.get_card(i) for i in range(self.num_cards)]
 
 
     def __del__(self):
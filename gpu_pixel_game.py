@@ -5,10 +5,12 @@ import numpy
 import time
 
 from OpenGL.GL import *
+from OpenGL.GL.EXT import texture_compression_s3tc
 from ctypes import c_void_p
 from PIL import Image
 
 import viewport
+import bcn_lib
 import gpu_pixel_game_lib
 
 _DEBUGGING = False
@@ -242,6 +244,40 @@ class Renderer(object):
             asset_image_data
         )
         return asset_tex
+
+    @staticmethod
+    def _load_asset_dds(dds_path):
+        fmt, width, height, block_data = bcn_lib.read_dds(dds_path)
+        internal_format = {
+            bcn_lib.FORMAT_BC1: texture_compression_s3tc.GL_COMPRESSED_RGB_S3TC_DXT1_EXT,
+            bcn_lib.FORMAT_BC3: texture_compression_s3tc.GL_COMPRESSED_RGBA_S3TC_DXT5_EXT,
+        }[fmt]
+        texture_ptr = ctypes.c_int()
+        glCreateTextures(GL_TEXTURE_2D, 1, texture_ptr)
+        asset_tex = texture_ptr.value
+
+        glTextureParameteri(asset_tex, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTextureParameteri(asset_tex, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTextureParameteri(asset_tex, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTextureParameteri(asset_tex, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+
+        glTextureStorage2D(asset_tex, 1, internal_format, width, height)
+        glCompressedTextureSubImage2D(
+            asset_tex, 0, 0, 0,
+            width,
+            height,
+            internal_format,
+            len(block_data),
+            block_data
+        )
+        return asset_tex
+
+    @classmethod
+    def _load_asset_texture(cls, dds_path, png_path):
+        # Block compressed atlases are written by tiles_to_atlas.py
+        if os.path.exists(dds_path):
+            return cls._load_asset_dds(dds_path)
+        return cls._load_asset_png(png_path)
     
     def _init(self, wnd):
         glClearColor(0.0, 0.0, 0.0, 0.0)
@@ -253,10 +289,12 @@ class Renderer(object):
         self._asset_atlas_data = buffer_ptr[0]
         glNamedBufferStorage(self._asset_atlas_data, len(asset_atlas_data), asset_atlas_data, 0)
 
-        self._asset_atlas_base = self._load_asset_png(
+        self._asset_atlas_base = self._load_asset_texture(
+            gpu_pixel_game_lib.ASSET_ATLAS_BASE_DDS,
             gpu_pixel_game_lib.ASSET_ATLAS_BASE
         )
-        self._asset_atlas_norm = self._load_asset_png(
+        self._asset_atlas_norm = self._load_asset_texture(
+            gpu_pixel_game_lib.ASSET_ATLAS_NORM_DDS,
             gpu_pixel_game_lib.ASSET_ATLAS_NORM
         )
 
@@ -632,8 +670,8 @@ class Renderer(object):
                 glBindBufferBase(GL_UNIFORM_BUFFER, 0, self._global_parameters)
                 glBindImageTexture(1, self._map_atlas, 0, False, 0, GL_READ_ONLY, GL_R32UI)
                 glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 2, self._asset_atlas_data)
-                glBindImageTexture(3, self._asset_atlas_base, 0, False, 0, GL_READ_ONLY, GL_RGBA8)
-                glBindImageTexture(4, self._asset_atlas_norm, 0, False, 0, GL_READ_ONLY, GL_RGBA8)
+                glBindTextureUnit(3, self._asset_atlas_base)
+                glBindTextureUnit(4, self._asset_atlas_norm)
                 glBindTextureUnit(5, self._df_bg_map.texture)
                 glDrawArrays(GL_TRIANGLES, 0, ACTIVE_NUM_TILES * ACTIVE_NUM_TILES * 6)
 
@@ -25,6 +25,8 @@ DRAW_BVH_DEBUG_FRAG = os.path.join(_OLD_SHADER_DIR, "draw_bvh_debug.frag")
 ASSET_ATLAS_DATA = os.path.join(_ASSETS_DIR, "ASSET_ATLAS.dat")
 ASSET_ATLAS_BASE = os.path.join(_ASSETS_DIR, "ATLAS_BASE.png")
 ASSET_ATLAS_NORM = os.path.join(_ASSETS_DIR, "ATLAS_NORM.png")
+ASSET_ATLAS_BASE_DDS = os.path.join(_ASSETS_DIR, "ATLAS_BASE.dds")
+ASSET_ATLAS_NORM_DDS = os.path.join(_ASSETS_DIR, "ATLAS_NORM.dds")
 
 
 GEN_MAP_ATLAS_COMP = os.path.join(_SHADER_DIR, "initlevels", "gen_map_atlas.comp")
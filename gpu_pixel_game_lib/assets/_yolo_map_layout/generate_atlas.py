@@ -1,7 +1,14 @@
 import os
+import sys
 import numpy
 from PIL import Image
 
+sys.path.append(os.path.abspath(
+    os.path.join(__file__, "..", "..", "..", "..")
+))
+
+from gpu_pixel_game_lib import atlas_packer
+
 
 # This is all very messy and confusing, the switching between [x, y] and [y, x] only
 # makes it worse.
@@ -15,6 +22,20 @@ _FORCE_POWER_OF_TWO = True
 _BLOCK_SIZE = 1
 _X_ALIGNMENT = 4
 
+# Level offsets hardcoded by getLevelAtlasInfo in shaders/map_atlas_common.glsli,
+# textures are named by level + 1. Kept as the previous placement so the
+# layout doesn't move under the shader, update both together.
+_LEVEL_OFFSETS = {
+    0: (64, 84),
+    1: (40, 64),
+    2: (96, 81),
+    3: (96, 52),
+    4: (64, 52),
+    5: (0, 64),
+    6: (64, 0),
+    7: (0, 0),
+}
+
 def _gather_texture_mapping():
     """Gather a mapping of textures to their respective layers.
 
@@ -108,112 +129,30 @@ def _calculate_placement(mappings):
     Returns:
         tuple: Final texture dimensions (wxh)
     """
-    mapping_values = sorted(
-        mappings.values(),
-        key=lambda x: (x["numpixels"], x["name"]),
-        reverse=True
+    sizes = {
+        name: (
+            (mapping["roi"][3] - mapping["roi"][1]) // _BLOCK_SIZE,
+            (mapping["roi"][2] - mapping["roi"][0]) // _BLOCK_SIZE
+        )
+        for name, mapping in mappings.items()
+    }
+    previous = {}
+    for level, (x, y) in _LEVEL_OFFSETS.items():
+        name = str(level + 1)
+        if name in sizes:
+            previous[name] = (x // _BLOCK_SIZE, y // _BLOCK_SIZE) + sizes[name]
+    placements, extent = atlas_packer.pack_rects(
+        sizes,
+        previous,
+        alignment=(_X_ALIGNMENT, 1),
+        power_of_two=_FORCE_POWER_OF_TWO
     )
+    texture_size = (extent[0] * _BLOCK_SIZE, extent[1] * _BLOCK_SIZE)
 
-    blocks = None
-
-    for mapping in mapping_values:
-        num_y = mapping["block_size"][0]
-        num_x = mapping["block_size"][1]
+    for name, mapping in mappings.items():
+        x, y = placements[name]
+        mapping["coord"] = (y * _BLOCK_SIZE, x * _BLOCK_SIZE)
 
-        if blocks is None:
-            blocks = numpy.zeros((num_y, num_x), dtype=bool)
-            mapping["coord"] = (0, 0)
-            continue
-
-        end_x = blocks.shape[1]
-        end_y = blocks.shape[0]
-
-        # find first free space, not espeically efficient
-        if end_y > num_y and end_x > num_x:
-            y_search_end = blocks.shape[0] - num_y + 1
-            x_search_end = blocks.shape[1] - num_x + 1
-            found = False
-            for y in range(y_search_end):
-                for x in numpy.where(blocks[y, 0:x_search_end])[0]:
-
-                    if (x & (_X_ALIGNMENT) != 0):
-                        continue
-
-                    if numpy.all(blocks[y:(y+num_y),x:(x+num_x)]):
-                        blocks[y:(y+num_y),x:(x+num_x)] = False
-                        mapping["coord"] = (y * _BLOCK_SIZE, x * _BLOCK_SIZE)
-                        found = True
-                        break
-                if found:
-                    break
-            if found:
-                continue
-
-        # Need to reallocate:
-        #   * Add the bottom if it's wider then tall
-        #   * Add to right if it's taller than wide
-        #   * If it's square, put it on whatever axis
-        #     is smaller.
-        expand_dir = end_x > end_y
-        if num_x > num_y:
-            expand_dir = True
-        elif num_y > num_x:
-            expand_dir = False
-
-        if expand_dir:
-            mapping["coord"] = (end_y * _BLOCK_SIZE, 0)
-            new_shape = (
-                end_y + num_y,
-                max(end_x, num_x)
-            )
-            allocate_roi = (
-                end_y,
-                0,
-                end_y + num_y,
-                num_x
-            )
-        else:
-            mapping["coord"] = (0, end_x * _BLOCK_SIZE)
-            new_shape = (
-                max(end_y, num_y),
-                end_x + num_x,
-            )
-            allocate_roi = (
-                0,
-                end_x,
-                num_y,
-                end_x + num_x,
-            )
-
-        if _FORCE_POWER_OF_TWO:
-            def round_to_power2(x):
-                if (x & (x-1)) != 0:
-                    x |= (x >> 1)
-                    x |= (x >> 2)
-                    x |= (x >> 4)
-                    x |= (x >> 8)
-                    x |= (x >> 16)
-                    x |= (x >> 32)
-                    x += 1
-                return x
-
-            new_shape = (
-                round_to_power2(new_shape[0]),
-                round_to_power2(new_shape[1])
-            )
-
-        new_blocks = numpy.ones(new_shape, dtype=bool)
-        new_blocks[0:end_y, 0:end_x] = blocks
-        new_blocks[
-            allocate_roi[0]:allocate_roi[2],
-            allocate_roi[1]:allocate_roi[3]
-        ] = False
-        blocks = new_blocks
-
-
-    texture_size = (blocks.shape[0] * _BLOCK_SIZE, blocks.shape[1] * _BLOCK_SIZE)
-
-    for mapping in mapping_values:
         roi = mapping["roi"]
         coord = mapping["coord"]
         pixel_region = (
@@ -227,16 +166,10 @@ def _calculate_placement(mappings):
             pixel_region[2] / texture_size[0],
             pixel_region[3] / texture_size[1]
         )
-        local_uv_region = (
-            roi[1] / mapping["size"][1],
-            roi[3] / mapping["size"][1],
-            roi[0] / mapping["size"][0],
-            roi[2] / mapping["size"][0]
-        )
         mapping["atlas_pixel_region"] = pixel_region
         mapping["atlas_uv_region"] = uv_region
 
-    return (blocks.shape[1] * _BLOCK_SIZE, blocks.shape[0] * _BLOCK_SIZE)
+    return texture_size
 
 
 def generate_atlas(width, height, mappings, layer_name):
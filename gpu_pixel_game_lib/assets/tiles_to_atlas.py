@@ -1,7 +1,17 @@
+import argparse
 import os
+import re
+import sys
 import numpy
 from PIL import Image
 
+sys.path.append(os.path.abspath(
+    os.path.join(__file__, "..", "..", "..")
+))
+
+import bcn_lib
+from gpu_pixel_game_lib import atlas_packer
+
 
 # This is all very messy and confusing, the switching between [x, y] and [y, x] only
 # makes it worse.
@@ -9,6 +19,8 @@ from PIL import Image
 _TILES_DIR = os.path.abspath(os.path.join(__file__, "..", "tiles"))
 _ATLAS_BASE = os.path.abspath(os.path.join(__file__, "..", "ATLAS_BASE.png"))
 _ATLAS_NORM = os.path.abspath(os.path.join(__file__, "..", "ATLAS_NORM.png"))
+_ATLAS_BASE_DDS = os.path.abspath(os.path.join(__file__, "..", "ATLAS_BASE.dds"))
+_ATLAS_NORM_DDS = os.path.abspath(os.path.join(__file__, "..", "ATLAS_NORM.dds"))
 _ATLAS_GLSL_IDS = os.path.abspath(os.path.join(__file__, "..", "ASSET_ATLAS.glsl"))
 _ATLAS_DATA = os.path.abspath(os.path.join(__file__, "..", "ASSET_ATLAS.dat"))
 
@@ -16,6 +28,11 @@ _ATLAS_DATA = os.path.abspath(os.path.join(__file__, "..", "ASSET_ATLAS.dat"))
 _FORCE_POWER_OF_TWO = False
 _BLOCK_SIZE = 4
 
+# Base needs alpha so is BC3, normals only use xyz so are BC1
+_ATLAS_BASE_FORMAT = bcn_lib.FORMAT_BC3
+_ATLAS_NORM_FORMAT = bcn_lib.FORMAT_BC1
+_COMPRESSION_QUALITY = bcn_lib.QUALITY_HIGH
+
 def _gather_texture_mapping():
     """Gather a mapping of textures to their respective layers.
 
@@ -100,117 +117,72 @@ def _calculate_roi(mappings):
         )
 
 
-def _calculate_placement(mappings):
-    """Calculate the placement of tiles within the atlas.
-    
-    Args:
-        mappings (dict): Mapping.
+def _load_previous_placement():
+    """Load the placement written by a previous run, from ASSET_ATLAS.glsl
+    and ASSET_ATLAS.dat.
 
     Returns:
-        tuple: Final texture dimensions (wxh)
+        tuple(dict, tuple): Name to (x, y, width, height) in blocks and the
+            previous texture dimensions (wxh), empty and (0, 0) if there
+            was no previous run.
     """
-    mapping_values = sorted(
-        mappings.values(),
-        key=lambda x: (x["numpixels"], x["name"]),
-        reverse=True
+    if not os.path.exists(_ATLAS_GLSL_IDS) or not os.path.exists(_ATLAS_DATA):
+        return {}, (0, 0)
+
+    with open(_ATLAS_GLSL_IDS, "r") as in_fp:
+        glsl = in_fp.read()
+    ids = {
+        name: int(index)
+        for name, index in re.findall(r"#define ASSET_ATLAS_ID_(\w+)\s+(\d+)", glsl)
+    }
+    texture_size = tuple(
+        int(re.search(r"#define ASSET_ATLAS_{0}\s+(\d+)".format(axis), glsl).group(1))
+        for axis in ("WIDTH", "HEIGHT")
     )
 
-    blocks = None
-
-    for mapping in mapping_values:
-        num_y = mapping["block_size"][0]
-        num_x = mapping["block_size"][1]
-
-        if blocks is None:
-            blocks = numpy.zeros((num_y, num_x), dtype=bool)
-            mapping["coord"] = (0, 0)
+    entries = numpy.fromfile(_ATLAS_DATA, dtype=numpy.uint16).reshape(-1, 8)
+    previous = {}
+    for name, index in ids.items():
+        if index >= len(entries):
             continue
+        x0, y0, x1, y1 = (int(v) // _BLOCK_SIZE for v in entries[index][:4])
+        previous[name] = (x0, y0, x1 - x0, y1 - y0)
+    return previous, texture_size
 
-        end_x = blocks.shape[1]
-        end_y = blocks.shape[0]
-
-        # find first free space, not espeically efficient
-        if end_y > num_y and end_x > num_x:
-            y_search_end = blocks.shape[0] - num_y + 1
-            x_search_end = blocks.shape[1] - num_x + 1
-            found = False
-            for y in range(y_search_end):
-                for x in numpy.where(blocks[y, 0:x_search_end])[0]:
-                    if numpy.all(blocks[y:(y+num_y),x:(x+num_x)]):
-                        blocks[y:(y+num_y),x:(x+num_x)] = False
-                        mapping["coord"] = (y * _BLOCK_SIZE, x * _BLOCK_SIZE)
-                        found = True
-                        break
-                if found:
-                    break
-            if found:
-                continue
-
-        # Need to reallocate:
-        #   * Add the bottom if it's wider then tall
-        #   * Add to right if it's taller than wide
-        #   * If it's square, put it on whatever axis
-        #     is smaller.
-        expand_dir = end_x > end_y
-        if num_x > num_y:
-            expand_dir = True
-        elif num_y > num_x:
-            expand_dir = False
-
-        if expand_dir:
-            mapping["coord"] = (end_y * _BLOCK_SIZE, 0)
-            new_shape = (
-                end_y + num_y,
-                max(end_x, num_x)
-            )
-            allocate_roi = (
-                end_y,
-                0,
-                end_y + num_y,
-                num_x
-            )
-        else:
-            mapping["coord"] = (0, end_x * _BLOCK_SIZE)
-            new_shape = (
-                max(end_y, num_y),
-                end_x + num_x,
-            )
-            allocate_roi = (
-                0,
-                end_x,
-                num_y,
-                end_x + num_x,
-            )
 
-        if _FORCE_POWER_OF_TWO:
-            def round_to_power2(x):
-                if (x & (x-1)) != 0:
-                    x |= (x >> 1)
-                    x |= (x >> 2)
-                    x |= (x >> 4)
-                    x |= (x >> 8)
-                    x |= (x >> 16)
-                    x |= (x >> 32)
-                    x += 1
-                return x
-
-            new_shape = (
-                round_to_power2(new_shape[0]),
-                round_to_power2(new_shape[1])
-            )
+def _calculate_placement(mappings, previous=None, previous_size=(0, 0)):
+    """Calculate the placement of tiles within the atlas.
 
-        new_blocks = numpy.ones(new_shape, dtype=bool)
-        new_blocks[0:end_y, 0:end_x] = blocks
-        new_blocks[
-            allocate_roi[0]:allocate_roi[2],
-            allocate_roi[1]:allocate_roi[3]
-        ] = False
-        blocks = new_blocks
+    Args:
+        mappings (dict): Mapping.
+        previous (dict): Previous placement from _load_previous_placement,
+            tiles which haven't changed size keep their place.
+        previous_size (tuple): Previous texture dimensions (wxh), the atlas
+            doesn't shrink below it so the existing uvs stay valid.
 
+    Returns:
+        tuple: Final texture dimensions (wxh)
+    """
+    # Sizes in blocks, from the roi so they always match the pixel region
+    sizes = {
+        name: (
+            (mapping["roi"][3] - mapping["roi"][1]) // _BLOCK_SIZE,
+            (mapping["roi"][2] - mapping["roi"][0]) // _BLOCK_SIZE
+        )
+        for name, mapping in mappings.items()
+    }
+    placements, extent = atlas_packer.pack_rects(
+        sizes, previous, power_of_two=_FORCE_POWER_OF_TWO
+    )
+    texture_size = (
+        max(extent[0] * _BLOCK_SIZE, previous_size[0]),
+        max(extent[1] * _BLOCK_SIZE, previous_size[1])
+    )
 
-    texture_size = (blocks.shape[0] * _BLOCK_SIZE, blocks.shape[1] * _BLOCK_SIZE)
+    for name, mapping in mappings.items():
+        x, y = placements[name]
+        mapping["coord"] = (y * _BLOCK_SIZE, x * _BLOCK_SIZE)
 
-    for mapping in mapping_values:
         roi = mapping["roi"]
         coord = mapping["coord"]
         pixel_region = (
@@ -224,16 +196,10 @@ def _calculate_placement(mappings):
             pixel_region[2] / texture_size[0],
             pixel_region[3] / texture_size[1]
         )
-        local_uv_region = (
-            roi[1] / mapping["size"][1],
-            roi[3] / mapping["size"][1],
-            roi[0] / mapping["size"][0],
-            roi[2] / mapping["size"][0]
-        )
         mapping["atlas_pixel_region"] = pixel_region
         mapping["atlas_uv_region"] = uv_region
 
-    return (blocks.shape[1] * _BLOCK_SIZE, blocks.shape[0] * _BLOCK_SIZE)
+    return texture_size
 
 
 def generate_atlas(width, height, mappings, layer_name):
@@ -274,6 +240,24 @@ def generate_atlas(width, height, mappings, layer_name):
     return Image.fromarray(data)
 
 
+def write_compressed_atlas(image, filepath, fmt):
+    """Block compress an atlas, unchanged atlases come from the texture
+    cache.
+
+    Args:
+        image (PIL.Image.Image): RGBA atlas.
+        filepath (str): DDS path.
+        fmt (str): bcn_lib format.
+    """
+    pixels = numpy.asarray(image, dtype=numpy.uint8)
+    if fmt == bcn_lib.FORMAT_BC1:
+        # Force opaque, so no block uses the transparent index
+        pixels = pixels.copy()
+        pixels[:, :, 3] = 255
+    data = bcn_lib.compress_texture_cached(pixels, fmt, _COMPRESSION_QUALITY)
+    bcn_lib.write_blocks(filepath, data, fmt, image.width, image.height)
+
+
 def pack_asset_entry(entry):
     """Pack an asset for the purpose of reading it from
     a buffer in a shader.
@@ -308,16 +292,30 @@ def pack_asset_entry(entry):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--repack",
+        action="store_true",
+        help="Pack from scratch, instead of keeping the placement of unchanged tiles."
+    )
+    args = parser.parse_args()
+
     mapping = _gather_texture_mapping()
     _calculate_roi(mapping)
 
-    texture_size = _calculate_placement(mapping)
+    if args.repack:
+        previous, previous_size = {}, (0, 0)
+    else:
+        previous, previous_size = _load_previous_placement()
+    texture_size = _calculate_placement(mapping, previous, previous_size)
     print("Texture dimensions: {0[0]}x{0[1]}".format(texture_size))
 
     base = generate_atlas(texture_size[0], texture_size[1], mapping, "BASE")
     base.save(_ATLAS_BASE)
+    write_compressed_atlas(base, _ATLAS_BASE_DDS, _ATLAS_BASE_FORMAT)
     norm = generate_atlas(texture_size[0], texture_size[1], mapping, "NORM")
     norm.save(_ATLAS_NORM)
+    write_compressed_atlas(norm, _ATLAS_NORM_DDS, _ATLAS_NORM_FORMAT)
 
     ordered_ids = sorted(mapping)
     with open(_ATLAS_GLSL_IDS, "w") as out_fp:
@@ -0,0 +1,239 @@
+"""
+Atlas packing shared by the asset scripts
+-----------------------------------------
+
+MaxRects packing into a bin which grows as needed:
+
+    The free space is kept as a list of maximal free rectangles (which may
+    overlap), placing something splits every free rectangle it touches
+    and drops any that end up inside another. New rectangles go wherever
+    grows the used extent of the atlas the least, ties broken by the best
+    short side fit, then the lowest y and x.
+
+    Growing the bin adds the new strips as free space (extending free
+    rectangles along the old edges), so nothing already placed moves.
+
+Since placements never move, an incremental pack (see pack_rects) just
+reserves the previous placement of anything whose size didn't change and
+only places what's new or resized.
+"""
+
+
+def round_to_power2(x):
+    """Round up to a power of two."""
+    return 1 if x <= 1 else 1 << (x - 1).bit_length()
+
+
+def _align_up(x, alignment):
+    return -(-x // alignment) * alignment
+
+
+class AtlasPacker(object):
+    """Packs rectangles into a bin that grows, see the module docs.
+
+    Args:
+        width (int): Initial bin width.
+        height (int): Initial bin height.
+        alignment (tuple(int, int)): x and y alignment of placements.
+        power_of_two (bool): Keep the bin (and extent) a power of two.
+    """
+
+    def __init__(self, width=0, height=0, alignment=(1, 1), power_of_two=False):
+        self.alignment = alignment
+        self.power_of_two = power_of_two
+        self.width = 0
+        self.height = 0
+        self.placements = {}
+        self._free = []
+        self._grow(width, height)
+
+    @property
+    def extent(self):
+        """Get the size actually used.
+
+        Returns:
+            tuple(int, int): Width and height.
+        """
+        width, height = self._used_extent()
+        if self.power_of_two:
+            return (round_to_power2(width), round_to_power2(height))
+        return (width, height)
+
+    def _used_extent(self):
+        return (
+            max((x + w for x, y, w, h in self.placements.values()), default=0),
+            max((y + h for x, y, w, h in self.placements.values()), default=0)
+        )
+
+    def reserve(self, key, x, y, width, height):
+        """Mark a rectangle as used where it already is.
+
+        Raises:
+            ValueError: If it overlaps something already placed.
+        """
+        for other_key, (ox, oy, ow, oh) in self.placements.items():
+            if x < ox + ow and ox < x + width and y < oy + oh and oy < y + height:
+                raise ValueError("'{0}' overlaps '{1}'".format(key, other_key))
+        self._grow(max(self.width, x + width), max(self.height, y + height))
+        self._use(key, x, y, width, height)
+
+    def place(self, key, width, height):
+        """Find space for a rectangle, growing the bin if needed.
+
+        Returns:
+            tuple(int, int): x and y of the placement.
+        """
+        while True:
+            found = self._find(width, height)
+            if found is not None:
+                x, y = found
+                self._use(key, x, y, width, height)
+                return (x, y)
+            self._grow_for(width, height)
+
+    def _find(self, width, height):
+        align_x, align_y = self.alignment
+        extent_w, extent_h = self._used_extent()
+        best = None
+        best_score = None
+        for free_x, free_y, free_w, free_h in self._free:
+            x = _align_up(free_x, align_x)
+            y = _align_up(free_y, align_y)
+            left_x = free_x + free_w - x - width
+            left_y = free_y + free_h - y - height
+            if left_x < 0 or left_y < 0:
+                continue
+            score = (
+                max(extent_w, x + width) * max(extent_h, y + height),
+                min(left_x, left_y),
+                max(left_x, left_y),
+                y,
+                x
+            )
+            if best_score is None or score < best_score:
+                best_score = score
+                best = (x, y)
+        return best
+
+    def _use(self, key, x, y, width, height):
+        self.placements[key] = (x, y, width, height)
+        end_x = x + width
+        end_y = y + height
+
+        split = []
+        for free in self._free:
+            free_x, free_y, free_w, free_h = free
+            free_end_x = free_x + free_w
+            free_end_y = free_y + free_h
+            if x >= free_end_x or end_x <= free_x or y >= free_end_y or end_y <= free_y:
+                split.append(free)
+                continue
+            if x > free_x:
+                split.append((free_x, free_y, x - free_x, free_h))
+            if end_x < free_end_x:
+                split.append((end_x, free_y, free_end_x - end_x, free_h))
+            if y > free_y:
+                split.append((free_x, free_y, free_w, y - free_y))
+            if end_y < free_end_y:
+                split.append((free_x, end_y, free_w, free_end_y - end_y))
+        self._free = self._prune(split)
+
+    @staticmethod
+    def _prune(free_rects):
+        """Drop free rectangles contained by another."""
+        free_rects = sorted(set(free_rects), key=lambda r: r[2] * r[3], reverse=True)
+        kept = []
+        for free_x, free_y, free_w, free_h in free_rects:
+            contained = any(
+                x <= free_x and y <= free_y
+                and free_x + free_w <= x + w and free_y + free_h <= y + h
+                for x, y, w, h in kept
+            )
+            if not contained:
+                kept.append((free_x, free_y, free_w, free_h))
+        return kept
+
+    def _grow_for(self, width, height):
+        """Grow the bin along whichever axis keeps it squarer."""
+        if self.power_of_two:
+            if self.width <= self.height:
+                new_size = (round_to_power2(max(self.width * 2, width)), self.height)
+            else:
+                new_size = (self.width, round_to_power2(max(self.height * 2, height)))
+        elif self.width <= self.height:
+            new_size = (self.width + _align_up(width, self.alignment[0]), self.height)
+        else:
+            new_size = (self.width, self.height + _align_up(height, self.alignment[1]))
+        self._grow(max(new_size[0], width), max(new_size[1], height))
+
+    def _grow(self, width, height):
+        if self.power_of_two:
+            width = round_to_power2(width)
+            height = round_to_power2(height)
+        old_width = self.width
+        old_height = self.height
+        if width <= old_width and height <= old_height:
+            return
+
+        width = max(width, old_width)
+        height = max(height, old_height)
+        grown = []
+        for free_x, free_y, free_w, free_h in self._free:
+            if free_x + free_w == old_width:
+                free_w = width - free_x
+            if free_y + free_h == old_height:
+                free_h = height - free_y
+            grown.append((free_x, free_y, free_w, free_h))
+        if width > old_width:
+            grown.append((old_width, 0, width - old_width, height))
+        if height > old_height:
+            grown.append((0, old_height, width, height - old_height))
+
+        self.width = width
+        self.height = height
+        self._free = self._prune(grown)
+
+
+def pack_rects(sizes, previous=None, alignment=(1, 1), power_of_two=False):
+    """Pack rectangles into an atlas.
+
+    Args:
+        sizes (dict): Key to (width, height).
+        previous (dict): Key to (x, y, width, height) of a previous pack,
+            anything with the same size keeps its place, everything else
+            is placed around them.
+        alignment (tuple(int, int)): x and y alignment of placements.
+        power_of_two (bool): Keep the atlas size a power of two.
+
+    Returns:
+        tuple(dict, tuple(int, int)): Key to (x, y) and the atlas size.
+    """
+    previous = previous or {}
+    kept = {
+        key: rect for key, rect in previous.items()
+        if key in sizes and tuple(rect[2:]) == tuple(sizes[key])
+    }
+
+    total_area = sum(width * height for width, height in sizes.values())
+    side = int(total_area ** 0.5)
+    packer = AtlasPacker(
+        max([side] + [width for width, _ in sizes.values()]),
+        max([side] + [height for _, height in sizes.values()]),
+        alignment,
+        power_of_two
+    )
+
+    for key in sorted(kept):
+        packer.reserve(key, *kept[key])
+
+    # Biggest first, same as the old nested loop search
+    new_keys = sorted(
+        (key for key in sizes if key not in kept),
+        key=lambda key: (sizes[key][0] * sizes[key][1], key),
+        reverse=True
+    )
+    for key in new_keys:
+        packer.place(key, *sizes[key])
+
+    placements = {key: packer.placements[key][:2] for key in sizes}
+    return placements, packer.extent
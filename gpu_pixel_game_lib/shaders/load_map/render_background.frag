@@ -4,8 +4,9 @@
 #include "../map_atlas_common.glsli"
 #include "../df_tracing.glsli"
 
-readonly layout(binding=3, rgba8) uniform image2D assetBaseAtlas;
-readonly layout(binding=4, rgba8) uniform image2D assetNormAtlas;
+// Samplers rather than images, as the atlases may be block compressed
+layout(binding=3) uniform sampler2D assetBaseAtlas;
+layout(binding=4) uniform sampler2D assetNormAtlas;
 
 layout(location=0) in vec3 pixelCoordAndHeight;
 layout(location=1) in vec2 uv;
@@ -25,6 +26,6 @@ void main()
     // Decrease AO up walls
     AO = mix(AO, 1, pixelCoordAndHeight.z);
 
-    outBase = imageLoad(assetBaseAtlas, coord) * vec4(vec3(AO), 1);
-    outNormals = vec4(imageLoad(assetNormAtlas, coord).xyz, pixelCoordAndHeight.z);
+    outBase = texelFetch(assetBaseAtlas, coord, 0) * vec4(vec3(AO), 1);
+    outNormals = vec4(texelFetch(assetNormAtlas, coord, 0).xyz, pixelCoordAndHeight.z);
 }
@@ -1,5 +1,12 @@
 import os
-from .v1 import build_line_bvh_v1, trace_line_bvh_v1
+from .v1 import (
+    build_line_bvh_v1,
+    trace_line_bvh_v1,
+    trace_line_bvh_v1_batch,
+    line_bvh_v1_expected_cost,
+    SPLIT_MEDIAN,
+    SPLIT_SAH,
+)
 
 _SHADER_DIR = os.path.abspath(
     os.path.join(__file__, "..", "shaders")
@@ -42,6 +42,9 @@ However because we store two lines per leaf entry, this in turn becomes one.
 
 from numpy import *
 
+# numpy 2 exports min / max, which would otherwise shadow the builtins
+from builtins import min, max
+
 
 NODE_FLOAT4_STRIDE = 3
 
@@ -57,6 +60,12 @@ IDX_ID = 6
 METADATA_BBOX = uint32(0).view(float32)
 METADATA_LINE = uint32(1).view(float32)
 
+# Split modes for make_bvh_flat
+SPLIT_MEDIAN = "median"
+SPLIT_SAH = "sah"
+
+SAH_BIN_COUNT = 16
+
 # Must match make_bvh_iter
 BVH_IDX_METADATA = 0
 BVH_IDX_ENTRY_ID = 1
@@ -244,8 +253,383 @@ def make_bvh_iter(entries, allocator, fast_build=True, sorted_dim=-1):
     )
 
 
-def build_line_bvh_v1(lines, fast_build=True):
+def _split_bias(cx, cy, fast_build):
+    """Whether the middle entry of an odd length node goes to the left half,
+    exactly as make_bvh_iter decides it.
+
+    Args:
+        cx (array[float]): Sorted center x values of the node.
+        cy (array[float]): Sorted center y values of the node.
+        fast_build (bool): Use a faster build method.
+
+    Returns:
+        int: 1 if the middle entry goes left, otherwise 0.
+    """
+    split_index = len(cx) // 2
+    if fast_build:
+        left_cx = (cx[0] + cx[split_index-1]) * 0.5
+        left_cy = (cy[0] + cy[split_index-1]) * 0.5
+        right_cx = (cx[split_index+1] + cx[-1]) * 0.5
+        right_cy = (cy[split_index+1] + cy[-1]) * 0.5
+    else:
+        left_cx = mean(cx[0:split_index])
+        left_cy = mean(cy[0:split_index])
+        right_cx = mean(cx[(split_index+1):])
+        right_cy = mean(cy[(split_index+1):])
 
+    mid_cx = cx[split_index]
+    mid_cy = cy[split_index]
+
+    left_dist_sq = dot(
+        (left_cx - mid_cx, left_cy - mid_cy),
+        (left_cx - mid_cx, left_cy - mid_cy)
+    )
+    right_dist_sq = dot(
+        (right_cx - mid_cx, right_cy - mid_cy),
+        (right_cx - mid_cx, right_cy - mid_cy)
+    )
+    return int(left_dist_sq < right_dist_sq)
+
+
+def _split_biases(cx, cy, perm, starts, lengths, fast_build):
+    """Vectorized _split_bias for a batch of odd length nodes.
+
+    The fast build estimate is evaluated in float64, only nodes where
+    float32 rounding could flip the decision go through _split_bias.
+
+    Args:
+        cx (array[float]): Center x values.
+        cy (array[float]): Center y values.
+        perm (array[int]): Current entry order.
+        starts (array[int]): First entry of each node.
+        lengths (array[int]): Entries in each node.
+        fast_build (bool): Use a faster build method.
+
+    Returns:
+        array[int]: 1 where the middle entry goes left, otherwise 0.
+    """
+    biases = zeros(len(starts), dtype=int64)
+    if fast_build:
+        half = lengths // 2
+        corners = (starts, starts + half - 1, starts + half + 1, starts + lengths - 1, starts + half)
+        dist_sq = []
+        scale = zeros(len(starts))
+        for centers in (cx, cy):
+            l0, l1, r0, r1, mid = (centers[perm[x]].astype(float64) for x in corners)
+            dist_sq.append(((l0 + l1) * 0.5 - mid, (r0 + r1) * 0.5 - mid))
+            for value in (l0, l1, r0, r1, mid):
+                scale = maximum(scale, abs(value))
+        left_dist_sq = dist_sq[0][0] ** 2 + dist_sq[1][0] ** 2
+        right_dist_sq = dist_sq[0][1] ** 2 + dist_sq[1][1] ** 2
+
+        # Few ulps of float32 error on each delta, plus rounding of the squares
+        err = scale * 2.0 ** -20
+        tolerance = (
+            4.0 * (sqrt(left_dist_sq) + sqrt(right_dist_sq)) * err
+            + 4.0 * err * err
+            + (left_dist_sq + right_dist_sq) * 2.0 ** -20
+        )
+        certain = abs(left_dist_sq - right_dist_sq) > tolerance
+        biases[certain] = (left_dist_sq < right_dist_sq)[certain]
+        uncertain = nonzero(~certain)[0]
+    else:
+        uncertain = arange(len(starts))
+
+    for i in uncertain:
+        indices = perm[starts[i]:starts[i] + lengths[i]]
+        biases[i] = _split_bias(cx[indices], cy[indices], fast_build)
+
+    return biases
+
+
+def _sort_nodes(cx, cy, perm, starts, lengths, dims):
+    """Sort the entries of a batch of nodes along their chosen axis.
+
+    All nodes are sorted in one stable argsort, nodes which have tied keys
+    are re-sorted individually with argsort, to give exactly the same
+    order make_bvh_iter would.
+
+    Args:
+        cx (array[float]): Center x values.
+        cy (array[float]): Center y values.
+        perm (array[int]): Entry order, updated inplace.
+        starts (array[int]): First entry of each node.
+        lengths (array[int]): Entries in each node.
+        dims (array[int]): Axis to sort each node by.
+    """
+    offsets = cumsum(lengths) - lengths
+    node_ids = repeat(arange(len(starts)), lengths)
+    positions = arange(len(node_ids)) - repeat(offsets - starts, lengths)
+    unsorted = perm[positions]
+    keys = where(repeat(dims, lengths) == 0, cx[unsorted], cy[unsorted])
+
+    # Pack (node, key) into a single uint64, flipping the float bits so
+    # they sort as unsigned integers.
+    bits = keys.view(uint32)
+    bits = bits ^ where(bits >> 31, uint32(0xffffffff), uint32(0x80000000))
+    packed = (node_ids.astype(uint64) << uint64(32)) | bits
+    order = argsort(packed, kind="stable")
+    perm[positions] = unsorted[order]
+
+    keys = keys[order]
+    tied = (keys[1:] == keys[:-1]) & (node_ids[1:] == node_ids[:-1])
+    for i in unique(node_ids[1:][tied]):
+        indices = unsorted[offsets[i]:offsets[i] + lengths[i]]
+        centers = cx if dims[i] == 0 else cy
+        perm[starts[i]:starts[i] + lengths[i]] = indices[argsort(centers[indices])]
+
+
+def _leaf_bboxes(entries):
+    """Bounding boxes of each line entry.
+
+    Args:
+        entries (array(float[7])): Structured line entries.
+
+    Returns:
+        array(float[4]): bbox min and max per entry.
+    """
+    x0 = entries[:, IDX_X0]
+    y0 = entries[:, IDX_Y0]
+    x1 = x0 - entries[:, IDX_DX]
+    y1 = y0 - entries[:, IDX_DY]
+    # Selecting rather than minimum / maximum, to match the builtin
+    # min / max make_bvh_iter uses (the first argument wins ties).
+    return stack(
+        (
+            where(x1 < x0, x1, x0),
+            where(y1 < y0, y1, y0),
+            where(x1 > x0, x1, x0),
+            where(y1 > y0, y1, y0),
+        ),
+        axis=1
+    )
+
+
+def _sah_splits(cx, cy, leaf_bbox, perm, starts, lengths, dims, bin_count=SAH_BIN_COUNT):
+    """Pick the axis and split of a batch of nodes using binned SAH.
+
+    In 2D the chance of a ray hitting a box is proportional to its
+    perimeter rather than its area, so that's what splits are scored by.
+
+    Args:
+        cx (array[float]): Center x values.
+        cy (array[float]): Center y values.
+        leaf_bbox (array(float[4])): bbox of each entry.
+        perm (array[int]): Current entry order.
+        starts (array[int]): First entry of each node.
+        lengths (array[int]): Entries in each node.
+        dims (array[int]): Axis each node is currently sorted by.
+        bin_count (int): Number of bins per axis.
+
+    Returns:
+        tuple(array[int], array[int]): Axis to sort by and number of
+            entries going left, nodes which can't be split sensibly
+            (all centers equal) keep their axis and are split in half.
+    """
+    node_count = len(starts)
+    offsets = cumsum(lengths) - lengths
+    node_ids = repeat(arange(node_count), lengths)
+    indices = perm[arange(len(node_ids)) - repeat(offsets - starts, lengths)]
+    boxes = leaf_bbox[indices].astype(float64)
+    nodes = arange(node_count)
+
+    best_cost = full(node_count, inf)
+    best_dims = dims.copy()
+    best_left_lengths = lengths // 2
+
+    for dim, centers in enumerate((cx, cy)):
+        values = centers[indices].astype(float64)
+        lower = minimum.reduceat(values, offsets)
+        extent = maximum.reduceat(values, offsets) - lower
+        scale = bin_count / where(extent > 0, extent, 1.0)
+        bins = minimum(
+            ((values - lower[node_ids]) * scale[node_ids]).astype(int64),
+            bin_count - 1
+        )
+        groups = node_ids * bin_count + bins
+
+        counts = bincount(groups, minlength=node_count * bin_count).reshape((node_count, bin_count))
+        bin_min = full((node_count * bin_count, 2), inf)
+        bin_max = full((node_count * bin_count, 2), -inf)
+        minimum.at(bin_min, groups, boxes[:, :2])
+        maximum.at(bin_max, groups, boxes[:, 2:])
+        bin_min = bin_min.reshape((node_count, bin_count, 2))
+        bin_max = bin_max.reshape((node_count, bin_count, 2))
+
+        # Split k puts bins [0, k] left and [k+1, bin_count) right
+        left_counts = cumsum(counts, axis=1)[:, :-1]
+        right_counts = lengths[:, None] - left_counts
+        left_size = (
+            maximum.accumulate(bin_max, axis=1)
+            - minimum.accumulate(bin_min, axis=1)
+        )[:, :-1].sum(axis=2)
+        right_size = (
+            maximum.accumulate(bin_max[:, ::-1], axis=1)
+            - minimum.accumulate(bin_min[:, ::-1], axis=1)
+        )[:, -2::-1].sum(axis=2)
+
+        valid = (left_counts > 0) & (right_counts > 0)
+        cost = where(
+            valid,
+            where(valid, left_size, 0) * left_counts
+            + where(valid, right_size, 0) * right_counts,
+            inf
+        )
+        splits = argmin(cost, axis=1)
+        cost = cost[nodes, splits]
+        better = cost < best_cost
+        best_cost[better] = cost[better]
+        best_dims[better] = dim
+        best_left_lengths[better] = left_counts[nodes, splits][better]
+
+    return best_dims, best_left_lengths
+
+
+def make_bvh_flat(entries, fast_build=True, split_mode=SPLIT_MEDIAN):
+    """Build BVH nodes one level at a time, without recursion.
+
+    With SPLIT_MEDIAN this gives byte identical output to make_bvh_iter,
+    nodes are split breadth first and written out bottom up.
+
+    SPLIT_SAH instead splits nodes along whichever binned centroid
+    boundary minimizes the perimeter heuristic, which copes much better
+    with unevenly distributed lines, the node layout is unchanged.
+
+    Args:
+        entries (array(float[7])): Structured line entries (atleast 2).
+        fast_build (bool): Use a faster build method, only affects
+            SPLIT_MEDIAN. (Default: True)
+        split_mode (str): SPLIT_MEDIAN or SPLIT_SAH. (Default: SPLIT_MEDIAN)
+
+    Returns:
+        array[float]: Flattened node data.
+    """
+    assert len(entries) >= 2
+    if split_mode not in (SPLIT_MEDIAN, SPLIT_SAH):
+        raise ValueError("Unknown split mode: {0}".format(split_mode))
+
+    entry_count = len(entries)
+    cx = ascontiguousarray(entries[:, IDX_CENTER_X])
+    cy = ascontiguousarray(entries[:, IDX_CENTER_Y])
+    leaf_bbox = _leaf_bboxes(entries)
+    perm = arange(entry_count)
+
+    # Nodes at the current level
+    starts = zeros(1, dtype=int64)
+    lengths = full(1, entry_count, dtype=int64)
+    addresses = zeros(1, dtype=int64)
+    dims = full(1, -1, dtype=int64)
+
+    levels = []
+    while len(starts):
+        left_lengths = lengths // 2
+
+        # No need to sort anything when we're on our final node
+        big = nonzero(lengths > 2)[0]
+        if len(big):
+            if split_mode == SPLIT_SAH:
+                new_dims, left_lengths[big] = _sah_splits(
+                    cx, cy, leaf_bbox, perm, starts[big], lengths[big], dims[big]
+                )
+            else:
+                bounds = column_stack((starts[big], starts[big] + lengths[big])).ravel()
+                extents = []
+                for centers in (cx, cy):
+                    values = append(centers[perm], centers[:1])
+                    extents.append(
+                        maximum.reduceat(values, bounds)[::2]
+                        - minimum.reduceat(values, bounds)[::2]
+                    )
+                new_dims = where(extents[0] > extents[1], 0, 1)
+            resort = big[new_dims != dims[big]]
+            dims[big] = new_dims
+            if len(resort):
+                _sort_nodes(cx, cy, perm, starts[resort], lengths[resort], dims[resort])
+
+        odd = nonzero(lengths & 1)[0]
+        if split_mode == SPLIT_MEDIAN and len(odd):
+            left_lengths[odd] += _split_biases(
+                cx, cy, perm, starts[odd], lengths[odd], fast_build
+            )
+
+        levels.append((starts, lengths, addresses, left_lengths))
+
+        # Nodes are allocated depth first, left subtree before the right
+        child_starts = concatenate((starts, starts + left_lengths))
+        child_lengths = concatenate((left_lengths, lengths - left_lengths))
+        child_addresses = concatenate((
+            addresses + NODE_FLOAT4_STRIDE,
+            addresses + NODE_FLOAT4_STRIDE * left_lengths
+        ))
+        child_dims = concatenate((dims, dims))
+        # Keep nodes in entry order, so the reduceat gaps stay small
+        keep = nonzero(child_lengths > 1)[0]
+        keep = keep[argsort(child_starts[keep], kind="stable")]
+        starts = child_starts[keep]
+        lengths = child_lengths[keep]
+        addresses = child_addresses[keep]
+        dims = child_dims[keep]
+
+    ids = ascontiguousarray(entries[:, IDX_ID]).view(uint32)
+    line_data = ascontiguousarray(entries[:, IDX_X0:IDX_DY+1])
+
+    nodes = zeros((entry_count - 1, 12), dtype=float32)
+    node_meta = nodes.view(uint32)
+    node_bbox = zeros((entry_count - 1, 4), dtype=float32)
+
+    for starts, lengths, addresses, left_lengths in reversed(levels):
+        children = []
+        for child_starts, child_lengths, child_addresses in (
+                (starts, left_lengths, addresses + NODE_FLOAT4_STRIDE),
+                (starts + left_lengths, lengths - left_lengths, addresses + NODE_FLOAT4_STRIDE * left_lengths)):
+            is_line = child_lengths == 1
+            line_ids = perm[child_starts]
+            child_nodes = where(is_line, 0, child_addresses // NODE_FLOAT4_STRIDE)
+            children.append((
+                is_line,
+                where(is_line, METADATA_LINE.view(uint32), METADATA_BBOX.view(uint32)),
+                where(is_line, ids[line_ids], child_addresses.astype(uint32)),
+                where(is_line[:, None], line_data[line_ids], node_bbox[child_nodes]),
+                where(is_line[:, None], leaf_bbox[line_ids], node_bbox[child_nodes]),
+            ))
+
+        # Ensure first entry is always a line
+        left, right = children
+        swap = right[0] & ~left[0]
+        swap_rows = swap[:, None]
+        first = [
+            where(swap_rows if a.ndim == 2 else swap, b, a)
+            for a, b in zip(left, right)
+        ]
+        second = [
+            where(swap_rows if a.ndim == 2 else swap, a, b)
+            for a, b in zip(left, right)
+        ]
+
+        index = addresses // NODE_FLOAT4_STRIDE
+        node_meta[index, 0] = first[1]
+        node_meta[index, 1] = first[2]
+        node_meta[index, 2] = second[1]
+        node_meta[index, 3] = second[2]
+        nodes[index, 4:8] = first[3]
+        nodes[index, 8:12] = second[3]
+        node_bbox[index, :2] = where(second[4][:, :2] < first[4][:, :2], second[4][:, :2], first[4][:, :2])
+        node_bbox[index, 2:] = where(second[4][:, 2:] > first[4][:, 2:], second[4][:, 2:], first[4][:, 2:])
+
+    return nodes.ravel()
+
+
+def build_line_bvh_v1_recursive(lines, fast_build=True):
+    """Build a line BVH via make_bvh_iter, this is the reference
+    implementation of build_line_bvh_v1.
+
+    Args:
+        lines (array[float[4]]): Lines to build a bvh from.
+        fast_build (bool): Use a faster build method. (Default: True)
+
+    Returns:
+        array[float4]: BVH data, None if there are no lines.
+    """
     if not len(lines):
         return None
 
@@ -264,6 +648,87 @@ def build_line_bvh_v1(lines, fast_build=True):
     )
 
 
+def build_line_bvh_v1(lines, fast_build=True, split_mode=SPLIT_MEDIAN):
+    """Build a line BVH.
+
+    Args:
+        lines (array[float[4]]): Lines to build a bvh from.
+        fast_build (bool): Use a faster build method. (Default: True)
+        split_mode (str): SPLIT_MEDIAN or SPLIT_SAH. (Default: SPLIT_MEDIAN)
+
+    Returns:
+        array[float4]: BVH data, None if there are no lines.
+    """
+    if not len(lines):
+        return None
+
+    entries = make_line_entries(lines)
+
+    # We need atleast 2 entries to ensure a root node
+    # gets allocated, so in which case, we just duplicate
+    # the single line.
+    if len(entries) == 1:
+        entries = stack((entries[0], entries[0]))
+
+    return make_bvh_flat(entries, fast_build, split_mode).reshape((-1, 4))
+
+
+def line_bvh_v1_expected_cost(bvh_data, node_cost=1.0, line_cost=1.0):
+    """Estimate the cost of tracing a ray through a line BVH.
+
+    By Cauchy-Crofton, the chance of a random line which hits the root
+    bbox also hitting a convex shape inside it, is the ratio of their
+    perimeters. So the expected number of nodes visited is the sum of
+    each node's bbox perimeter over the root's, early outs from hits
+    are ignored.
+
+    Args:
+        bvh_data (numpy.array[float4]): BVH structure.
+        node_cost (float): Cost of visiting a node (testing its entries).
+        line_cost (float): Cost of intersecting a line.
+
+    Returns:
+        dict: cost, expected node visits and line tests per ray, along with
+            the node and line counts.
+    """
+    nodes = asarray(bvh_data, dtype=float32).reshape((-1, NODE_FLOAT4_STRIDE, 4))
+    metadata = nodes[:, 0].view(uint32)
+    is_line = metadata[:, 0::2] == METADATA_LINE.view(uint32)
+    addresses = metadata[:, 1::2]
+
+    data = nodes[:, 1:].astype(float64)
+    bbox = data.copy()
+    x1 = data[..., 0] - data[..., 2]
+    y1 = data[..., 1] - data[..., 3]
+    bbox[..., 0] = where(is_line, minimum(data[..., 0], x1), data[..., 0])
+    bbox[..., 1] = where(is_line, minimum(data[..., 1], y1), data[..., 1])
+    bbox[..., 2] = where(is_line, maximum(data[..., 0], x1), data[..., 2])
+    bbox[..., 3] = where(is_line, maximum(data[..., 1], y1), data[..., 3])
+
+    # The perimeter of each node is stored by its parent, apart from the root
+    half_perimeters = zeros(len(nodes))
+    is_bbox = ~is_line
+    half_perimeters[addresses[is_bbox] // NODE_FLOAT4_STRIDE] = (
+        bbox[is_bbox][:, 2] - bbox[is_bbox][:, 0]
+        + bbox[is_bbox][:, 3] - bbox[is_bbox][:, 1]
+    )
+    root_bbox = concatenate((bbox[0, :, :2].min(axis=0), bbox[0, :, 2:].max(axis=0)))
+    half_perimeters[0] = root_bbox[2] - root_bbox[0] + root_bbox[3] - root_bbox[1]
+
+    probabilities = half_perimeters / half_perimeters[0] if half_perimeters[0] > 0 else ones(len(nodes))
+    line_counts = is_line.sum(axis=1)
+    node_visits = float(probabilities.sum())
+    line_tests = float((probabilities * line_counts).sum())
+
+    return {
+        "cost": node_cost * node_visits + line_cost * line_tests,
+        "node_visits": node_visits,
+        "line_tests": line_tests,
+        "nodes": len(nodes),
+        "lines": int(line_counts.sum()),
+    }
+
+
 # For WEBGL stuff, this should be done using WASM
 
 class LineBvhV1Result(object):
@@ -413,3 +878,186 @@ def trace_line_bvh_v1(bvh_data, ro, rd, max_dist, stop_on_first_hit):
             break
 
     return result
+
+
+# Structured equivalent of LineBvhV1Result, for batches of rays
+LINE_BVH_V1_RESULT_DTYPE = dtype([
+    ("hit_line_id", uint32),
+    ("hit_dist_sq", float64),
+    ("hit_line_interval", float64),
+    ("line", float32, (4,)),
+    ("duv", float64, (2,)),
+])
+
+
+def line_bvh_v1_eval_entries(rays, ro, inv_rd, metadata, data, results):
+    """Vectorized line_bvh_v1_eval_entry, for a batch of rays.
+
+    Args:
+        rays (array[int]): Index of each ray in results.
+        ro (array[float2]): Ray origins.
+        inv_rd (array[float2]): Inverse ray directions.
+        metadata (array[uint2]): BVH metadata.
+        data (array[float4]): BVH entry data.
+        results (array[LINE_BVH_V1_RESULT_DTYPE]): Writeback.
+
+    Returns:
+        tuple: (add to stack, bbox hit distance, id to add) arrays.
+    """
+    add_to_stack = zeros(len(rays), dtype=bool)
+    dists = zeros(len(rays), dtype=float64)
+    ids = zeros(len(rays), dtype=uint32)
+
+    is_line = metadata[:, 0] == METADATA_LINE.view(uint32)
+
+    # Lines
+    lanes = nonzero(is_line)[0]
+    if len(lanes):
+        A = ro[lanes]
+        AB = -results["duv"][rays[lanes]]
+        C = data[lanes, 0:2]
+        CD = data[lanes, 2:4]
+        AC = A - C
+
+        d = AB[:, 0] * CD[:, 1] - AB[:, 1] * CD[:, 0] # cross(AB, CD)
+        u = AC[:, 0] * AB[:, 1] - AC[:, 1] * AB[:, 0] # cross(AC, AB)
+        v = AC[:, 0] * CD[:, 1] - AC[:, 1] * CD[:, 0] # cross(AC, CD)
+
+        dsign = sign(d)
+        u = u * dsign
+        v = v * dsign
+        abs_d = abs(d)
+
+        # Selects rather than minimum / maximum, to match the builtins
+        hit = (where(v < u, v, u) > 0.0) & (where(v > u, v, u) < abs_d)
+        if hit.any():
+            hit_rays = rays[lanes[hit]]
+            duv = -AB[hit] * (v[hit] / abs_d[hit])[:, None]
+            results["hit_line_id"][hit_rays] = metadata[lanes[hit], 1]
+            results["hit_line_interval"][hit_rays] = -u[hit] / abs_d[hit]
+            results["line"][hit_rays] = data[lanes[hit]]
+            results["duv"][hit_rays] = duv
+            results["hit_dist_sq"][hit_rays] = duv[:, 0] * duv[:, 0] + duv[:, 1] * duv[:, 1]
+
+    # BBoxes
+    lanes = nonzero(~is_line)[0]
+    if len(lanes):
+        ray_ro = ro[lanes]
+        ray_inv_rd = inv_rd[lanes]
+        bbox = data[lanes]
+        intervals = []
+        for axis in (0, 1):
+            near = (bbox[:, axis] - ray_ro[:, axis]) * ray_inv_rd[:, axis]
+            far = (bbox[:, axis + 2] - ray_ro[:, axis]) * ray_inv_rd[:, axis]
+            flip = near > far
+            intervals.append((where(flip, far, near), where(flip, near, far)))
+        (x_near, x_far), (y_near, y_far) = intervals
+        near = where(y_near > x_near, y_near, x_near)
+        near = where(near > 0, near, 0.0)
+        far = where(y_far < x_far, y_far, x_far)
+
+        hit = (near < far) & ((near * near) < results["hit_dist_sq"][rays[lanes]])
+        add_to_stack[lanes] = hit
+        dists[lanes] = near
+        ids[lanes] = metadata[lanes, 1]
+
+    return add_to_stack, dists, ids
+
+
+def trace_line_bvh_v1_batch(bvh_data, ro, rd, max_dist, stop_on_first_hit):
+    """Line trace a bvh with many rays at once.
+
+    Rays are advanced in lockstep, each visiting one node per iteration
+    with their stacks kept in a shared array. Results are identical to
+    calling trace_line_bvh_v1 with float64 rays.
+
+    Args:
+        bvh_data (numpy.array[float4]): BVH structure.
+        ro (array[float2]): Ray origins.
+        rd (array[float2]): Ray directions.
+        max_dist (float or array[float]): Max distance to trace, per ray.
+        stop_on_first_hit (bool): Whether or not to stop on the first hit
+
+    Returns:
+        array[LINE_BVH_V1_RESULT_DTYPE]: Result per ray.
+    """
+    ro = asarray(ro, dtype=float64).reshape((-1, 2))
+    rd = asarray(rd, dtype=float64).reshape((-1, 2))
+    ray_count = len(ro)
+    max_dist = broadcast_to(asarray(max_dist, dtype=float64), (ray_count,))
+
+    nodes = ascontiguousarray(bvh_data, dtype=float32).reshape((-1, 4))
+    node_metadata = nodes.view(uint32)
+
+    results = zeros(ray_count, dtype=LINE_BVH_V1_RESULT_DTYPE)
+    results["hit_line_id"] = 0xffffffff
+    results["hit_dist_sq"] = max_dist * max_dist
+    results["duv"] = rd * max_dist[:, None]
+
+    with errstate(divide="ignore"):
+        inv_rd = 1.0 / rd
+
+    heads = zeros(ray_count, dtype=int64)
+    stack = zeros((ray_count, 16), dtype=uint32)
+    stack_sizes = zeros(ray_count, dtype=int64)
+
+    active = arange(ray_count)
+    while len(active):
+        head = heads[active]
+        v0 = node_metadata[head]
+        ray_ro = ro[active]
+        ray_inv_rd = inv_rd[active]
+
+        left_add_to_stack, left_dist, left_id = line_bvh_v1_eval_entries(
+            active,
+            ray_ro,
+            ray_inv_rd,
+            v0[:, 0:2],
+            nodes[head + 1],
+            results
+        )
+
+        right_add_to_stack, right_dist, right_id = line_bvh_v1_eval_entries(
+            active,
+            ray_ro,
+            ray_inv_rd,
+            v0[:, 2:4],
+            nodes[head + 2],
+            results
+        )
+
+        if stop_on_first_hit:
+            done = results["hit_line_id"][active] != 0xffffffff
+        else:
+            done = zeros(len(active), dtype=bool)
+
+        # Prioritise nearest
+        both = left_add_to_stack & right_add_to_stack & ~done
+        nearest_left = left_dist < right_dist
+        take_left = left_add_to_stack & (nearest_left | ~right_add_to_stack)
+        next_head = where(take_left, left_id, right_id).astype(int64)
+
+        push = nonzero(both)[0]
+        if len(push):
+            push_rays = active[push]
+            if stack_sizes[push_rays].max() >= stack.shape[1]:
+                stack = concatenate((stack, zeros_like(stack)), axis=1)
+            stack[push_rays, stack_sizes[push_rays]] = where(
+                nearest_left[push],
+                right_id[push],
+                left_id[push]
+            )
+            stack_sizes[push_rays] += 1
+
+        neither = ~left_add_to_stack & ~right_add_to_stack & ~done
+        sizes = stack_sizes[active]
+        pop = nonzero(neither & (sizes > 0))[0]
+        if len(pop):
+            pop_rays = active[pop]
+            stack_sizes[pop_rays] -= 1
+            next_head[pop] = stack[pop_rays, stack_sizes[pop_rays]]
+
+        heads[active] = next_head
+        active = active[~(done | (neither & (sizes == 0)))]
+
+    return results
@@ -1,5 +1,6 @@
 import os
 from .v1 import build_line_df_hybrid_v1
+from .v1_incremental import LineDfHybridV1, LineDfHybridV1Update
 
 _SHADER_DIR = os.path.abspath(
     os.path.join(__file__, "..", "shaders")
@@ -1,24 +1,335 @@
 _SUM = sum
+_MIN = min
+_MAX = max
 from numpy import *
+from numpy.lib.stride_tricks import sliding_window_view
 sum = _SUM
+min = _MIN
+max = _MAX
 
-def build_line_df_hybrid_v1(
-        lines,
-        res=256,
-        extra_capture_pixel_span=1):
-    
-    # conform lines to (x0, y0, dx, dy)
+
+# Texels per side of the tiles the distance field is swept in
+TILE_SIZE = 16
+
+# Lines per batch when sweeping a tile
+TILE_LINE_BATCH = 256
+
+# Offsets into the lines buffer are packed into the top 16 bits
+MAX_BUCKET_OFFSET = 0xffff
+
+# Rabin-Karp hash base, odd so it has an inverse modulo 2**64
+_HASH_BASE = 0x100000001b3
+_HASH_BASE_INV = 0xce965057aff6957b  # (_HASH_BASE * _HASH_BASE_INV) % 2**64 == 1
+
+
+def _conform_lines(lines):
+    """Conform lines to (x0, y0, dx, dy).
+
+    Args:
+        lines (array[float[4]]): Lines as (x0, y0, x1, y1).
+
+    Returns:
+        array[float[4]]: float32 (x0, y0, x0-x1, y0-y1) lines.
+    """
     lines = array(lines, dtype=float32)
     lines[:,2] = lines[:,0] - lines[:,2]
     lines[:,3] = lines[:,1] - lines[:,3]
+    return lines
+
 
+def _get_capture_pixel_span_sq(res, extra_capture_pixel_span):
     capture_pixel_span = (
         (0.5 + extra_capture_pixel_span)
         * (2**0.5)
         * (1.0 / min(255, res))
     )
+    return capture_pixel_span ** 2
+
+
+def _line_dist_sq(lines, u, v):
+    """Squared distance from points to lines, evaluated in float32 exactly
+    as the brute force builder does.
+
+    Args:
+        lines (array[float[4]]): Conformed lines.
+        u (array[float32]): Point x, shaped to broadcast against the lines.
+        v (array[float32]): Point y, shaped to broadcast against the lines.
+
+    Returns:
+        array[float32]: Squared distances.
+    """
+    # https://www.geogebra.org/calculator/aajzrdep
+    Ax = lines[:,0] - u
+    Ay = lines[:,1] - v
+    ABx = lines[:,2]
+    ABy = lines[:,3]
+
+    t = (Ax * ABx + Ay * ABy) / (ABx * ABx + ABy * ABy)
+    t = maximum(minimum(t, 1), 0)
+
+    nearest_point_x = Ax - ABx * t
+    nearest_point_y = Ay - ABy * t
+    return (
+        (nearest_point_x * nearest_point_x)
+        + (nearest_point_y * nearest_point_y)
+    )
+
+
+def _hash_powers(base, count):
+    powers = full(count, base, dtype=uint64)
+    powers[:1] = 1
+    return cumprod(powers, dtype=uint64)
+
+
+def _prefix_hashes(stream, powers):
+    """Prefix sums of stream[i] * base**i, wrapping at 64 bits.
+
+    Args:
+        stream (array[uint64]): Stream values.
+        powers (array[uint64]): Powers of the hash base.
+
+    Returns:
+        array[uint64]: len(stream) + 1 prefix hashes.
+    """
+    prefix = zeros(len(stream) + 1, dtype=uint64)
+    cumsum(stream * powers[:len(stream)], dtype=uint64, out=prefix[1:])
+    return prefix
+
+
+def _find_sequences(stream, sequences, powers, inv_powers):
+    """Find the first position of each sequence within a stream, using a
+    Rabin-Karp rolling hash over every window of the stream.
+
+    Args:
+        stream (array[uint64]): Stream to search.
+        sequences (array[uint64]): (N, length) sequences to find.
+        powers (array[uint64]): Powers of the hash base.
+        inv_powers (array[uint64]): Powers of the inverse hash base.
+
+    Returns:
+        array[int]: Position of each sequence, -1 if not found.
+    """
+    length = sequences.shape[1]
+    window_count = len(stream) - length + 1
+    if window_count <= 0:
+        return full(len(sequences), -1, dtype=int64)
+
+    prefix = _prefix_hashes(stream, powers)
+    window_hashes = (prefix[length:] - prefix[:window_count]) * inv_powers[:window_count]
+    order = argsort(window_hashes, kind="stable")
+    window_hashes = window_hashes[order]
+
+    hashes = (sequences * powers[:length]).sum(axis=1, dtype=uint64)
+    indices = minimum(searchsorted(window_hashes, hashes), window_count - 1)
+    positions = where(window_hashes[indices] == hashes, order[indices], -1)
+
+    # Hashes can collide, check matches are real
+    found = nonzero(positions >= 0)[0]
+    windows = stream[positions[found][:, None] + arange(length)]
+    for i in found[~(windows == sequences[found]).all(axis=1)]:
+        matches = nonzero(
+            (sliding_window_view(stream, length) == sequences[i]).all(axis=1)
+        )[0]
+        positions[i] = matches[0] if len(matches) else -1
+
+    return positions
+
+
+def _find_root(parents, index):
+    while parents[index] != index:
+        parents[index] = parents[parents[index]]
+        index = parents[index]
+    return index
+
+
+def compress_line_buckets(buckets):
+    """Pack buckets of line ids into a single stream, such that each bucket
+    is a contiguous run within it.
+
+    Buckets which appear inside longer ones are dropped, the rest are
+    greedily chained by their largest suffix / prefix overlap.
+
+    Args:
+        buckets (iterable[tuple[int]]): Buckets of line ids.
+
+    Returns:
+        tuple(list[int], dict): Line id stream and the offset of each bucket.
+    """
+    unique_buckets = sorted(set(buckets), key=lambda x: (-len(x), x))
+    offsets = {(): 0}
+    unique_buckets = [bucket for bucket in unique_buckets if bucket]
+    if not unique_buckets:
+        return [], offsets
+
+    # Stream values are line id + 1, so 0 can separate unrelated buckets
+    total_size = sum(len(bucket) + 1 for bucket in unique_buckets)
+    powers = _hash_powers(_HASH_BASE, total_size + 1)
+    inv_powers = _hash_powers(_HASH_BASE_INV, total_size + 1)
+
+    groups = {}
+    for bucket in unique_buckets:
+        groups.setdefault(len(bucket), []).append(bucket)
+
+    # Drop buckets contained within longer ones
+    strings = []
+    kept_stream = zeros(0, dtype=uint64)
+    for length, group in sorted(groups.items(), reverse=True):
+        sequences = array(group, dtype=uint64) + 1
+        contained = _find_sequences(kept_stream, sequences, powers, inv_powers) >= 0
+        if contained.all():
+            continue
+        new_sequences = zeros((int((~contained).sum()), length + 1), dtype=uint64)
+        new_sequences[:, :length] = sequences[~contained]
+        kept_stream = concatenate((kept_stream, new_sequences.ravel()))
+        strings.extend(bucket for bucket, found in zip(group, contained) if not found)
+
+    # Greedily chain strings by their largest overlap
+    string_count = len(strings)
+    lengths = array([len(string) for string in strings], dtype=int64)
+    max_length = int(lengths.max())
+    padded = zeros((string_count, max_length), dtype=uint64)
+    for i, string in enumerate(strings):
+        padded[i, :len(string)] = string
+        padded[i, :len(string)] += 1
+    prefix = zeros((string_count, max_length + 1), dtype=uint64)
+    cumsum(padded * powers[:max_length], axis=1, dtype=uint64, out=prefix[:, 1:])
+
+    successors = [-1] * string_count
+    overlaps = [0] * string_count
+    has_successor = zeros(string_count, dtype=bool)
+    has_predecessor = zeros(string_count, dtype=bool)
+    parents = list(range(string_count))
+
+    for overlap in range(max_length - 1, 0, -1):
+        heads = nonzero((lengths > overlap) & ~has_predecessor)[0]
+        tails = nonzero((lengths > overlap) & ~has_successor)[0]
+        if not len(heads) or not len(tails):
+            continue
+
+        head_hashes = prefix[heads, overlap]
+        tail_hashes = (
+            (prefix[tails, lengths[tails]] - prefix[tails, lengths[tails] - overlap])
+            * inv_powers[lengths[tails] - overlap]
+        )
+        heads_by_hash = {}
+        for head, head_hash in zip(heads.tolist(), head_hashes.tolist()):
+            heads_by_hash.setdefault(head_hash, []).append(head)
+
+        for tail, tail_hash in zip(tails.tolist(), tail_hashes.tolist()):
+            candidates = heads_by_hash.get(tail_hash)
+            if not candidates:
+                continue
+            tail_root = _find_root(parents, tail)
+            for i, head in enumerate(candidates):
+                # Linking within the same chain would make a cycle
+                if _find_root(parents, head) == tail_root:
+                    continue
+                if strings[tail][-overlap:] != strings[head][:overlap]:
+                    continue
+                successors[tail] = head
+                overlaps[head] = overlap
+                has_successor[tail] = True
+                has_predecessor[head] = True
+                parents[_find_root(parents, head)] = tail_root
+                del candidates[i]
+                break
+
+    stream = []
+    for head in nonzero(~has_predecessor)[0].tolist():
+        stream.extend(strings[head])
+        index = successors[head]
+        while index != -1:
+            stream.extend(strings[index][overlaps[index]:])
+            index = successors[index]
+
+    stream_values = array(stream, dtype=uint64) + 1
+    for length, group in groups.items():
+        positions = _find_sequences(
+            stream_values,
+            array(group, dtype=uint64) + 1,
+            powers,
+            inv_powers
+        )
+        assert (positions >= 0).all()
+        offsets.update(zip(group, positions.tolist()))
+
+    return stream, offsets
+
+
+def _pack_line_df_hybrid_v1(
+        lines,
+        res,
+        df_component,
+        num_lines_component,
+        initial_bucket_ids_component,
+        initial_buckets_mapping,
+        return_stats=False):
+    """Compress the buckets and pack the final texture and line buffer.
+
+    Args:
+        lines (array[float[4]]): Conformed lines.
+        res (int): Resolution.
+        df_component (array[float32]): Distance to the nearest uncaptured line.
+        num_lines_component (array[uint32]): Lines captured per texel.
+        initial_bucket_ids_component (array[uint32]): Bucket per texel.
+        initial_buckets_mapping (dict): Line id tuple => bucket index.
+        return_stats (bool): Also return compression stats.
+
+    Returns:
+        tuple(array[uint32], array[float[4]]): df texture and lines buffer,
+            followed by a dict of stats if return_stats is set.
+    """
+    # Share already written lines between buckets
+    compressed_stream, bucket_offsets = compress_line_buckets(initial_buckets_mapping)
+    compress_lookup = {
+        bucket_index: bucket_offsets[line_ids]
+        for line_ids, bucket_index in initial_buckets_mapping.items()
+    }
+
+    max_offset = max(compress_lookup.values())
+    if max_offset > MAX_BUCKET_OFFSET:
+        raise ValueError(
+            "Lines buffer offset {0} doesn't fit in 16 bits".format(max_offset)
+        )
+
+    df_bits = (maximum(df_component - 1.0/res, 1.0/255.0) * 255).astype(uint32)
+    num_lines_bits = (num_lines_component << 8)
+    offset_bits = array([
+        [
+            compress_lookup[bucket_index] << 16
+            for bucket_index in onedim
+        ]
+        for onedim in initial_bucket_ids_component
+    ], dtype=uint32)
+
+    df_texture = df_bits | num_lines_bits | offset_bits
+    lines_buffer = lines[compressed_stream]
+
+    if not return_stats:
+        return df_texture, lines_buffer
 
-    capture_pixel_span_sq = capture_pixel_span ** 2
+    unique_line_count = sum(len(line_ids) for line_ids in initial_buckets_mapping)
+    stats = {
+        "buckets": len(initial_buckets_mapping),
+        "texel_line_count": int(num_lines_component.sum()),
+        "unique_line_count": unique_line_count,
+        "compressed_line_count": len(compressed_stream),
+        "compression_ratio": unique_line_count / max(1, len(compressed_stream)),
+        "max_offset": max_offset,
+    }
+    return df_texture, lines_buffer, stats
+
+
+def build_line_df_hybrid_v1_bruteforce(
+        lines,
+        res=256,
+        extra_capture_pixel_span=1,
+        return_stats=False):
+    """Reference implementation of build_line_df_hybrid_v1, which tests
+    every line against every texel.
+    """
+    lines = _conform_lines(lines)
+    capture_pixel_span_sq = _get_capture_pixel_span_sq(res, extra_capture_pixel_span)
 
     df_component = ones((res, res), dtype=float32)
     num_lines_component = zeros((res, res), dtype=uint32)
@@ -28,21 +339,7 @@ def build_line_df_hybrid_v1(
     for x, y in ((x_, y_) for x_ in range(res) for y_ in range(res)):
         uv = array(((x + 0.5) / res, (y + 0.5) / res), dtype=float32)
 
-        # https://www.geogebra.org/calculator/aajzrdep
-        Ax = lines[:,0] - uv[0]
-        Ay = lines[:,1] - uv[1]
-        ABx = lines[:,2]
-        ABy = lines[:,3]
-
-        t = (Ax * ABx + Ay * ABy) / (ABx * ABx + ABy * ABy)
-        t = maximum(minimum(t, 1), 0)
-
-        nearest_point_x = Ax - ABx * t
-        nearest_point_y = Ay - ABy * t
-        nearest_dist_sq = (
-            (nearest_point_x * nearest_point_x)
-            + (nearest_point_y * nearest_point_y)
-        )
+        nearest_dist_sq = _line_dist_sq(lines, uv[0], uv[1])
 
         filtered = nearest_dist_sq <= capture_pixel_span_sq
         num_lines = sum(filtered)
@@ -55,38 +352,232 @@ def build_line_df_hybrid_v1(
             initial_buckets_mapping[line_ids] = len(initial_buckets_mapping)
         initial_bucket_ids_component[y,x] = initial_buckets_mapping[line_ids]
 
-    # Do a relatively simple compression pass so we can reuse already written lines
-    compressed_stream = []
-    compress_lookup = {}
-    
-    for (line_ids, bucket_index) in sorted(
-            initial_buckets_mapping.items(),
-            key=lambda x: -len(x[0])):
-        
-        if bucket_index not in compress_lookup:
-            # todo, use rabin-karp
-            n = len(compressed_stream) - len(line_ids)
-            found = None
-            for i in range(n):
-                if tuple(compressed_stream[i:i+len(line_ids)]) == line_ids:
-                    found = i
-                    break
-            if not found:
-                found = len(compressed_stream)
-                compressed_stream.extend(line_ids)
-            compress_lookup[bucket_index] = found
+    return _pack_line_df_hybrid_v1(
+        lines,
+        res,
+        df_component,
+        num_lines_component,
+        initial_bucket_ids_component,
+        initial_buckets_mapping,
+        return_stats
+    )
 
-    df_bits = (maximum(df_component - 1.0/res, 1.0/255.0) * 255).astype(uint32)
-    num_lines_bits = (num_lines_component << 8)
-    offset_bits = array([
-        [
-            compress_lookup[bucket_index] << 16
-            for bucket_index in onedim
-        ]
-        for onedim in initial_bucket_ids_component
-    ], dtype=uint32)
 
-    df_texture = df_bits | num_lines_bits | offset_bits
-    lines_buffer = lines[compressed_stream]
+def _sweep_tile(lines, line_bboxes, u, v, capture_pixel_span_sq, margin):
+    """Find the captured lines and distance field of a tile of texels.
+
+    Lines are visited in order of the distance between their bbox and the
+    tile, stopping once no remaining line can be nearer than what every
+    texel in the tile has already found.
+
+    Args:
+        lines (array[float[4]]): Conformed lines.
+        line_bboxes (array[float64[4]]): bbox min / max of each line.
+        u (array[float32]): Texel center x, per texel.
+        v (array[float32]): Texel center y, per texel.
+        capture_pixel_span_sq (float): Squared capture span.
+        margin (float): Slack for float32 rounding of the distances.
+
+    Returns:
+        tuple(array[float32], array[int], array[int]): Squared distance to
+            the nearest uncaptured line per texel and the (texel, line)
+            index pairs of captured lines.
+    """
+    gap_x = maximum(
+        maximum(line_bboxes[:, 0] - u.max(), u.min() - line_bboxes[:, 2]),
+        0.0
+    )
+    gap_y = maximum(
+        maximum(line_bboxes[:, 1] - v.max(), v.min() - line_bboxes[:, 3]),
+        0.0
+    )
+    lower_bounds = maximum(sqrt(gap_x * gap_x + gap_y * gap_y) - margin, 0.0)
+    order = argsort(lower_bounds, kind="stable")
+    lower_bounds = lower_bounds[order]
+
+    best_sq = full(len(u), inf, dtype=float32)
+    captured_texels = []
+    captured_lines = []
+
+    u = u[:, None]
+    v = v[:, None]
+    for start in range(0, len(order), TILE_LINE_BATCH):
+        # Everything left is further than the furthest nearest line
+        if (lower_bounds[start] ** 2) > best_sq.max():
+            break
+        line_ids = order[start:start + TILE_LINE_BATCH]
+        nearest_dist_sq = _line_dist_sq(lines[line_ids], u, v)
+        filtered = nearest_dist_sq <= capture_pixel_span_sq
+        best_sq = minimum(
+            best_sq,
+            where(filtered, float32(inf), nearest_dist_sq).min(axis=1)
+        )
+        texel_ids, batch_ids = nonzero(filtered)
+        captured_texels.append(texel_ids)
+        captured_lines.append(line_ids[batch_ids])
+
+    return (
+        best_sq,
+        concatenate(captured_texels),
+        concatenate(captured_lines),
+    )
+
+
+def _get_line_bboxes(lines):
+    """bbox min / max of conformed lines.
 
-    return df_texture, lines_buffer
+    Args:
+        lines (array[float[4]]): Conformed lines.
+
+    Returns:
+        array[float64[4]]: bbox per line.
+    """
+    x0 = lines[:,0].astype(float64)
+    y0 = lines[:,1].astype(float64)
+    x1 = (lines[:,0] - lines[:,2]).astype(float64)
+    y1 = (lines[:,1] - lines[:,3]).astype(float64)
+    return column_stack((
+        minimum(x0, x1), minimum(y0, y1), maximum(x0, x1), maximum(y0, y1)
+    ))
+
+
+def _get_texel_uv(res):
+    """Texel center coordinates, as the brute force builder computes them."""
+    return array([(x + 0.5) / res for x in range(res)], dtype=float32)
+
+
+def _sweep_texels(lines, line_bboxes, texel_uv, texel_x, texel_y, capture_pixel_span_sq):
+    """Find the captured lines and distance field of a set of texels, tile
+    by tile.
+
+    Args:
+        lines (array[float[4]]): Conformed lines.
+        line_bboxes (array[float64[4]]): bbox min / max of each line.
+        texel_uv (array[float32]): Texel center coordinates.
+        texel_x (array[int]): x of each texel.
+        texel_y (array[int]): y of each texel.
+        capture_pixel_span_sq (float): Squared capture span.
+
+    Returns:
+        tuple(array[float32], array[int], array[int]): Squared distance to
+            the nearest uncaptured line per texel and the (texel, line)
+            index pairs of captured lines.
+    """
+    margin = 1e-5 * max(1.0, float(abs(line_bboxes).max()))
+    tiles_per_row = len(texel_uv) // TILE_SIZE + 1
+    tiles = (texel_y // TILE_SIZE) * tiles_per_row + texel_x // TILE_SIZE
+    order = argsort(tiles, kind="stable")
+
+    best_sq = zeros(len(texel_x), dtype=float32)
+    captured_texels = [zeros(0, dtype=int64)]
+    captured_lines = [zeros(0, dtype=int64)]
+    for texels in split(order, nonzero(diff(tiles[order]))[0] + 1):
+        if not len(texels):
+            continue
+        tile_best_sq, texel_ids, line_ids = _sweep_tile(
+            lines,
+            line_bboxes,
+            texel_uv[texel_x[texels]],
+            texel_uv[texel_y[texels]],
+            capture_pixel_span_sq,
+            margin
+        )
+        best_sq[texels] = tile_best_sq
+        captured_texels.append(texels[texel_ids])
+        captured_lines.append(line_ids)
+
+    if isinf(best_sq).any():
+        raise ValueError("Texel captured every line, no distance to store")
+
+    return best_sq, concatenate(captured_texels), concatenate(captured_lines)
+
+
+def build_line_df_hybrid_v1(
+        lines,
+        res=256,
+        extra_capture_pixel_span=1,
+        return_stats=False):
+    """Build a hybrid line distance field.
+
+    Each texel stores the distance to the nearest line outside of its
+    capture span, along with an offset and count into the lines buffer
+    of the lines within it.
+
+    The texture is swept in tiles, only evaluating the lines which could
+    affect each tile, the output is bit identical to
+    build_line_df_hybrid_v1_bruteforce.
+
+    Args:
+        lines (array[float[4]]): Lines as (x0, y0, x1, y1).
+        res (int): Resolution of the distance field. (Default: 256)
+        extra_capture_pixel_span (float): Extra pixels to capture lines
+            within, beyond the texel itself. (Default: 1)
+        return_stats (bool): Also return stats about the lines buffer
+            compression. (Default: False)
+
+    Returns:
+        tuple(array[uint32], array[float[4]]): df texture and lines buffer,
+            followed by a dict of stats if return_stats is set.
+    """
+    conformed_lines = _conform_lines(lines)
+
+    # Zero length lines give NaNs, which poison the whole field, leave
+    # that to the brute force builder.
+    ABx = conformed_lines[:,2]
+    ABy = conformed_lines[:,3]
+    if not all(ABx * ABx + ABy * ABy > 0):
+        return build_line_df_hybrid_v1_bruteforce(
+            lines,
+            res,
+            extra_capture_pixel_span,
+            return_stats
+        )
+    lines = conformed_lines
+
+    capture_pixel_span_sq = _get_capture_pixel_span_sq(res, extra_capture_pixel_span)
+    line_bboxes = _get_line_bboxes(lines)
+
+    # Texels are keyed in the order the brute force builder visits them
+    texel_x = repeat(arange(res), res)
+    texel_y = tile(arange(res), res)
+    df_sq_component, captured_texels, captured_lines = _sweep_texels(
+        lines,
+        line_bboxes,
+        _get_texel_uv(res),
+        texel_x,
+        texel_y,
+        capture_pixel_span_sq
+    )
+    df_sq_component = df_sq_component.reshape((res, res)).T
+
+    order = lexsort((captured_lines, captured_texels))
+    captured_texels = captured_texels[order]
+    captured_lines = captured_lines[order].tolist()
+
+    num_lines_component = bincount(captured_texels, minlength=res * res).astype(uint32)
+    bucket_ends = cumsum(num_lines_component).tolist()
+    bucket_starts = [0] + bucket_ends[:-1]
+    initial_bucket_ids = zeros(res * res, dtype=uint32)
+    initial_buckets_mapping = {}
+    for texel, (start, end) in enumerate(zip(bucket_starts, bucket_ends)):
+        line_ids = tuple(captured_lines[start:end])
+        if line_ids not in initial_buckets_mapping:
+            initial_buckets_mapping[line_ids] = len(initial_buckets_mapping)
+        initial_bucket_ids[texel] = initial_buckets_mapping[line_ids]
+
+    # Match the float32 ** 0.5 of the brute force builder, which isn't
+    # always the same as sqrt.
+    df_component = array(
+        [df_sq ** 0.5 for df_sq in df_sq_component.ravel()],
+        dtype=float32
+    ).reshape((res, res))
+
+    return _pack_line_df_hybrid_v1(
+        lines,
+        res,
+        df_component,
+        num_lines_component.reshape((res, res)).T,
+        initial_bucket_ids.reshape((res, res)).T,
+        initial_buckets_mapping,
+        return_stats
+    )
@@ -0,0 +1,369 @@
+_SUM = sum
+_MIN = min
+_MAX = max
+from numpy import *
+sum = _SUM
+min = _MIN
+max = _MAX
+
+from .v1 import (
+    MAX_BUCKET_OFFSET,
+    _HASH_BASE,
+    _HASH_BASE_INV,
+    _conform_lines,
+    _find_sequences,
+    _get_capture_pixel_span_sq,
+    _get_line_bboxes,
+    _get_texel_uv,
+    _hash_powers,
+    _line_dist_sq,
+    _sweep_texels,
+    compress_line_buckets,
+)
+
+
+class LineDfHybridV1Update(object):
+    """What changed after a LineDfHybridV1.update."""
+
+    def __init__(self, dirty_rect, lines_buffer_range, repacked):
+        # (x, y, width, height) of df_texture to re-upload, or None
+        self.dirty_rect = dirty_rect
+        # (start, end) rows of lines_buffer to re-upload, or None
+        self.lines_buffer_range = lines_buffer_range
+        # Whether the whole lines buffer was rebuilt (and df_texture is
+        # entirely dirty)
+        self.repacked = repacked
+
+    def __repr__(self):
+        return "LineDfHybridV1Update(dirty_rect={0}, lines_buffer_range={1}, repacked={2})".format(
+            self.dirty_rect,
+            self.lines_buffer_range,
+            self.repacked
+        )
+
+
+class LineDfHybridV1(object):
+    """A line hybrid distance field which can be updated as lines are
+    added and removed, such as for moving or destructible walls.
+
+    Only texels whose captured lines or nearest uncaptured line could
+    change are recomputed. New buckets are appended to the lines buffer,
+    so existing offsets stay valid, the lines of removed ids are left in
+    place but are no longer referenced.
+
+    Line ids index into the lines given on construction, followed by any
+    added later, removed ids are never reused.
+
+    Usage:
+        df = LineDfHybridV1(lines, res)
+        upload(df.df_texture, df.lines_buffer)
+
+        new_ids = df.add_lines(new_lines)
+        update = df.update(added_ids=new_ids, removed_ids=(3, 4))
+        if update.dirty_rect:
+            x, y, width, height = update.dirty_rect
+            glTextureSubImage2D(
+                df_texture, 0, x, y, width, height,
+                GL_RED_INTEGER, GL_UNSIGNED_INT,
+                df.get_df_texture_rect(update.dirty_rect).tobytes()
+            )
+    """
+
+    def __init__(self, lines, res=256, extra_capture_pixel_span=1):
+        """Initializer.
+
+        Args:
+            lines (array[float[4]]): Lines as (x0, y0, x1, y1).
+            res (int): Resolution of the distance field. (Default: 256)
+            extra_capture_pixel_span (float): Extra pixels to capture lines
+                within, beyond the texel itself. (Default: 1)
+        """
+        self.res = res
+        self._capture_pixel_span_sq = _get_capture_pixel_span_sq(res, extra_capture_pixel_span)
+        self._texel_uv = _get_texel_uv(res)
+
+        self._lines = zeros((0, 4), dtype=float32)
+        self._line_bboxes = zeros((0, 4), dtype=float64)
+        self._active = zeros(0, dtype=bool)
+        self.add_lines(lines)
+        self._active[:] = True
+
+        self._df_sq = zeros((res, res), dtype=float32)
+        self._buckets = [()] * (res * res)
+        self._recompute(arange(res * res))
+        self.repack()
+
+    @property
+    def line_count(self):
+        return len(self._lines)
+
+    @property
+    def lines_buffer(self):
+        return self._lines[self._stream]
+
+    def get_df_texture_rect(self, rect):
+        """Get a contiguous copy of part of the df texture.
+
+        Args:
+            rect (tuple(int, int, int, int)): x, y, width, height.
+
+        Returns:
+            array[uint32]: Texture data.
+        """
+        x, y, width, height = rect
+        return ascontiguousarray(self.df_texture[y:y + height, x:x + width])
+
+    def get_lines_buffer_range(self, buffer_range):
+        start, end = buffer_range
+        return ascontiguousarray(self._lines[self._stream[start:end]])
+
+    def add_lines(self, lines):
+        """Register new lines, these don't affect the distance field until
+        passed to update as added ids.
+
+        Args:
+            lines (array[float[4]]): Lines as (x0, y0, x1, y1).
+
+        Returns:
+            array[int]: Ids of the new lines.
+        """
+        lines = _conform_lines(array(lines, dtype=float32).reshape((-1, 4)))
+        ABx = lines[:,2]
+        ABy = lines[:,3]
+        if not all(ABx * ABx + ABy * ABy > 0):
+            raise ValueError("Zero length lines aren't supported")
+
+        first_id = len(self._lines)
+        self._lines = concatenate((self._lines, lines))
+        self._line_bboxes = concatenate((self._line_bboxes, _get_line_bboxes(lines)))
+        self._active = concatenate((self._active, zeros(len(lines), dtype=bool)))
+        return arange(first_id, len(self._lines))
+
+    def _texel_rect(self, bbox, radius):
+        """Texels whose centers are within radius of a bbox.
+
+        Returns:
+            tuple(array[int], array[int]): x and y of each texel.
+        """
+        res = self.res
+        x_start = max(0, int(floor((bbox[0] - radius) * res - 0.5)))
+        y_start = max(0, int(floor((bbox[1] - radius) * res - 0.5)))
+        x_end = min(res, int(ceil((bbox[2] + radius) * res - 0.5)) + 1)
+        y_end = min(res, int(ceil((bbox[3] + radius) * res - 0.5)) + 1)
+        if x_start >= x_end or y_start >= y_end:
+            return zeros(0, dtype=int64), zeros(0, dtype=int64)
+        texel_y, texel_x = meshgrid(
+            arange(y_start, y_end),
+            arange(x_start, x_end),
+            indexing="ij"
+        )
+        return texel_x.ravel(), texel_y.ravel()
+
+    def _affected_texels(self, line_id):
+        """Texels which could capture a line, or have it as their nearest.
+
+        Returns:
+            tuple(array[int], array[int], array[float32]): x and y of each
+                texel and its squared distance to the line.
+        """
+        radius = (
+            max(float(self._df_sq.max()), self._capture_pixel_span_sq) ** 0.5
+            + 2.0 / self.res
+        )
+        texel_x, texel_y = self._texel_rect(self._line_bboxes[line_id], radius)
+        dist_sq = _line_dist_sq(
+            self._lines[line_id:line_id + 1],
+            self._texel_uv[texel_x][:, None],
+            self._texel_uv[texel_y][:, None]
+        )[:, 0]
+        return texel_x, texel_y, dist_sq
+
+    def _recompute(self, texels):
+        """Recompute the buckets and distances of texels from scratch.
+
+        Args:
+            texels (array[int]): Texel indices (y * res + x).
+        """
+        active_ids = nonzero(self._active)[0]
+        texel_y, texel_x = divmod(texels, self.res)
+        best_sq, captured_texels, captured_lines = _sweep_texels(
+            self._lines[active_ids],
+            self._line_bboxes[active_ids],
+            self._texel_uv,
+            texel_x,
+            texel_y,
+            self._capture_pixel_span_sq
+        )
+        self._df_sq[texel_y, texel_x] = best_sq
+
+        captured_lines = active_ids[captured_lines]
+        order = lexsort((captured_lines, captured_texels))
+        captured_texels = captured_texels[order].tolist()
+        captured_lines = captured_lines[order].tolist()
+
+        buckets = self._buckets
+        for texel in texels.tolist():
+            buckets[texel] = ()
+        start = 0
+        while start < len(captured_texels):
+            end = start
+            texel = captured_texels[start]
+            while end < len(captured_texels) and captured_texels[end] == texel:
+                end += 1
+            buckets[texels[texel]] = tuple(captured_lines[start:end])
+            start = end
+
+    def update(self, added_ids=(), removed_ids=()):
+        """Apply added and removed lines.
+
+        Args:
+            added_ids (iterable[int]): Ids of lines to add, see add_lines.
+            removed_ids (iterable[int]): Ids of lines to remove.
+
+        Returns:
+            LineDfHybridV1Update: What needs re-uploading.
+        """
+        res = self.res
+        added_ids = [int(line_id) for line_id in added_ids if not self._active[line_id]]
+        removed_ids = [int(line_id) for line_id in removed_ids if self._active[line_id]]
+        if not added_ids and not removed_ids:
+            return LineDfHybridV1Update(None, None, False)
+
+        touched = set()
+        recompute = set()
+        buckets = self._buckets
+
+        # Removed lines only matter where they were captured, or were the
+        # nearest uncaptured line (ties included).
+        for line_id in removed_ids:
+            texel_x, texel_y, dist_sq = self._affected_texels(line_id)
+            captured = dist_sq <= self._capture_pixel_span_sq
+            nearest = ~captured & (dist_sq == self._df_sq[texel_y, texel_x])
+            for texel in (texel_y[captured] * res + texel_x[captured]).tolist():
+                buckets[texel] = tuple(x for x in buckets[texel] if x != line_id)
+                touched.add(texel)
+            recompute.update((texel_y[nearest] * res + texel_x[nearest]).tolist())
+        self._active[removed_ids] = False
+
+        # Added lines can only capture or bring the nearest line closer
+        self._active[added_ids] = True
+        for line_id in added_ids:
+            texel_x, texel_y, dist_sq = self._affected_texels(line_id)
+            captured = dist_sq <= self._capture_pixel_span_sq
+            for texel in (texel_y[captured] * res + texel_x[captured]).tolist():
+                buckets[texel] = tuple(sorted(buckets[texel] + (line_id,)))
+                touched.add(texel)
+            nearer = ~captured & (dist_sq < self._df_sq[texel_y, texel_x])
+            self._df_sq[texel_y[nearer], texel_x[nearer]] = dist_sq[nearer]
+            touched.update((texel_y[nearer] * res + texel_x[nearer]).tolist())
+
+        if recompute:
+            self._recompute(array(sorted(recompute), dtype=int64))
+            touched.update(recompute)
+
+        texels = array(sorted(touched), dtype=int64)
+        stream_size = len(self._stream)
+        if not self._place_buckets(set(buckets[texel] for texel in texels.tolist())):
+            self.repack()
+            return LineDfHybridV1Update(
+                (0, 0, res, res),
+                (0, len(self._stream)),
+                True
+            )
+
+        texel_y, texel_x = divmod(texels, res)
+        packed = self._pack_texels(texels)
+        changed = packed != self.df_texture[texel_y, texel_x]
+        self.df_texture[texel_y, texel_x] = packed
+
+        dirty_rect = None
+        if changed.any():
+            x_start = int(texel_x[changed].min())
+            y_start = int(texel_y[changed].min())
+            dirty_rect = (
+                x_start,
+                y_start,
+                int(texel_x[changed].max()) + 1 - x_start,
+                int(texel_y[changed].max()) + 1 - y_start,
+            )
+
+        lines_buffer_range = None
+        if len(self._stream) != stream_size:
+            lines_buffer_range = (stream_size, len(self._stream))
+
+        return LineDfHybridV1Update(dirty_rect, lines_buffer_range, False)
+
+    def _place_buckets(self, buckets):
+        """Find or append buckets in the lines buffer.
+
+        Args:
+            buckets (set[tuple[int]]): Buckets which need an offset.
+
+        Returns:
+            bool: False if a bucket wouldn't fit within the 16 bit offsets.
+        """
+        missing = [bucket for bucket in buckets if bucket not in self._offsets]
+        if not missing:
+            return True
+
+        groups = {}
+        for bucket in missing:
+            groups.setdefault(len(bucket), []).append(bucket)
+
+        stream_values = array(self._stream, dtype=uint64) + 1
+        size = len(stream_values) + 1
+        powers = _hash_powers(_HASH_BASE, size)
+        inv_powers = _hash_powers(_HASH_BASE_INV, size)
+        for length, group in groups.items():
+            positions = _find_sequences(
+                stream_values,
+                array(group, dtype=uint64) + 1,
+                powers,
+                inv_powers
+            )
+            for bucket, position in zip(group, positions.tolist()):
+                if position < 0:
+                    position = len(self._stream)
+                    if position > MAX_BUCKET_OFFSET:
+                        return False
+                    self._stream.extend(bucket)
+                self._offsets[bucket] = position
+
+        return True
+
+    def _pack_texels(self, texels):
+        """Pack the df texture value of texels.
+
+        Args:
+            texels (array[int]): Texel indices (y * res + x).
+
+        Returns:
+            array[uint32]: Packed values.
+        """
+        res = self.res
+        texel_y, texel_x = divmod(texels, res)
+        # Match the float32 ** 0.5 of build_line_df_hybrid_v1
+        df = array(
+            [df_sq ** 0.5 for df_sq in self._df_sq[texel_y, texel_x]],
+            dtype=float32
+        )
+        buckets = [self._buckets[texel] for texel in texels.tolist()]
+        df_bits = (maximum(df - 1.0/res, 1.0/255.0) * 255).astype(uint32)
+        num_lines_bits = array([len(bucket) for bucket in buckets], dtype=uint32) << 8
+        offset_bits = array(
+            [self._offsets[bucket] << 16 for bucket in buckets],
+            dtype=uint32
+        )
+        return df_bits | num_lines_bits | offset_bits
+
+    def repack(self):
+        """Rebuild the lines buffer from scratch, dropping removed lines
+        and anything no longer referenced.
+        """
+        self._stream, self._offsets = compress_line_buckets(self._buckets)
+        max_offset = max(self._offsets.values())
+        if max_offset > MAX_BUCKET_OFFSET:
+            raise ValueError(
+                "Lines buffer offset {0} doesn't fit in 16 bits".format(max_offset)
+            )
+        self.df_texture = self._pack_texels(arange(self.res * self.res)).reshape((self.res, self.res))
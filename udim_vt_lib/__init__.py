@@ -1,9 +1,19 @@
 
 from . _imageio_pil import Image
+from . tile_source import TileSource, TileCache, TILE_CACHE
 from . indirection import (
     UdimIndirectionBuilder,
     UdimEntry
 )
+from . feedback import decode_feedback, FeedbackRequests
+from . virtual_texture_manager import (
+    TileAllocator,
+    TileUpdateBatch,
+    FakeTileUploader,
+    pack_request,
+    unpack_request,
+)
+from . gl_tile_uploader import GLTileUploader
 
 
 import os
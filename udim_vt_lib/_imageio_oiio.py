@@ -12,9 +12,7 @@ import numpy
 
 import OpenImageIO
 
-
-TILE_SIZE = 64
-PADDED_TILE_SIZE = TILE_SIZE + 2
+from . tile_source import TileSource, TILE_SIZE, PADDED_TILE_SIZE
 
 IMAGE_CACHE = OpenImageIO.ImageCache(True)
 
@@ -31,11 +29,12 @@ def read_pixels(image_handle, mip, x_start, x_end, y_start, y_end):
     )
 
 
-class Image(object):
+class Image(TileSource):
     
-    def __init__(self, filepath=r"C:\Users\thoth\Desktop\im0.png"):
+    def __init__(self, filepath=r"C:\Users\thoth\Desktop\im0.png", tile_cache=None):
         # OIIO on python doesn't expose ImageHandle* instances
         self._image_handle = filepath
+        TileSource.__init__(self, filepath, tile_cache)
 
         # Gather dimensions, mip count etc, substitute for ImageCache.get_image_info
         inspect = OpenImageIO.ImageInput.open(filepath)
@@ -58,7 +57,7 @@ class Image(object):
             self.format = None
             self.has_mip_tail = False
 
-    def read_tile(self, mip, x, y):
+    def _read_tile_uncached(self, mip, x, y):
         # Not a mip tail tile
         tile_start_x = x * TILE_SIZE - 1
         tile_end_x = tile_start_x + PADDED_TILE_SIZE
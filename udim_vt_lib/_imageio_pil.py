@@ -1,111 +1,166 @@
+import os
+import threading
+import weakref
+
 import numpy
+from numpy.lib.stride_tricks import as_strided
 from PIL import Image
 
-TILE_SIZE = 64
-PADDED_TILE_SIZE = TILE_SIZE + 2
-PilImage = Image
+from . tile_source import TileSource, TILE_SIZE, PADDED_TILE_SIZE
 
+PilImage = Image
 
 
 def _image_to_nprgb8(image):
     """Convert a PIL image to a RGBA8 numpy array."""
-    image_data = numpy.array(image.getdata(), dtype=numpy.uint8)
-    if image_data.shape[1] != 4:
-        if image_data.shape[1] < 4:
-            # Padd RGB with black
-            if image_data.shape[1] < 3:
-                image_data = numpy.lib.pad(image_data, ((0, 0), (0, 3-image_data.shape[1])))
-            # Padd alpha with white
-            image_data = numpy.lib.pad(image_data, ((0, 0), (0, 1)), constant_values=(0xff,))
-        else:
-            image_data = numpy.resize(image_data, (image_data.shape[0], 4))
-    image_data = numpy.reshape(image_data, (image.height, image.width, 4))
+    if image.mode not in ("L", "LA", "RGB", "RGBA"):
+        image = image.convert("RGBA")
+    image_data = numpy.asarray(image, dtype=numpy.uint8)
+    if image_data.ndim == 2:
+        image_data = image_data[:, :, None]
+    channels = image_data.shape[2]
+    if channels != 4:
+        # Padd RGB with black and alpha with white
+        rgba = numpy.zeros(image_data.shape[:2] + (4,), dtype=numpy.uint8)
+        rgba[:, :, :min(channels, 3)] = image_data[:, :, :3]
+        rgba[:, :, 3] = 0xff
+        image_data = rgba
     return image_data
 
 
-def _mip_chain(image):
-    """Creates the next mip in a chain."""
-    width = image.width >> 1
-    height = image.height >> 1
-    if width == 0 and height == 0:
-        return None
-    if width == 0:
-        width = 1
-    if height == 0:
-        height = 1
-    return image.resize((width, height), PilImage.BOX)
-
+def _box_downsample(pixels):
+    """Create the next mip in a chain with a 2x2 box filter, dimensions
+    of 1 are only filtered along the other axis."""
+    height, width = pixels.shape[:2]
+    next_height = max(1, height >> 1)
+    next_width = max(1, width >> 1)
+    acc = pixels.astype(numpy.uint16)
+    count = 1
+    if height > 1:
+        acc = acc[0:next_height * 2:2] + acc[1:next_height * 2:2]
+        count *= 2
+    if width > 1:
+        acc = acc[:, 0:next_width * 2:2] + acc[:, 1:next_width * 2:2]
+        count *= 2
+    return ((acc + (count >> 1)) // count).astype(numpy.uint8)
+
+
+class _MipChain(object):
+    """Lazily decoded mips of an image file, shared by every Image of the
+    same file.
+
+    Mips are stored padded by their edge pixels, out to a whole number of
+    tiles plus the 1px border, so padded tiles are just strided views.
+    """
+
+    def __init__(self, filepath):
+        # PIL only reads the header here
+        self._image = PilImage.open(filepath)
+        self.size = self._image.size
+        self.mips = max(self.size).bit_length()
+        self._padded = {}
+        self._lock = threading.RLock()
+
+    def _pixels(self, mip):
+        padded = self._get_padded(mip)
+        width = max(1, self.size[0] >> mip)
+        height = max(1, self.size[1] >> mip)
+        return padded[1:height + 1, 1:width + 1]
+
+    def _get_padded(self, mip):
+        with self._lock:
+            padded = self._padded.get(mip)
+            if padded is not None:
+                return padded
+
+            if mip == 0:
+                self._image.load()
+                pixels = _image_to_nprgb8(self._image)
+                # Don't keep the decoded PIL image around too
+                self._image.close()
+            else:
+                pixels = _box_downsample(self._pixels(mip - 1))
+
+            height, width = pixels.shape[:2]
+            tiles_x = (width + TILE_SIZE - 1) // TILE_SIZE
+            tiles_y = (height + TILE_SIZE - 1) // TILE_SIZE
+            padded = numpy.pad(
+                pixels,
+                (
+                    (1, tiles_y * TILE_SIZE + 1 - height),
+                    (1, tiles_x * TILE_SIZE + 1 - width),
+                    (0, 0)
+                ),
+                mode="edge"
+            )
+            self._padded[mip] = padded
+            return padded
+
+    def get_tiles(self, mip):
+        """Get every padded tile of a mip.
+
+        Args:
+            mip (int): Mip.
+
+        Returns:
+            numpy.ndarray: Read only (tiles_y, tiles_x, 66, 66, 4) view.
+        """
+        padded = self._get_padded(mip)
+        tiles_y = (padded.shape[0] - 2) // TILE_SIZE
+        tiles_x = (padded.shape[1] - 2) // TILE_SIZE
+        row_stride, pixel_stride, channel_stride = padded.strides
+        return as_strided(
+            padded,
+            shape=(tiles_y, tiles_x, PADDED_TILE_SIZE, PADDED_TILE_SIZE, 4),
+            strides=(
+                row_stride * TILE_SIZE,
+                pixel_stride * TILE_SIZE,
+                row_stride,
+                pixel_stride,
+                channel_stride
+            ),
+            writeable=False
+        )
 
-class Image(object):
-    
-    def __init__(self, filepath=r"C:\Users\thoth\Desktop\im0.png", automip=True):
-        try:
-            image = PilImage.open(filepath)
-        
-        except FileNotFoundError:
-            self.valid = False
-            self.mip_data = []
-            self.mips = 0
-            self.size = (0, 0)
-            self.has_mip_tail = False
 
-        self.mips = 1
-        self.mip_data = [_image_to_nprgb8(image)]
-        self.size = (image.width, image.height)
-        self.has_mip_tail = False
-
-        if automip:
-            image = _mip_chain(image)
-            while image is not None:
-                self.mip_data.append(_image_to_nprgb8(image))
-                self.mips += 1
-                image = _mip_chain(image)
-            self.has_mip_tail = True
-
-    def _read_pixels(self, mip, x_start, x_end, y_start, y_end):
-        buf = numpy.zeros((y_end - y_start, x_end - x_start, 4), dtype=numpy.uint8)
-        if mip < self.mips:
-            pixels = self.mip_data[mip]
-            xdst = max(0, -x_start)
-            ydst = max(0, -y_start)
-            xsrc = max(0, x_start)
-            ysrc = max(0, y_start)
-            width = min(x_end, pixels.shape[1]) - x_start - xdst
-            height = min(y_end, pixels.shape[0]) - y_start - ydst
-            # print(xdst, ydst)
-            # print(xsrc, ysrc)
-            # print(width, height)
-            buf[ydst:ydst+height, xdst:xdst+width] = pixels[ysrc:ysrc+height, xsrc:xsrc+width]
-        return buf
-
-    def read_tile(self, mip, x, y):
-        # Not a mip tail tile
-        tile_start_x = x * TILE_SIZE - 1
-        tile_end_x = tile_start_x + PADDED_TILE_SIZE
-        
-        tile_start_y = y * TILE_SIZE - 1
-        tile_end_y = tile_start_y + PADDED_TILE_SIZE
-
-        data = self._read_pixels(
-            mip,
-            tile_start_x, tile_end_x,
-            tile_start_y, tile_end_y
-        )
+_MIP_CHAINS = weakref.WeakValueDictionary()
+_MIP_CHAINS_LOCK = threading.Lock()
 
-        # Deal with OOB data by clamping it
-        if x == 0:
-            data[:,0] = data[:,1]
 
-        if y == 0:
-            data[0] = data[1]
+def _get_mip_chain(filepath):
+    filepath = os.path.abspath(filepath)
+    key = (filepath, os.path.getmtime(filepath))
+    with _MIP_CHAINS_LOCK:
+        chain = _MIP_CHAINS.get(key)
+        if chain is None:
+            chain = _MipChain(filepath)
+            _MIP_CHAINS[key] = chain
+    return key, chain
 
-        width = max(1, self.size[0] >> mip)
-        height = max(1, self.size[1] >> mip)
 
-        if width <= tile_end_x:
-            data[:, (tile_end_x - width)] = data[:, (tile_end_x - width - 1)]
+class Image(TileSource):
 
-        if height <= tile_end_y:
-            data[(tile_end_y - height)] = data[(tile_end_y - height - 1)]
+    def __init__(self, filepath=r"C:\Users\thoth\Desktop\im0.png", automip=True, tile_cache=None):
+        try:
+            key, self._chain = _get_mip_chain(filepath)
 
-        return data
+        except OSError:
+            TileSource.__init__(self, None, tile_cache)
+            self._chain = None
+            self.valid = False
+            self.mips = 0
+            self.size = (0, 0)
+            self.has_mip_tail = False
+            return
+
+        TileSource.__init__(self, key, tile_cache)
+        self.valid = True
+        self.size = self._chain.size
+        self.mips = self._chain.mips if automip else 1
+        self.has_mip_tail = automip
+
+    def _read_tile_uncached(self, mip, x, y):
+        tiles_x, tiles_y = self.tile_count(mip)
+        if mip >= self.mips or x >= tiles_x or y >= tiles_y:
+            return numpy.zeros((PADDED_TILE_SIZE, PADDED_TILE_SIZE, 4), dtype=numpy.uint8)
+        return numpy.ascontiguousarray(self._chain.get_tiles(mip)[y, x])
@@ -0,0 +1,96 @@
+import numpy
+
+
+INVALID_UDIM = 0xffffffff
+
+
+class FeedbackRequests(object):
+    """Unique, valid tile requests decoded from a feedback buffer, in the
+    order they should be streamed in (coarsest mip first, then the most
+    requested).
+
+    All attributes are arrays with one entry per request.
+    """
+
+    def __init__(self, requests, counts, udims, mips, tile_x, tile_y, indirection_offsets):
+        self.requests = requests
+        self.counts = counts
+        self.udims = udims
+        self.mips = mips
+        self.tile_x = tile_x
+        self.tile_y = tile_y
+        self.indirection_offsets = indirection_offsets
+
+    def __len__(self):
+        return len(self.requests)
+
+
+def decode_feedback(feedback, udim_info_start, udim_info):
+    """Decode feedback written by apply_vt_textures.comp.
+
+    Each request is a uvec2 of the (relative) udim id ((x << 16) | y) and
+    the packed tile (x | (y << 10) | (mip << 20)), read back as little
+    endian uint64s.
+
+    Args:
+        feedback (numpy.ndarray): uint64 requests, or uint32 pairs.
+        udim_info_start (numpy.ndarray): UdimIndirectionBuilder.udim_info_start.
+        udim_info (numpy.ndarray): UdimIndirectionBuilder.udim_info.
+
+    Returns:
+        FeedbackRequests: Decoded requests, requests for unknown udims,
+            mips or tiles are dropped.
+    """
+    feedback = numpy.ascontiguousarray(feedback)
+    if feedback.dtype != numpy.uint64:
+        feedback = feedback.astype(numpy.uint32, copy=False).view(numpy.uint64)
+    requests, counts = numpy.unique(feedback.ravel(), return_counts=True)
+
+    udims = (requests & numpy.uint64(0xffffffff)).astype(numpy.int64)
+    packed = (requests >> numpy.uint64(32)).astype(numpy.int64)
+    mips = packed >> 20
+    tile_y = (packed >> 10) & 0x3ff
+    tile_x = packed & 0x3ff
+    udim_x = udims >> 16
+    udim_y = udims & 0xffff
+
+    valid = (
+        (udims != INVALID_UDIM)
+        & (udim_x < udim_info_start.shape[1])
+        & (udim_y < udim_info_start.shape[0])
+    )
+    info_offsets = numpy.full(len(requests), INVALID_UDIM, dtype=numpy.int64)
+    info_offsets[valid] = udim_info_start[udim_y[valid], udim_x[valid]]
+    valid &= info_offsets != INVALID_UDIM
+    valid[valid] = mips[valid] < udim_info[info_offsets[valid] + 2]
+
+    # Tiles outside of the mip (can't happen unless something's gone wrong)
+    checked = numpy.flatnonzero(valid)
+    mip_width = numpy.maximum(udim_info[info_offsets[checked]].astype(numpy.int64) >> mips[checked], 1)
+    mip_height = numpy.maximum(udim_info[info_offsets[checked] + 1].astype(numpy.int64) >> mips[checked], 1)
+    valid[checked] = (
+        (tile_x[checked] < (mip_width + 63) // 64)
+        & (tile_y[checked] < (mip_height + 63) // 64)
+    )
+
+    # Coarser mips first, so there is something to fall back on sooner,
+    # then whatever covers the most of the screen
+    order = numpy.flatnonzero(valid)
+    order = order[numpy.lexsort((-counts[order], -mips[order]))]
+
+    mip_addresses = udim_info[info_offsets[order] + 3 + mips[order]].astype(numpy.int64)
+    indirection_offsets = numpy.stack((
+        (mip_addresses & 0xfff) + tile_x[order],
+        ((mip_addresses >> 12) & 0xfff) + tile_y[order],
+        mip_addresses >> 24,
+    ), axis=1)
+
+    return FeedbackRequests(
+        requests[order],
+        counts[order],
+        udims[order],
+        mips[order],
+        tile_x[order],
+        tile_y[order],
+        indirection_offsets
+    )
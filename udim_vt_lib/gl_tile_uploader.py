@@ -0,0 +1,48 @@
+import numpy
+from OpenGL.GL import *
+
+from . virtual_texture_manager import PADDED_TILE_SIZE
+
+
+class GLTileUploader(object):
+    """Applies TileAllocator updates to the virtual and indirection
+    textures, must be used on the thread owning the GL context.
+
+    Args:
+        virtual_texture (int): RGBA8 2D array texture tiles live in.
+        indirection_texture (int): R16UI 2D array indirection texture.
+    """
+
+    def __init__(self, virtual_texture, indirection_texture):
+        self.virtual_texture = virtual_texture
+        self.indirection_texture = indirection_texture
+
+    def upload_tile(self, tile_xyz, data):
+        glTextureSubImage3D(
+            self.virtual_texture,
+            0,
+            tile_xyz[0] * PADDED_TILE_SIZE,
+            tile_xyz[1] * PADDED_TILE_SIZE,
+            tile_xyz[2],
+            PADDED_TILE_SIZE,
+            PADDED_TILE_SIZE,
+            1,
+            GL_RGBA,
+            GL_UNSIGNED_BYTE,
+            numpy.ascontiguousarray(data, dtype=numpy.uint8)
+        )
+
+    def set_indirection(self, indirection_offset, value):
+        glTextureSubImage3D(
+            self.indirection_texture,
+            0,
+            indirection_offset[0],
+            indirection_offset[1],
+            indirection_offset[2],
+            1,
+            1,
+            1,
+            GL_RED_INTEGER,
+            GL_UNSIGNED_SHORT,
+            numpy.array([value], dtype=numpy.uint16)
+        )
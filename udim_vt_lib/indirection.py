@@ -136,28 +136,77 @@ class UdimEntry(object):
 
 
 class _UdimPage(object):
+    """Packs mip indirections into a page with a bottom-left skyline.
+
+    Rather than an occupancy grid, only the height of the packed region
+    along x is stored (as runs of (x, y, width)), so a page costs a few
+    hundred bytes and allocations scale with the number of runs.
+    Space left under overhangs is never reused, which with the biggest
+    first ordering _allocate_mip_indirections uses rarely matters.
+    """
 
     def __init__(self, max_dimension=4096):
-        # Start off with a 1x1
-        self._page = numpy.zeros((max_dimension, max_dimension), dtype=numpy.uint8)
-        # Keep track of free space for rows and cols
-        self._space_x = numpy.full(max_dimension, max_dimension)
-        self._space_y = numpy.full(max_dimension, max_dimension)
+        self._max_dimension = max_dimension
+        self._skyline = [(0, 0, max_dimension)]
         self.max_written_x = 0
         self.max_written_y = 0
+        self.used_area = 0
+
+    def _fit(self, index, width, height):
+        """Get the y something would be placed at if it started at a run,
+        None if it doesn't fit."""
+        x = self._skyline[index][0]
+        if x + width > self._max_dimension:
+            return None
+        y = 0
+        remaining = width
+        while remaining > 0:
+            _, run_y, run_width = self._skyline[index]
+            y = max(y, run_y)
+            if y + height > self._max_dimension:
+                return None
+            remaining -= run_width
+            index += 1
+        return y
 
     def allocate(self, width, height):
-        for y in range(len(self._space_x) - height):
-            # It looks like we may be able to allocate here
-            if (width <= self._space_x[y:y+height]).all():
-                # Find a spot if possible
-                for x in range(self._page.shape[1] - width):
-                    # Lazy python version to check if entire grid is free
-                    if (self._page[y:y+height, x:x+width] == 0).all():
-                        self._page[y:y+height, x:x+width] = 1
-                        self.max_written_x = max(self.max_written_x, x+width)
-                        self.max_written_y = max(self.max_written_y, y+height)
-                        self._space_x[y:y+height] -= width
-                        self._space_y[x:x+width] -= height
-                        return (x, y)
-        return None
+        best_y = self._max_dimension
+        best_index = -1
+        for index in range(len(self._skyline)):
+            y = self._fit(index, width, height)
+            if y is not None and y < best_y:
+                best_y = y
+                best_index = index
+        if best_index == -1:
+            return None
+
+        x = self._skyline[best_index][0]
+        y = best_y
+
+        # Replace the covered runs, keeping whatever sticks out the right
+        end = x + width
+        index = best_index
+        while index < len(self._skyline):
+            run_x, run_y, run_width = self._skyline[index]
+            if run_x >= end:
+                break
+            run_end = run_x + run_width
+            if run_end > end:
+                self._skyline[index] = (end, run_y, run_end - end)
+                break
+            del self._skyline[index]
+        self._skyline.insert(best_index, (x, y + height, width))
+
+        # Merge neighbours at the same height
+        for index in (best_index, best_index - 1):
+            if 0 <= index < len(self._skyline) - 1:
+                run_x, run_y, run_width = self._skyline[index]
+                next_x, next_y, next_width = self._skyline[index + 1]
+                if run_y == next_y:
+                    self._skyline[index] = (run_x, run_y, run_width + next_width)
+                    del self._skyline[index + 1]
+
+        self.max_written_x = max(self.max_written_x, x + width)
+        self.max_written_y = max(self.max_written_y, y + height)
+        self.used_area += width * height
+        return (x, y)
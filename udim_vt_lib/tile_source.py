@@ -0,0 +1,131 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+TILE_SIZE = 64
+PADDED_TILE_SIZE = TILE_SIZE + 2
+
+# 66x66 RGBA8 tiles, so ~70MB
+DEFAULT_TILE_CACHE_SIZE = 4096
+DEFAULT_READ_THREADS = 4
+
+
+class TileCache(object):
+    """Thread safe LRU cache of padded tiles, shared between images.
+
+    Args:
+        max_tiles (int): Max number of tiles kept.
+    """
+
+    def __init__(self, max_tiles=DEFAULT_TILE_CACHE_SIZE):
+        self.max_tiles = max_tiles
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def get(self, key):
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._tiles.move_to_end(key)
+            return tile
+
+    def put(self, key, tile):
+        with self._lock:
+            self._tiles[key] = tile
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+
+
+TILE_CACHE = TileCache()
+
+_READ_POOL = None
+_READ_POOL_LOCK = threading.Lock()
+
+
+def get_read_pool():
+    """Get the thread pool tiles are read on, created on first use."""
+    global _READ_POOL
+    with _READ_POOL_LOCK:
+        if _READ_POOL is None:
+            _READ_POOL = ThreadPoolExecutor(
+                max_workers=DEFAULT_READ_THREADS,
+                thread_name_prefix="udim_vt_read"
+            )
+        return _READ_POOL
+
+
+class TileSource(object):
+    """Interface the image backends share.
+
+    Subclasses set valid, size, mips and has_mip_tail and implement
+    _read_tile_uncached, returning a (66, 66, 4) uint8 tile with a 1px
+    clamped border.
+    """
+
+    valid = False
+    size = (0, 0)
+    mips = 0
+    has_mip_tail = False
+
+    def __init__(self, cache_key, tile_cache=None):
+        self._cache_key = cache_key
+        self._tile_cache = TILE_CACHE if tile_cache is None else tile_cache
+
+    def tile_count(self, mip):
+        """Get how many tiles a mip has.
+
+        Args:
+            mip (int): Mip.
+
+        Returns:
+            tuple(int, int): Tiles along x and y.
+        """
+        width = max(1, self.size[0] >> mip)
+        height = max(1, self.size[1] >> mip)
+        return ((width + TILE_SIZE - 1) // TILE_SIZE, (height + TILE_SIZE - 1) // TILE_SIZE)
+
+    def read_tile(self, mip, x, y):
+        key = (self._cache_key, mip, x, y)
+        tile = self._tile_cache.get(key)
+        if tile is None:
+            tile = self._read_tile_uncached(mip, x, y)
+            # Cached tiles are shared, so don't let anyone write to them
+            tile.flags.writeable = False
+            self._tile_cache.put(key, tile)
+        return tile
+
+    def read_tile_async(self, mip, x, y):
+        """Read a tile on the shared thread pool.
+
+        Returns:
+            concurrent.futures.Future: Future of the tile.
+        """
+        return get_read_pool().submit(self.read_tile, mip, x, y)
+
+    def read_tiles(self, tiles):
+        """Read tiles in parallel.
+
+        Args:
+            tiles (iterable[tuple(int, int, int)]): (mip, x, y) of each tile.
+
+        Returns:
+            list(numpy.ndarray): Tiles.
+        """
+        return list(get_read_pool().map(lambda tile: self.read_tile(*tile), tiles))
+
+    def _read_tile_uncached(self, mip, x, y):
+        raise NotImplementedError()
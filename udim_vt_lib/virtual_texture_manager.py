@@ -1,143 +1,408 @@
 import threading
-from time import sleep
+import traceback
 
+import numpy
+
+from . feedback import decode_feedback, FeedbackRequests
+from . tile_struct import TileAddress
+
+
+# Tiles are stored as 64x64 pixels with a 1px border
+TILE_SIZE = 64
+PADDED_TILE_SIZE = TILE_SIZE + 2
+
+# 8192x8192 layers hold 124x124 padded tiles
+DEFAULT_POOL_DIMENSIONS = (8192 // PADDED_TILE_SIZE, 8192 // PADDED_TILE_SIZE, 2)
+
+# What missing tiles are set to in the indirection texture
+INVALID_TILE_ADDRESS = 0xffff
+
+# How many tiles are read before the updates are handed over
+DEFAULT_BATCH_SIZE = 16
+
+
+def pack_request(udim_x, udim_y, mip, tile_x, tile_y):
+    """Pack a tile request the same way apply_vt_textures.comp writes
+    them to the feedback buffer (as a little endian uvec2).
+
+    Args:
+        udim_x (int): Udim x, relative to the udim offset.
+        udim_y (int): Udim y, relative to the udim offset.
+        mip (int): Mip.
+        tile_x (int): Tile x.
+        tile_y (int): Tile y.
+
+    Returns:
+        int: 64bit request.
+    """
+    udim = (udim_x << 16) | udim_y
+    packed = tile_x | (tile_y << 10) | (mip << 20)
+    return udim | (packed << 32)
+
+
+def unpack_request(request):
+    """Unpack a 64bit tile request.
+
+    Args:
+        request (int): 64bit request.
+
+    Returns:
+        tuple(int, int, int, int): udim (as (udim_x << 16) | udim_y),
+            mip, tile_x, tile_y.
+    """
+    udim = request & 0xffffffff
+    packed = request >> 32
+    mip = packed >> 20
+    tile_y = (packed >> 10) & 0x3ff
+    tile_x = packed & 0x3ff
+    return udim, mip, tile_x, tile_y
 
 
 class Tile(object):
 
-    def __init__(self):
+    def __init__(self, x, y, layer):
         self.next = None
         self.prev = None
         self.used_id = -1
-        self.offset = None
+        self.xyz = (x, y, layer)
+        self.offset = TileAddress(x=x, y=y, layer=layer).pack()
         self.last_access = -1
         self.indirection_offset = None
 
+
 class SetIndTileEvent(object):
-    
+
     def __init__(self, indirection_offset, value):
         self.indirection_offset = indirection_offset
         self.value = value
 
-class EventNode(object):
+
+class UploadTileEvent(object):
+
+    def __init__(self, tile_xyz, data):
+        self.tile_xyz = tile_xyz
+        self.data = data
+
+
+class TileUpdateBatch(object):
+    """Tiles to upload and the indirection updates pointing at them,
+    indirection updates should be applied after the uploads."""
+
+    def __init__(self, access_id):
+        self.access_id = access_id
+        self.uploads = []
+        self.indirection_updates = []
+
+    def __bool__(self):
+        return bool(self.uploads or self.indirection_updates)
+
+
+class FakeTileUploader(object):
+    """Uploader which only records what it's given, for running the
+    streaming without a GL context."""
 
     def __init__(self):
-        self.next = None
-        self.func = None
+        self.tiles = {}
+        self.indirection = {}
+        self.upload_count = 0
+
+    def upload_tile(self, tile_xyz, data):
+        self.tiles[tile_xyz] = data
+        self.upload_count += 1
+
+    def set_indirection(self, indirection_offset, value):
+        if value == INVALID_TILE_ADDRESS:
+            self.indirection.pop(indirection_offset, None)
+        else:
+            self.indirection[indirection_offset] = value
 
 
 class TileAllocator(object):
+    """Streams requested tiles into a fixed pool of physical tiles.
 
-    def __init__(self, dimensions):
+    Requests (see pack_request and decode_feedback) are handed over with
+    update_requests, a worker thread then reads any missing tiles, evicting
+    the least recently used ones that weren't requested, and queues up
+    batches of updates which are applied on the render thread via
+    apply_updates.
+
+    Args:
+        indirection (UdimIndirectionBuilder): Udim layout.
+        dimensions (tuple(int, int, int)): Tiles in the pool along x, y
+            and layers.
+        batch_size (int): Tiles read per update batch.
+    """
+
+    def __init__(self, indirection, dimensions=DEFAULT_POOL_DIMENSIONS, batch_size=DEFAULT_BATCH_SIZE):
         head, tail = self._build_tile_list(dimensions)
         self._head = head
         self._tail = tail
+        self._indirection = indirection
+        self._batch_size = batch_size
         self._id_to_tile = {}
-        self._input_requests = set()
+        self._input_requests = None
         self._new_requests_flag = False
         self._access_id = 0
         self._kill = False
-        self._external_updates = []
+        self._thread = None
+        self._request_cond = threading.Condition()
+        self._update_cond = threading.Condition()
+        self._updates = []
+
+    @property
+    def resident_count(self):
+        return len(self._id_to_tile)
+
+    def start(self):
+        """Start streaming on a worker thread."""
+        if self._thread is not None:
+            return
+        self._kill = False
+        self._thread = threading.Thread(target=self._thread_runner, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the worker thread, pending updates are kept."""
+        if self._thread is None:
+            return
+        with self._request_cond:
+            self._kill = True
+            self._request_cond.notify()
+        self._thread.join()
+        self._thread = None
 
     def update_requests(self, new_requests):
-        self._access_id += 1
-        self._input_requests = new_requests
-        self._new_requests_flag = True
+        """Set which tiles are wanted, replacing any previous requests.
+
+        Args:
+            new_requests (FeedbackRequests or numpy.ndarray or iterable[int]):
+                Decoded requests, or raw 64bit tile requests / feedback.
+        """
+        if not isinstance(new_requests, FeedbackRequests):
+            if not isinstance(new_requests, numpy.ndarray):
+                new_requests = numpy.fromiter(new_requests, dtype=numpy.uint64)
+            new_requests = decode_feedback(
+                new_requests,
+                self._indirection.udim_info_start,
+                self._indirection.udim_info
+            )
+        with self._request_cond:
+            self._access_id += 1
+            self._input_requests = new_requests
+            self._new_requests_flag = True
+            self._request_cond.notify()
+
+    def process_pending(self):
+        """Process any pending requests on the calling thread, instead of
+        using start().
+
+        Returns:
+            bool: True if there was anything to process.
+        """
+        with self._request_cond:
+            if not self._new_requests_flag:
+                return False
+            requests, access_id = self._take_requests()
+        self._process_requests(requests, access_id)
+        return True
+
+    def pop_updates(self, block=False, timeout=None):
+        """Take all the queued update batches.
+
+        Args:
+            block (bool): Wait for atleast one batch.
+            timeout (float): Max time to wait for, when blocking.
+
+        Returns:
+            list(TileUpdateBatch): Batches, oldest first.
+        """
+        with self._update_cond:
+            if block and not self._updates:
+                self._update_cond.wait_for(lambda: self._updates, timeout)
+            updates = self._updates
+            self._updates = []
+        return updates
+
+    def apply_updates(self, uploader, block=False, timeout=None):
+        """Hand queued updates to an uploader (something with upload_tile and
+        set_indirection methods, see FakeTileUploader).
+
+        Args:
+            uploader (object): Uploader.
+            block (bool): Wait for atleast one batch.
+            timeout (float): Max time to wait for, when blocking.
+
+        Returns:
+            int: Number of tiles uploaded.
+        """
+        uploaded = 0
+        for batch in self.pop_updates(block, timeout):
+            for event in batch.uploads:
+                uploader.upload_tile(event.tile_xyz, event.data)
+            for event in batch.indirection_updates:
+                uploader.set_indirection(event.indirection_offset, event.value)
+            uploaded += len(batch.uploads)
+        return uploaded
+
+    def _take_requests(self):
+        # Must be called with the request lock held
+        self._new_requests_flag = False
+        return self._input_requests, self._access_id
 
     def _thread_runner(self):
-        local_requests = set()
-        local_acc_id = self._access_id
-        while not self._kill:
-            if self._new_requests_flag:
-                tmp_requests = self._input_requests
-                local_acc_id = self.local_acc_id
-                self._new_requests_flag = False
-
-                # First of all mark all used things so we don't accidentally
-                # overwrite them, only bothering with missing tiles
-                local_requests.clear()
-                for request in tmp_requests:
-                    if next_item in self._id_to_tile:
-                        tile_node = self._id_to_tile[next_item]
-                        tile_node.last_access = local_acc_id
-                        self._move_front(tile_node)
-                    else:
-                        local_requests.add(request)
+        while True:
+            with self._request_cond:
+                while not self._new_requests_flag and not self._kill:
+                    self._request_cond.wait()
+                if self._kill:
+                    return
+                requests, access_id = self._take_requests()
+            self._process_requests(requests, access_id)
+
+    def _process_requests(self, requests, access_id):
+        request_ids = requests.requests.tolist()
 
-            # In C++ we would use a conditional variable or something
-            if not local_requests:
-                sleep(0.03)
-                continue
+        # First of all mark all used things so we don't accidentally
+        # overwrite them, only bothering with missing tiles
+        missing = []
+        for index, request in enumerate(request_ids):
+            tile_node = self._id_to_tile.get(request)
+            if tile_node is not None:
+                tile_node.last_access = access_id
+                self._move_front(tile_node)
+            else:
+                missing.append(index)
+
+        udims = requests.udims.tolist()
+        mips = requests.mips.tolist()
+        tiles_x = requests.tile_x.tolist()
+        tiles_y = requests.tile_y.tolist()
+        indirection_offsets = requests.indirection_offsets.tolist()
+        udim_to_image = self._indirection.offset_udim_to_image
+
+        # Requests are already prioritised
+        batch = TileUpdateBatch(access_id)
+        # Pool tile and indirection update of each upload, so failed
+        # reads can be undone
+        nodes = []
+        for index in missing:
+            # Newer requests supersede these
+            if self._new_requests_flag or self._kill:
+                break
 
-            next_item = local_requests.pop()
             tail = self._tail
 
-            # We cannot allocate form the tail, don't process any further
-            if tail.last_access == local_acc_id:
-                local_requests.clear()
-                continue
-
-            udim = request & 0xffffffff
-            packed = udim >> 32
-            mip = packed >> 20
-            tile_y = (packed >> 10) & 0x3ff
-            tile_x = packed & 0x3ff
-
-            # Invalid udim, don't care
-            if udim == 0xffffffff:
-                continue
-
-            udim_x = (udim >> 16) & 0xffff
-            udim_y = udim & 0xffff
-            udim_info_offset = self._udim_info_offsets[udim_x, udim_y]
-            ind_offset = UdimMipAddress.unpack(self._udim_info[udim_info_offset+3+mip])
-            ind_offset = (ind_offset.startX + tile_x, ind_offset.startY + tile_y, ind_offset.layer)
-
-            tile_data = self.offset_udim_to_image[udim].read_tile(mip, tile_x, tile_y)
-
-            #######################################
-            #
-            #   THIS IS WHERE YOU WERE ADDING LOGIC TO FIGURE OUT THE UDIM
-            #   ITS INDIRECTION ADDRESS AND WHICH IMAGE TO READ FROM AND WHERE
-            #
-            #####################################
-
-            # Update the global list
-            self._tail = tail.prev
-            self._tail.next = None
-            self._move_front(tail)
+            # We cannot allocate from the tail, everything is in use
+            if tail.last_access == access_id:
+                break
 
-            events = []
+            request = request_ids[index]
+            ind_offset = tuple(indirection_offsets[index])
+            # Tiles of a batch are read in parallel, see _publish
+            tile_data = udim_to_image[udims[index]].image.read_tile_async(
+                mips[index],
+                tiles_x[index],
+                tiles_y[index]
+            )
 
-            # Add an event to clear the tile
+            # Add an event to clear the evicted tile
             if tail.used_id in self._id_to_tile:
                 del self._id_to_tile[tail.used_id]
-                events.append(SetIndTileEvent(tail.indirection_offset, 0xffff))
+                batch.indirection_updates.append(
+                    SetIndTileEvent(tail.indirection_offset, INVALID_TILE_ADDRESS)
+                )
+
+            tail.used_id = request
+            tail.last_access = access_id
+            tail.indirection_offset = ind_offset
+            self._id_to_tile[request] = tail
+            self._move_front(tail)
+
+            batch.uploads.append(UploadTileEvent(tail.xyz, tile_data))
+            ind_event = SetIndTileEvent(ind_offset, tail.offset)
+            batch.indirection_updates.append(ind_event)
+            nodes.append((tail, ind_event))
+
+            if len(batch.uploads) >= self._batch_size:
+                self._publish(batch, nodes)
+                batch = TileUpdateBatch(access_id)
+                nodes = []
+
+        if batch:
+            self._publish(batch, nodes)
 
-            events.append(SetIndTileEvent(ind_offset, tail.offset))
+    def _publish(self, batch, nodes):
+        failed = []
+        for event, (node, ind_event) in zip(batch.uploads, nodes):
+            try:
+                event.data = event.data.result()
+            except Exception:
+                # A bad tile shouldn't take down the thread, skip it and
+                # it'll be requested again next frame
+                traceback.print_exc()
+                failed.append((event, node, ind_event))
 
+        for event, node, ind_event in failed:
+            batch.uploads.remove(event)
+            batch.indirection_updates.remove(ind_event)
+            self._release(node)
 
+        with self._update_cond:
+            self._updates.append(batch)
+            self._update_cond.notify_all()
 
+    def _release(self, node):
+        """Put a tile back to its unused state at the back of the list."""
+        if self._id_to_tile.get(node.used_id) is node:
+            del self._id_to_tile[node.used_id]
+        node.used_id = -1
+        node.last_access = -1
+        node.indirection_offset = None
+        if node is self._tail:
+            return
+
+        # Unlink
+        if node.prev is None:
+            self._head = node.next
+        else:
+            node.prev.next = node.next
+        node.next.prev = node.prev
+
+        # Relink at the back
+        node.prev = self._tail
+        node.next = None
+        self._tail.next = node
+        self._tail = node
 
     def _move_front(self, node):
-        last_head = self._head
+        if node is self._head:
+            return
+
+        # Unlink
+        node.prev.next = node.next
         if node.next is None:
             self._tail = node.prev
-        self._head = node
+        else:
+            node.next.prev = node.prev
+
+        # Relink at the front
         node.prev = None
-        node.next = last_head
+        node.next = self._head
+        self._head.prev = node
+        self._head = node
 
     @staticmethod
     def _build_tile_list(dimensions):
-        dummy_first = Tile()
-        first = dummy_first
-        last = first
-        for z in dimensions[2]:
-            for y in dimensions[1]:
-                for x in dimensions[0]:
-                    new_tile = Tile();
-                    new_tile.offset = TileAddress(x=x, y=x, layer=z).pack()
-                    new_tile.prev = last
-                    last.next = new_tile
-        first = dummy_first.next
-        return (first, last)
\ No newline at end of file
+        first = None
+        last = None
+        for z in range(dimensions[2]):
+            for y in range(dimensions[1]):
+                for x in range(dimensions[0]):
+                    new_tile = Tile(x, y, z)
+                    if last is None:
+                        first = new_tile
+                    else:
+                        new_tile.prev = last
+                        last.next = new_tile
+                    last = new_tile
+        return (first, last)
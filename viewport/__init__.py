@@ -13,8 +13,18 @@ from . geometry import (
     StaticGeometry,
     StaticCombinedGeometry,
     ObjGeomAttr,
+    combine_indexed_meshes,
     load_obj
 )
+from . mesh_optimize import (
+    optimize_mesh,
+    simulate_vertex_cache
+)
+from . mesh_cache import (
+    MeshCacheData,
+    read_mesh_cache,
+    write_mesh_cache
+)
 from . program import (
     generate_shader_program,
     generate_shader_program_from_files
@@ -24,7 +34,28 @@ from . shader_loader import (
     load_shader_source,
     optimize_shader_roundtrip,
     make_permutation_program,
-    clear_compiled_shaders
+    clear_compiled_shaders,
+    precompile_all,
+    link_precompiled
+)
+
+from . glsl_preprocessor import (
+    preprocess_shader_source,
+    clear_preprocessor_cache
+)
+
+from . shader_cache import (
+    ShaderCache,
+    get_shader_cache,
+    set_shader_cache,
+    get_shader_cache_stats
+)
+
+from . shader_watcher import (
+    ShaderWatcher,
+    start_shader_watcher,
+    stop_shader_watcher,
+    apply_shader_reloads
 )
 
 from . window import Window
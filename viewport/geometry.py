@@ -1,10 +1,21 @@
 import ctypes
+import os
 from enum import Enum
 
 import numpy
 
 from OpenGL.GL import *
 
+from .obj_reader import read_obj
+from .mesh_optimize import optimize_mesh
+from .mesh_cache import (
+    hash_source_file,
+    get_mesh_cache_dir,
+    get_mesh_cache_path,
+    read_mesh_cache,
+    write_mesh_cache
+)
+
 try:
     import pywavefront
     _has_pywavefront = True
@@ -13,7 +24,65 @@ except ImportError:
 
 
 
-__all__ = ("StaticGeometry", "StaticCombinedGeometry", "ObjGeomAttr", "load_obj")
+__all__ = (
+    "combine_indexed_meshes",
+    "StaticGeometry",
+    "StaticCombinedGeometry",
+    "ObjGeomAttr",
+    "load_obj",
+    "read_obj",
+    "read_obj_pywavefront"
+)
+
+
+def _upload_buffer(buffer_id, data):
+    """Upload an array into immutable buffer storage, without going via
+    an intermediate bytes copy (memmaps are read straight from the page cache).
+    """
+    data = numpy.ascontiguousarray(data)
+    glNamedBufferStorage(buffer_id, data.nbytes, data, 0)
+
+
+def combine_indexed_meshes(vertex_attrib_sizes, indices_vertices_pairs):
+    """Merge meshes into a single index and vertex buffer, with indirect
+    draw commands to draw each individually.
+
+    Args:
+        vertex_attrib_sizes (tuple): Sizes of float vertices.
+        indices_vertices_pairs (tuple): Pairs of indices and vertices.
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray): Combined indices,
+            combined vertices and (N, 5) uint32 draw commands
+            (count, instance count, first index, base vertex, base instance).
+    """
+    vertex_float_count = sum(vertex_attrib_sizes)
+    combined_indices = numpy.concatenate([
+        indices_vertices[0].ravel()
+        for indices_vertices in indices_vertices_pairs
+    ])
+    combined_vertices = numpy.concatenate([
+        indices_vertices[1].ravel()
+        for indices_vertices in indices_vertices_pairs
+    ])
+
+    index_counts = numpy.array([
+        len(indices_vertices[0].flat)
+        for indices_vertices in indices_vertices_pairs
+    ], dtype=numpy.uint32)
+
+    vertex_counts = numpy.array([
+        len(indices_vertices[1].flat) // vertex_float_count
+        for indices_vertices in indices_vertices_pairs
+    ], dtype=numpy.uint32)
+
+    draw_commands = numpy.zeros((len(index_counts), 5), dtype=numpy.uint32)
+    draw_commands[:, 0] = index_counts
+    draw_commands[:, 1] = 1
+    draw_commands[:, 2] = numpy.cumsum(index_counts) - index_counts
+    draw_commands[:, 3] = numpy.cumsum(vertex_counts) - vertex_counts
+
+    return combined_indices, combined_vertices, draw_commands
 
 
 class StaticGeometry(object):
@@ -46,10 +115,8 @@ class StaticGeometry(object):
         self._vbo = self._vbo_ibo_ptr[0]
         self._ibo = self._vbo_ibo_ptr[1]
         self._vao = self._vao_ptr.value
-        vertices_bytes = vertices.tobytes()
-        indices_bytes = indices.tobytes()
-        glNamedBufferStorage(self._vbo, len(vertices_bytes), vertices_bytes, 0)
-        glNamedBufferStorage(self._ibo, len(indices_bytes), indices_bytes, 0)
+        _upload_buffer(self._vbo, vertices)
+        _upload_buffer(self._ibo, indices)
 
         # Setup the VAO
         glVertexArrayVertexBuffer(self._vao, 0, self._vbo, 0, 4*vertex_float_count)
@@ -93,38 +160,36 @@ class StaticCombinedGeometry(object):
         indices_vertices_pairs (tuple): Pairs of indices and vertices
             to merge together.
         """
-        vertex_float_count = sum(vertex_attrib_sizes)
-        self.vertex_attrib_sizes = vertex_attrib_sizes
-
         self._cleanup = False
-        combined_indices = numpy.concatenate([
-            indices_vertices[0]
-            for indices_vertices in indices_vertices_pairs
-        ])
-        combined_vertices = numpy.concatenate([
-            indices_vertices[1]
-            for indices_vertices in indices_vertices_pairs
-        ])
-
-        # Data for indirect calls
-        counts = numpy.array([
-            len(indices_vertices[1].flat)
-            for indices_vertices in indices_vertices_pairs
-        ], dtype=numpy.uint32)
-
-        first_indexs = numpy.cumsum(
-            (
-                [0] + [len(indices_vertices[0].flat) for indices_vertices in indices_vertices_pairs]
-            )[:-1],
-            dtype=numpy.uint32
+        self._init_buffers(
+            vertex_attrib_sizes,
+            *combine_indexed_meshes(vertex_attrib_sizes, indices_vertices_pairs)
         )
 
-        base_vertexs = numpy.cumsum(
-            (
-                [0] + [len(indices_vertices[1].flat)//vertex_float_count for indices_vertices in indices_vertices_pairs]
-            )[:-1],
-            dtype=numpy.uint32
-        )
+    @classmethod
+    def from_combined(cls, vertex_attrib_sizes, indices, vertices, draw_commands):
+        """Create from already combined buffers (see combine_indexed_meshes).
+
+        Args:
+            vertex_attrib_sizes (tuple): Sizes of float vertices.
+            indices (numpy.ndarray): Combined uint32 indices.
+            vertices (numpy.ndarray): Combined float32 vertices.
+            draw_commands (numpy.ndarray): (N, 5) uint32 draw commands.
+
+        Returns:
+            StaticCombinedGeometry: Geometry.
+        """
+        geom = cls.__new__(cls)
+        geom._cleanup = False
+        geom._init_buffers(vertex_attrib_sizes, indices, vertices, draw_commands)
+        return geom
+
+    def _init_buffers(self, vertex_attrib_sizes, combined_indices, combined_vertices, draw_commands):
+        vertex_float_count = sum(vertex_attrib_sizes)
+        self.vertex_attrib_sizes = vertex_attrib_sizes
+
+        draw_commands = numpy.asarray(draw_commands, dtype=numpy.uint32).reshape((-1, 5))
+        counts = numpy.ascontiguousarray(draw_commands[:, 0])
 
         assert(combined_indices.ravel().itemsize == 4)
         assert(combined_vertices.ravel().itemsize == 4)
@@ -145,18 +210,10 @@ class StaticCombinedGeometry(object):
         self.counts_object = self._buffers[3]
         self._vao = self._vao_ptr.value
 
-        vertices_bytes = combined_vertices.tobytes()
-        indices_bytes = combined_indices.tobytes()
-        draw_command_bytes = numpy.array([
-            [count, 1, first_index, base_vertex, 0]
-            for count, first_index, base_vertex in zip(counts, first_indexs, base_vertexs)
-        ], dtype=numpy.uint32).tobytes()
-        count_bytes = counts.tobytes()
-
-        glNamedBufferStorage(self._vbo, len(vertices_bytes), vertices_bytes, 0)
-        glNamedBufferStorage(self._ibo, len(indices_bytes), indices_bytes, 0)
-        glNamedBufferStorage(self.draw_commands_object, len(draw_command_bytes), draw_command_bytes, 0)
-        glNamedBufferStorage(self.counts_object, len(count_bytes), count_bytes, 0)
+        _upload_buffer(self._vbo, combined_vertices)
+        _upload_buffer(self._ibo, combined_indices)
+        _upload_buffer(self.draw_commands_object, draw_commands)
+        _upload_buffer(self.counts_object, counts)
 
         # Setup the VAO
         glVertexArrayVertexBuffer(self._vao, 0, self._vbo, 0, 4*vertex_float_count)
@@ -212,18 +269,19 @@ _OBJATTR_TO_SIZE = {
 }
 
 
-def load_obj(obj_filepath, attrs):
-    """Load an OBJ into a drawable mesh.
+def read_obj_pywavefront(obj_filepath, attrs):
+    """Read an OBJ via pywavefront, this is the slower path read_obj replaced
+    and is kept around for comparisons.
 
     Args:
         obj_filepath (str): Obj file to stream in.
         attrs (iterable[ObjGeomAttr]): Attributes to read.
 
     Returns:
-        StaticGeometry or StaticCombinedGeometry: Drawable mesh.
+        list[tuple(numpy.ndarray, numpy.ndarray)]: uint32 indices and
+            flattened float32 vertices per mesh.
     """
     assert _has_pywavefront
-    obj_filepath = obj_filepath
     attrs = tuple(attrs)
 
     scene = pywavefront.Wavefront(obj_filepath)
@@ -286,22 +344,135 @@ def load_obj(obj_filepath, attrs):
 
         mesh_data.append((indices, vertices))
 
+    return mesh_data
+
+
+def _read_obj_meshes(obj_filepath, attr_names, optimize):
+    """Read an OBJ into combined buffers, optionally optimizing each mesh."""
+    attrib_sizes = [_OBJATTR_TO_SIZE[ObjGeomAttr[name]] for name in attr_names]
+    mesh_data = read_obj(obj_filepath, attr_names)
+
+    if optimize:
+        position_offset = None
+        if "P" in attr_names:
+            position_offset = sum(attrib_sizes[:attr_names.index("P")])
+        optimized = []
+        for mesh_index, (indices, vertices) in enumerate(mesh_data):
+            indices, vertices, stats = optimize_mesh(
+                indices,
+                vertices,
+                sum(attrib_sizes),
+                position_offset=position_offset
+            )
+            print(
+                "{0}[{1}]: {2} triangles, ACMR {3:.3f} -> {4:.3f}, "
+                "ATVR {5:.3f} -> {6:.3f}".format(
+                    os.path.basename(obj_filepath),
+                    mesh_index,
+                    stats["triangles"],
+                    stats["acmr_before"],
+                    stats["acmr_after"],
+                    stats["atvr_before"],
+                    stats["atvr_after"]
+                )
+            )
+            optimized.append((indices, vertices))
+        mesh_data = optimized
+
+    return combine_indexed_meshes(attrib_sizes, mesh_data)
+
+
+def _read_obj_cached(obj_filepath, attr_names, optimize):
+    """Read an OBJ, going via the binary mesh cache where possible.
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray): Combined indices,
+            vertices and draw commands.
+    """
+    attrib_sizes = [_OBJATTR_TO_SIZE[ObjGeomAttr[name]] for name in attr_names]
+    cache_path = None
+    if get_mesh_cache_dir():
+        source_hash = hash_source_file(obj_filepath)
+        cache_path = get_mesh_cache_path(
+            source_hash,
+            attr_names + (["optimized"] if optimize else [])
+        )
+        cached = read_mesh_cache(cache_path, source_hash)
+        if cached is not None and list(cached.attrib_sizes) == attrib_sizes:
+            return cached.indices, cached.vertices, cached.draw_commands
+
+    indices, vertices, draw_commands = _read_obj_meshes(
+        obj_filepath,
+        attr_names,
+        optimize
+    )
+
+    if cache_path:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            write_mesh_cache(
+                cache_path,
+                source_hash,
+                attrib_sizes,
+                indices,
+                vertices,
+                draw_commands
+            )
+        except (IOError, OSError):
+            # Not being able to cache shouldn't stop us loading
+            pass
+
+    return indices, vertices, draw_commands
+
+
+def load_obj(obj_filepath, attrs, use_cache=True, optimize=False):
+    """Load an OBJ into a drawable mesh.
+
+    Args:
+        obj_filepath (str): Obj file to stream in.
+        attrs (iterable[ObjGeomAttr]): Attributes to read.
+        use_cache (bool): Read and write the binary mesh cache.
+        optimize (bool): Reorder triangles and vertices for the post
+            transform cache, overdraw and vertex fetch (printing the
+            ACMR / ATVR before and after).
+
+    Returns:
+        StaticGeometry or StaticCombinedGeometry: Drawable mesh.
+    """
+    attrs = tuple(attrs)
+    attr_names = [attr.name for attr in attrs]
+
     vertex_attrib_sizes = [
         _OBJATTR_TO_SIZE[attr]
         for attr in attrs
     ]
 
-    assert len(mesh_data) > 0
+    if use_cache:
+        indices, vertices, draw_commands = _read_obj_cached(
+            obj_filepath,
+            attr_names,
+            optimize
+        )
+    else:
+        indices, vertices, draw_commands = _read_obj_meshes(
+            obj_filepath,
+            attr_names,
+            optimize
+        )
+
+    assert len(draw_commands) > 0
 
-    if len(mesh_data) == 1:
+    if len(draw_commands) == 1:
         return StaticGeometry(
             vertex_attrib_sizes,
-            mesh_data[0][0],
-            mesh_data[0][1]
+            indices,
+            vertices
         )
 
     else:
-        return StaticCombinedGeometry(
+        return StaticCombinedGeometry.from_combined(
             vertex_attrib_sizes,
-            mesh_data
+            indices,
+            vertices,
+            draw_commands
         )
@@ -0,0 +1,264 @@
+import os
+import re
+import threading
+
+
+# Fallback include directory, tried after the including files directory
+DEFAULT_INCLUDE_DIRS = (
+    os.path.abspath(os.path.join(__file__, "..", "..", "shaders")),
+)
+
+_MAX_INCLUDE_DEPTH = 64
+
+_INCLUDE_RE = re.compile(r'^\s*#\s*include\s+[<"]([^">]+)[">]')
+_VERSION_RE = re.compile(r'^\s*#\s*version\b')
+_PRAGMA_ONCE_RE = re.compile(r'^\s*#\s*pragma\s+once\b')
+_INCLUDE_EXTENSION_RE = re.compile(
+    r'^\s*#\s*extension\s+GL_GOOGLE_include_directive\b'
+)
+_IFNDEF_RE = re.compile(r'^\s*#\s*ifndef\s+(\w+)')
+_DEFINE_RE = re.compile(r'^\s*#\s*define\s+(\w+)')
+_IF_RE = re.compile(r'^\s*#\s*if(?:n?def)?\b')
+_ENDIF_RE = re.compile(r'^\s*#\s*endif\b')
+_DIRECTIVE_RE = re.compile(r'^\s*#')
+_COMMENT_RE = re.compile(r'//.*?$|/\*.*?\*/', flags=re.DOTALL | re.MULTILINE)
+
+_PARSED_FILES = {}
+_PARSED_FILES_LOCK = threading.Lock()
+
+
+class _ParsedShaderFile(object):
+
+    def __init__(self, filepath, stamp, lines):
+        self.filepath = filepath
+        self.stamp = stamp
+        self.lines = lines
+
+        # (line index, include name) for each #include
+        self.includes = []
+        self.pragma_once = False
+        for idx, line in enumerate(lines):
+            match = _INCLUDE_RE.match(line)
+            if match:
+                self.includes.append((idx, match.group(1)))
+            elif _PRAGMA_ONCE_RE.match(line):
+                self.pragma_once = True
+
+        self.guard = _find_include_guard(lines)
+
+
+def _find_include_guard(lines):
+    """Find the classic #ifndef X / #define X ... #endif include guard.
+
+    Args:
+        lines (list[str]): Source lines.
+
+    Returns:
+        str or None: Guard macro name.
+    """
+    # Only care about directives, with comments stripped out
+    directives = [
+        line.strip()
+        for line in _COMMENT_RE.sub("", "\n".join(lines)).splitlines()
+        if line.strip()
+    ]
+    if len(directives) < 3:
+        return None
+    ifndef = _IFNDEF_RE.match(directives[0])
+    define = _DEFINE_RE.match(directives[1])
+    if not ifndef or not define or ifndef.group(1) != define.group(1):
+        return None
+    if not _ENDIF_RE.match(directives[-1]):
+        return None
+
+    # Make sure the opening #ifndef is closed by the final #endif
+    depth = 0
+    for idx, line in enumerate(directives):
+        if not _DIRECTIVE_RE.match(line):
+            continue
+        if _IF_RE.match(line):
+            depth += 1
+        elif _ENDIF_RE.match(line):
+            depth -= 1
+            if depth == 0 and idx != len(directives) - 1:
+                return None
+    return ifndef.group(1)
+
+
+def _get_parsed_file(filepath):
+    """Get a parsed shader file, reparsing it if it has changed on disk.
+
+    Args:
+        filepath (str): Absolute file path.
+
+    Returns:
+        _ParsedShaderFile: Parsed file.
+    """
+    st = os.stat(filepath)
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _PARSED_FILES_LOCK:
+        parsed = _PARSED_FILES.get(filepath)
+    if parsed is not None and parsed.stamp == stamp:
+        return parsed
+    with open(filepath, "r") as in_fp:
+        lines = in_fp.read().splitlines()
+    parsed = _ParsedShaderFile(filepath, stamp, lines)
+    with _PARSED_FILES_LOCK:
+        _PARSED_FILES[filepath] = parsed
+    return parsed
+
+
+def clear_preprocessor_cache():
+    """Forget every parsed shader file."""
+    with _PARSED_FILES_LOCK:
+        _PARSED_FILES.clear()
+
+
+def resolve_include(include, including_filepath, include_dirs=DEFAULT_INCLUDE_DIRS):
+    """Resolve an #include relative to the including file, falling back
+    to the include directories.
+
+    Args:
+        include (str): Name given to #include.
+        including_filepath (str): File containing the #include.
+        include_dirs (tuple[str]): Extra directories to search.
+
+    Returns:
+        str: Absolute file path.
+    """
+    search_dirs = (os.path.dirname(including_filepath),) + tuple(include_dirs)
+    for search_dir in search_dirs:
+        candidate = os.path.normpath(os.path.join(search_dir, include))
+        if os.path.isfile(candidate):
+            return candidate
+    raise RuntimeError(
+        "{0}: Cannot find or open include file '{1}'".format(
+            including_filepath,
+            include
+        )
+    )
+
+
+def get_include_dependencies(filepath, include_dirs=DEFAULT_INCLUDE_DIRS):
+    """Get a shader file and every file it transitively #includes.
+
+    Args:
+        filepath (str): Shader file path.
+        include_dirs (tuple[str]): Extra directories to search.
+
+    Returns:
+        list[str]: Absolute file paths, starting with `filepath`.
+    """
+    filepath = os.path.abspath(filepath)
+    found = [filepath]
+    seen = {filepath}
+    idx = 0
+    while idx < len(found):
+        current = found[idx]
+        idx += 1
+        try:
+            parsed = _get_parsed_file(current)
+        except (IOError, OSError):
+            # Let the compiler complain about missing files
+            continue
+        for _, include in parsed.includes:
+            try:
+                include_path = resolve_include(include, current, include_dirs)
+            except RuntimeError:
+                continue
+            if include_path not in seen:
+                seen.add(include_path)
+                found.append(include_path)
+    return found
+
+
+def _expand(filepath, out_lines, state, include_dirs, depth, conditional):
+    if depth > _MAX_INCLUDE_DEPTH:
+        raise RuntimeError(
+            "{0}: #include nested too deeply, is there a cycle?".format(filepath)
+        )
+
+    parsed = _get_parsed_file(filepath)
+    if parsed.pragma_once and filepath in state["once"]:
+        return
+    if parsed.guard and parsed.guard in state["guards"]:
+        return
+
+    # Anything included from inside a conditional may not have actually
+    # been seen by the driver, so it has to be included again next time.
+    if not conditional:
+        state["once"].add(filepath)
+        if parsed.guard:
+            state["guards"].add(parsed.guard)
+
+    includes = dict(parsed.includes)
+    root = depth == 0
+    cond_depth = 0
+    # The include guards own #ifndef doesn't make the body conditional
+    guard_depth = 1 if parsed.guard else 0
+    for idx, line in enumerate(parsed.lines):
+        if idx in includes:
+            include_path = resolve_include(includes[idx], filepath, include_dirs)
+            out_lines.append("#line 1")
+            _expand(
+                include_path,
+                out_lines,
+                state,
+                include_dirs,
+                depth + 1,
+                conditional or cond_depth > guard_depth
+            )
+            out_lines.append("#line {0}".format(idx + 2))
+            continue
+
+        if _IF_RE.match(line):
+            cond_depth += 1
+        elif _ENDIF_RE.match(line):
+            cond_depth -= 1
+
+        if _INCLUDE_EXTENSION_RE.match(line) or _PRAGMA_ONCE_RE.match(line):
+            out_lines.append("")
+            continue
+
+        out_lines.append(line)
+
+        if root and not state["defines_written"] and _VERSION_RE.match(line):
+            out_lines.extend(state["defines"])
+            out_lines.append("#line {0}".format(idx + 2))
+            state["defines_written"] = True
+
+
+def preprocess_shader_source(filepath, macros=None, include_dirs=DEFAULT_INCLUDE_DIRS):
+    """Resolve #includes and inject macros without spawning glslc.
+
+    Conditionals and macros are left for the GL driver to evaluate, the
+    output only has includes inlined (with #line directives to keep error
+    messages pointing at the right line) and `macros` #defined directly
+    after the #version directive.
+
+    Args:
+        filepath (str): Shader file path.
+        macros (dict): Macros to define.
+        include_dirs (tuple[str]): Extra directories to search.
+
+    Returns:
+        str: Preprocessed source.
+    """
+    defines = [
+        "#define {0} {1}".format(key, value)
+        for key, value in (macros or {}).items()
+    ]
+    state = {
+        "defines": defines,
+        "defines_written": False,
+        "guards": set(),
+        "once": set(),
+    }
+    out_lines = []
+    _expand(os.path.abspath(filepath), out_lines, state, include_dirs, 0, False)
+
+    # No #version, so the defines go up front
+    if not state["defines_written"] and defines:
+        out_lines = defines + ["#line 1"] + out_lines
+
+    return "\n".join(out_lines) + "\n"
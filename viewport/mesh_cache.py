@@ -0,0 +1,229 @@
+import hashlib
+import os
+import struct
+
+import numpy
+
+
+# Bump if the layout or the way meshes are generated changes
+MESH_CACHE_VERSION = 1
+
+_MAGIC = b"GLMESH\0\0"
+
+# magic, version, attribute count, mesh count, total indices, total vertex floats
+_HEADER = struct.Struct("<8sIIIQQ")
+_SOURCE_HASH_SIZE = 32
+
+# Data blocks are aligned so the memmapped arrays are nicely aligned too
+_ALIGNMENT = 16
+
+_DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "glref", "meshes"
+)
+
+
+class MeshCacheData(object):
+    """Indexed mesh data as stored in a mesh cache file.
+
+    All arrays are read-only memmaps into the cache file.
+    """
+
+    def __init__(self, source_hash, attrib_sizes, indices, vertices, draw_commands):
+        self.source_hash = source_hash
+        self.attrib_sizes = attrib_sizes
+        self.indices = indices
+        self.vertices = vertices
+        self.draw_commands = draw_commands
+
+    @property
+    def mesh_count(self):
+        return len(self.draw_commands)
+
+    def mesh(self, index):
+        """Get the indices and vertices of a single mesh.
+
+        Args:
+            index (int): Mesh index.
+
+        Returns:
+            tuple(numpy.ndarray, numpy.ndarray): Indices and vertices.
+        """
+        vertex_float_count = sum(self.attrib_sizes)
+        count, _, first_index, base_vertex, _ = (
+            int(x) for x in self.draw_commands[index]
+        )
+        if index + 1 < self.mesh_count:
+            end_vertex = int(self.draw_commands[index + 1][3])
+        else:
+            end_vertex = len(self.vertices) // vertex_float_count
+        return (
+            self.indices[first_index:first_index + count],
+            self.vertices[base_vertex * vertex_float_count:end_vertex * vertex_float_count]
+        )
+
+
+def _align(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def hash_source_file(filepath):
+    """Hash a file's contents.
+
+    Args:
+        filepath (str): File path.
+
+    Returns:
+        bytes: sha256 digest.
+    """
+    hasher = hashlib.sha256()
+    with open(filepath, "rb") as in_fp:
+        for chunk in iter(lambda: in_fp.read(1 << 20), b""):
+            hasher.update(chunk)
+    return hasher.digest()
+
+
+def write_mesh_cache(filepath, source_hash, attrib_sizes, indices, vertices, draw_commands):
+    """Write a mesh cache file.
+
+    Layout (little endian):
+        char[8]  magic
+        uint32   version
+        uint32   attribute count
+        uint32   mesh count
+        uint64   index count
+        uint64   vertex float count
+        uint8    source hash[32]
+        uint32   attribute sizes[attribute count]
+        uint32   draw commands[mesh count][5]     (16 byte aligned)
+        uint32   indices[index count]             (16 byte aligned)
+        float32  vertices[vertex float count]     (16 byte aligned)
+
+    Args:
+        filepath (str): Output path.
+        source_hash (bytes): Hash of whatever the mesh was generated from.
+        attrib_sizes (tuple[int]): Vertex attribute sizes.
+        indices (numpy.ndarray): Combined uint32 indices.
+        vertices (numpy.ndarray): Combined float32 vertices.
+        draw_commands (numpy.ndarray): (N, 5) uint32 draw commands.
+    """
+    assert len(source_hash) == _SOURCE_HASH_SIZE
+    indices = numpy.ascontiguousarray(indices, dtype=numpy.uint32).ravel()
+    vertices = numpy.ascontiguousarray(vertices, dtype=numpy.float32).ravel()
+    draw_commands = numpy.ascontiguousarray(draw_commands, dtype=numpy.uint32).reshape((-1, 5))
+
+    header = _HEADER.pack(
+        _MAGIC,
+        MESH_CACHE_VERSION,
+        len(attrib_sizes),
+        len(draw_commands),
+        len(indices),
+        len(vertices)
+    )
+    header += source_hash
+    header += numpy.array(attrib_sizes, dtype=numpy.uint32).tobytes()
+
+    # Write to a temp file and move, so a crash never leaves a partial file
+    tmp_path = "{0}.{1}.tmp".format(filepath, os.getpid())
+    with open(tmp_path, "wb") as out_fp:
+        out_fp.write(header)
+        for block in (draw_commands, indices, vertices):
+            offset = out_fp.tell()
+            out_fp.write(b"\0" * (_align(offset) - offset))
+            out_fp.write(block.tobytes())
+    os.replace(tmp_path, filepath)
+
+
+def read_mesh_cache(filepath, source_hash=None):
+    """Read a mesh cache file via memmaps.
+
+    Args:
+        filepath (str): Cache file path.
+        source_hash (bytes): If given, the file is rejected if it was
+            generated from something else.
+
+    Returns:
+        MeshCacheData or None: Mesh data, None if missing, stale or invalid.
+    """
+    try:
+        with open(filepath, "rb") as in_fp:
+            header = in_fp.read(_HEADER.size + _SOURCE_HASH_SIZE)
+            if len(header) != _HEADER.size + _SOURCE_HASH_SIZE:
+                return None
+            magic, version, attrib_count, mesh_count, index_count, vertex_float_count = (
+                _HEADER.unpack_from(header)
+            )
+            if magic != _MAGIC or version != MESH_CACHE_VERSION:
+                return None
+            file_source_hash = header[_HEADER.size:]
+            if source_hash is not None and file_source_hash != source_hash:
+                return None
+            attrib_sizes = tuple(
+                int(x) for x in
+                numpy.frombuffer(in_fp.read(4 * attrib_count), dtype=numpy.uint32)
+            )
+        file_size = os.path.getsize(filepath)
+    except (IOError, OSError, ValueError):
+        return None
+
+    offset = _HEADER.size + _SOURCE_HASH_SIZE + 4 * attrib_count
+    arrays = []
+    for dtype, count in (
+            (numpy.uint32, mesh_count * 5),
+            (numpy.uint32, index_count),
+            (numpy.float32, vertex_float_count)):
+        offset = _align(offset)
+        size = count * 4
+        if offset + size > file_size:
+            return None
+        if count:
+            arrays.append(numpy.memmap(
+                filepath,
+                dtype=dtype,
+                mode="r",
+                offset=offset,
+                shape=(count,)
+            ))
+        else:
+            arrays.append(numpy.zeros(0, dtype=dtype))
+        offset += size
+
+    draw_commands, indices, vertices = arrays
+    return MeshCacheData(
+        file_source_hash,
+        attrib_sizes,
+        indices,
+        vertices,
+        draw_commands.reshape((-1, 5))
+    )
+
+
+def get_mesh_cache_dir():
+    """Get the directory mesh caches are stored in, this can be controlled
+    via the GLREF_MESH_CACHE_DIR environment variable, an empty string
+    disables caching.
+
+    Returns:
+        str or None: Cache directory.
+    """
+    cache_dir = os.environ.get("GLREF_MESH_CACHE_DIR", _DEFAULT_CACHE_DIR)
+    return cache_dir or None
+
+
+def get_mesh_cache_path(source_hash, attr_names):
+    """Get where the cache of a mesh with the given source and
+    attributes lives.
+
+    Args:
+        source_hash (bytes): Hash of the source file.
+        attr_names (iterable[str]): Attributes read.
+
+    Returns:
+        str or None: Cache file path, None if caching is disabled.
+    """
+    cache_dir = get_mesh_cache_dir()
+    if not cache_dir:
+        return None
+    key = hashlib.sha256(
+        source_hash + ",".join(attr_names).encode("utf-8")
+    ).hexdigest()
+    return os.path.join(cache_dir, "{0}.glmesh".format(key))
@@ -0,0 +1,278 @@
+"""Post-transform vertex cache, overdraw and vertex fetch optimization.
+
+Triangle ordering uses Tipsify:
+    Sander, Nehab and Barczak, "Fast Triangle Reordering for Vertex
+    Locality and Reduced Overdraw", SIGGRAPH 2007.
+"""
+import numpy
+
+
+DEFAULT_CACHE_SIZE = 16
+
+
+def _vertex_triangle_adjacency(triangles, vertex_count):
+    """Build a CSR vertex => triangle adjacency.
+
+    Args:
+        triangles (numpy.ndarray): (N, 3) vertex indices.
+        vertex_count (int): Number of vertices.
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray): Offsets (vertex_count + 1) and
+            triangle indices.
+    """
+    flat = triangles.ravel()
+    order = numpy.argsort(flat, kind="stable")
+    adjacency = (order // 3).astype(numpy.int64)
+    counts = numpy.bincount(flat, minlength=vertex_count)
+    offsets = numpy.zeros(vertex_count + 1, dtype=numpy.int64)
+    numpy.cumsum(counts, out=offsets[1:])
+    return offsets, adjacency
+
+
+def simulate_vertex_cache(indices, cache_size=DEFAULT_CACHE_SIZE):
+    """Simulate a FIFO post-transform cache.
+
+    Args:
+        indices (numpy.ndarray): Triangle list indices.
+        cache_size (int): Cache entries.
+
+    Returns:
+        dict: acmr (average cache miss ratio, misses per triangle) and
+            atvr (average transform to vertex ratio, misses per vertex used).
+    """
+    indices = numpy.asarray(indices).ravel()
+    triangle_count = len(indices) // 3
+    if triangle_count == 0:
+        return {"acmr": 0.0, "atvr": 0.0}
+
+    timestamps = {}
+    misses = 0
+    for index in indices.tolist():
+        stamp = timestamps.get(index)
+        # In a FIFO, an entry is evicted once cache_size misses happen after it
+        if stamp is None or misses - stamp >= cache_size:
+            timestamps[index] = misses
+            misses += 1
+
+    return {
+        "acmr": misses / triangle_count,
+        "atvr": misses / len(timestamps),
+    }
+
+
+def tipsify(indices, vertex_count, cache_size=DEFAULT_CACHE_SIZE):
+    """Reorder triangles for post-transform cache locality.
+
+    Args:
+        indices (numpy.ndarray): Triangle list indices.
+        vertex_count (int): Number of vertices.
+        cache_size (int): Target cache size.
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray): Triangle order and the start of
+            each cluster (where the fan had to jump elsewhere), for use with
+            overdraw sorting.
+    """
+    triangles = numpy.asarray(indices, dtype=numpy.int64).reshape((-1, 3))
+    triangle_count = len(triangles)
+    offsets, adjacency = _vertex_triangle_adjacency(triangles, vertex_count)
+
+    offsets = offsets.tolist()
+    adjacency = adjacency.tolist()
+    triangle_list = triangles.tolist()
+    live = numpy.diff(offsets).tolist()
+    cache_time = [0] * vertex_count
+    emitted = [False] * triangle_count
+    dead_end = []
+
+    order = []
+    cluster_starts = [0]
+    time_stamp = cache_size + 1
+    cursor = 0
+    fanning = 0 if vertex_count else -1
+
+    while fanning >= 0:
+        candidates = []
+        for triangle in adjacency[offsets[fanning]:offsets[fanning + 1]]:
+            if emitted[triangle]:
+                continue
+            emitted[triangle] = True
+            order.append(triangle)
+            for vertex in triangle_list[triangle]:
+                dead_end.append(vertex)
+                candidates.append(vertex)
+                live[vertex] -= 1
+                if time_stamp - cache_time[vertex] > cache_size:
+                    cache_time[vertex] = time_stamp
+                    time_stamp += 1
+
+        # Pick the candidate which will still be in the cache
+        # once all its triangles are emitted, preferring the oldest
+        fanning = -1
+        best = -1
+        for vertex in candidates:
+            if live[vertex] > 0:
+                priority = 0
+                age = time_stamp - cache_time[vertex]
+                if age + 2 * live[vertex] <= cache_size:
+                    priority = age
+                if priority > best:
+                    best = priority
+                    fanning = vertex
+
+        if fanning == -1:
+            # Dead end, try recently used vertices then walk the rest
+            while dead_end:
+                vertex = dead_end.pop()
+                if live[vertex] > 0:
+                    fanning = vertex
+                    break
+            else:
+                while cursor < vertex_count:
+                    if live[cursor] > 0:
+                        fanning = cursor
+                        break
+                    cursor += 1
+            if fanning >= 0 and len(order) < triangle_count:
+                cluster_starts.append(len(order))
+
+    return (
+        numpy.array(order, dtype=numpy.int64),
+        numpy.array(cluster_starts, dtype=numpy.int64)
+    )
+
+
+def sort_clusters_for_overdraw(triangles, positions, cluster_starts):
+    """Order clusters so outward facing ones, which are likely to occlude
+    others, draw first (Tipsify's view independent overdraw sort).
+
+    Args:
+        triangles (numpy.ndarray): (N, 3) vertex indices, in cluster order.
+        positions (numpy.ndarray): (V, 3) vertex positions.
+        cluster_starts (numpy.ndarray): First triangle of each cluster.
+
+    Returns:
+        numpy.ndarray: Triangle order.
+    """
+    triangle_count = len(triangles)
+    if len(cluster_starts) <= 1:
+        return numpy.arange(triangle_count)
+
+    p0 = positions[triangles[:, 0]]
+    p1 = positions[triangles[:, 1]]
+    p2 = positions[triangles[:, 2]]
+    # Area weighted normals and centroids
+    normals = numpy.cross(p1 - p0, p2 - p0)
+    areas = numpy.linalg.norm(normals, axis=1)
+    centroids = (p0 + p1 + p2) / 3.0
+
+    mesh_centroid = (
+        (centroids * areas[:, None]).sum(axis=0)
+        / max(areas.sum(), 1e-20)
+    )
+
+    cluster_ids = numpy.repeat(
+        numpy.arange(len(cluster_starts)),
+        numpy.diff(numpy.append(cluster_starts, triangle_count))
+    )
+    cluster_normal = numpy.zeros((len(cluster_starts), 3))
+    cluster_centroid = numpy.zeros((len(cluster_starts), 3))
+    cluster_area = numpy.bincount(cluster_ids, weights=areas, minlength=len(cluster_starts))
+    for axis in range(3):
+        cluster_normal[:, axis] = numpy.bincount(
+            cluster_ids,
+            weights=normals[:, axis],
+            minlength=len(cluster_starts)
+        )
+        cluster_centroid[:, axis] = numpy.bincount(
+            cluster_ids,
+            weights=centroids[:, axis] * areas,
+            minlength=len(cluster_starts)
+        )
+    cluster_centroid /= numpy.maximum(cluster_area, 1e-20)[:, None]
+    cluster_normal /= numpy.maximum(
+        numpy.linalg.norm(cluster_normal, axis=1),
+        1e-20
+    )[:, None]
+
+    metric = ((cluster_centroid - mesh_centroid) * cluster_normal).sum(axis=1)
+    cluster_order = numpy.argsort(-metric, kind="stable")
+    return numpy.argsort(
+        numpy.argsort(cluster_order)[cluster_ids],
+        kind="stable"
+    )
+
+
+def reorder_vertex_fetch(indices, vertices, vertex_float_count):
+    """Renumber vertices in the order they're first used.
+
+    Args:
+        indices (numpy.ndarray): Triangle list indices.
+        vertices (numpy.ndarray): Flattened float32 vertices.
+        vertex_float_count (int): Floats per vertex.
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray): New indices and vertices.
+    """
+    indices = numpy.asarray(indices).ravel()
+    vertices = numpy.asarray(vertices).reshape((-1, vertex_float_count))
+    used, first_use = numpy.unique(indices, return_index=True)
+    new_order = used[numpy.argsort(first_use, kind="stable")]
+    remap = numpy.zeros(len(vertices), dtype=numpy.uint32)
+    remap[new_order] = numpy.arange(len(new_order), dtype=numpy.uint32)
+    return remap[indices], vertices[new_order].ravel()
+
+
+def optimize_mesh(indices, vertices, vertex_float_count, cache_size=DEFAULT_CACHE_SIZE, position_offset=0):
+    """Optimize an indexed triangle mesh for vertex cache, overdraw
+    and vertex fetch.
+
+    Args:
+        indices (numpy.ndarray): Triangle list indices.
+        vertices (numpy.ndarray): Flattened float32 vertices.
+        vertex_float_count (int): Floats per vertex.
+        cache_size (int): Target post-transform cache size.
+        position_offset (int or None): Float offset of the position in each
+            vertex, None to skip overdraw sorting.
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray, dict): Indices, vertices and
+            stats with the ACMR / ATVR before and after.
+    """
+    indices = numpy.asarray(indices, dtype=numpy.uint32).ravel()
+    vertices = numpy.asarray(vertices, dtype=numpy.float32).ravel()
+    vertex_count = len(vertices) // vertex_float_count
+    triangles = indices.reshape((-1, 3))
+
+    before = simulate_vertex_cache(indices, cache_size)
+
+    order, cluster_starts = tipsify(indices, vertex_count, cache_size)
+    triangles = triangles[order]
+
+    if position_offset is not None:
+        positions = vertices.reshape((-1, vertex_float_count))[
+            :, position_offset:position_offset + 3
+        ].astype(numpy.float64)
+        triangles = triangles[
+            sort_clusters_for_overdraw(triangles, positions, cluster_starts)
+        ]
+
+    indices, vertices = reorder_vertex_fetch(
+        triangles.ravel(),
+        vertices,
+        vertex_float_count
+    )
+
+    after = simulate_vertex_cache(indices, cache_size)
+
+    stats = {
+        "triangles": len(triangles),
+        "clusters": len(cluster_starts),
+        "cache_size": cache_size,
+        "acmr_before": before["acmr"],
+        "atvr_before": before["atvr"],
+        "acmr_after": after["acmr"],
+        "atvr_after": after["atvr"],
+    }
+    return indices, vertices, stats
@@ -1,5 +1,12 @@
-import tkinter
-_ROOT = tkinter.Tk()
-_ROOT.withdraw()
+_ROOT = None
 
-from tkinter.messagebox import askyesno
+
+def askyesno(title, message):
+    # Creating the Tk root is deferred so importing viewport doesn't need a display
+    global _ROOT
+    import tkinter
+    import tkinter.messagebox
+    if _ROOT is None:
+        _ROOT = tkinter.Tk()
+        _ROOT.withdraw()
+    return tkinter.messagebox.askyesno(title, message)
@@ -0,0 +1,250 @@
+import numpy
+
+
+# Attribute name => (obj prefix, float count)
+_OBJ_ATTRIBUTES = {
+    "P": (b"v", 3),
+    "UV": (b"vt", 2),
+    "N": (b"vn", 3),
+}
+
+# Which column of a face corner (v/vt/vn) each attribute indexes
+_OBJ_ATTRIBUTE_CORNER = {
+    "P": 0,
+    "UV": 1,
+    "N": 2,
+}
+
+
+# Face corner layout code (slash count * 2 + has "//") => v/vt/vn columns
+# v = 0, v/vt = 2, v/vt/vn = 4, v//vn = 5, -1 marks an invalid layout
+_FACE_LAYOUT_COLUMNS = numpy.array((
+    (0, -1, -1),
+    (-1, -1, -1),
+    (0, 1, -1),
+    (-1, -1, -1),
+    (0, 1, 2),
+    (0, 2, -1),
+), dtype=numpy.int64)
+_FACE_LAYOUT_SIZES = (_FACE_LAYOUT_COLUMNS >= 0).sum(axis=1)
+
+_WHITESPACE = numpy.zeros(256, dtype=bool)
+_WHITESPACE[[ord(" "), ord("\t"), ord("\r"), ord("\n"), 0]] = True
+
+
+def _parse_floats(lines, count):
+    """Parse the first `count` floats following the prefix of each line.
+
+    Args:
+        lines (list[bytes]): Lines without their prefix.
+        count (int): Floats per line.
+
+    Returns:
+        numpy.ndarray: (len(lines), count) float32 array.
+    """
+    if not lines:
+        return numpy.zeros((0, count), dtype=numpy.float32)
+    data = numpy.fromstring(b" ".join(lines), dtype=numpy.float32, sep=" ")
+    if data.size == len(lines) * count:
+        return data.reshape((-1, count))
+    # Some lines have extra data (w, vertex colours etc), take the slow path
+    return numpy.array(
+        [line.split()[:count] for line in lines],
+        dtype=numpy.float32
+    )
+
+
+def _parse_faces(face_lines, counts):
+    """Parse face lines into triangulated corner indices.
+
+    Args:
+        face_lines (list[bytes]): Face lines without their prefix.
+        counts (numpy.ndarray): (len(face_lines), 3) number of v, vt and vn
+            entries read before each face, for resolving negative indices.
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray): (triangle count * 3, 3) zero based
+            v/vt/vn indices (-1 where a face doesn't reference an attribute)
+            and the face each triangle came from.
+    """
+    text = b"\n".join(face_lines)
+    chars = numpy.frombuffer(text, dtype=numpy.uint8)
+
+    # Tokenize the whole lot in one go, a token starts wherever
+    # whitespace is followed by anything else
+    separators = _WHITESPACE[chars]
+    token_starts = ~separators
+    token_starts[1:] &= separators[:-1]
+    byte_faces = numpy.cumsum(chars == ord("\n"), dtype=numpy.int32)
+    face_sizes = numpy.bincount(
+        byte_faces[token_starts],
+        minlength=len(face_lines)
+    ).astype(numpy.int64)
+
+    token_count = int(face_sizes.sum())
+    byte_tokens = numpy.cumsum(token_starts, dtype=numpy.int32) - 1
+    slashes = chars == ord("/")
+    double_slashes = numpy.zeros_like(slashes)
+    double_slashes[:-1] = slashes[:-1] & slashes[1:]
+    layouts = (
+        numpy.bincount(byte_tokens[slashes], minlength=token_count) * 2
+        + (numpy.bincount(byte_tokens[double_slashes], minlength=token_count) > 0)
+    )
+    if (layouts >= len(_FACE_LAYOUT_COLUMNS)).any():
+        raise RuntimeError("Unsupported OBJ face layout")
+    value_counts = _FACE_LAYOUT_SIZES[layouts]
+    if (value_counts == 0).any():
+        raise RuntimeError("Unsupported OBJ face layout")
+
+    values = numpy.fromstring(
+        text.replace(b"/", b" "),
+        dtype=numpy.int64,
+        sep=" "
+    )
+    if values.size != value_counts.sum():
+        raise RuntimeError("Failed to parse OBJ faces")
+
+    # Scatter each value into its v/vt/vn column
+    value_tokens = numpy.repeat(numpy.arange(token_count), value_counts)
+    value_slots = (
+        numpy.arange(values.size)
+        - numpy.repeat(numpy.cumsum(value_counts) - value_counts, value_counts)
+    )
+    corners = numpy.zeros((token_count, 3), dtype=numpy.int64)
+    corners[
+        value_tokens,
+        _FACE_LAYOUT_COLUMNS[layouts[value_tokens], value_slots]
+    ] = values
+
+    # Resolve negative (relative) and one-based indices
+    corner_counts = numpy.repeat(counts, face_sizes, axis=0)
+    corners = numpy.where(
+        corners < 0,
+        corner_counts + corners,
+        corners - 1
+    )
+
+    # Fan triangulate (0, i, i+1)
+    triangle_counts = numpy.maximum(face_sizes - 2, 0)
+    face_starts = numpy.cumsum(face_sizes) - face_sizes
+    triangle_face = numpy.repeat(
+        numpy.arange(len(face_sizes)),
+        triangle_counts
+    )
+    triangle_local = (
+        numpy.arange(triangle_face.size)
+        - numpy.repeat(numpy.cumsum(triangle_counts) - triangle_counts, triangle_counts)
+        + 1
+    )
+    first = face_starts[triangle_face]
+    triangle_corners = numpy.column_stack((
+        first,
+        first + triangle_local,
+        first + triangle_local + 1
+    )).ravel()
+    return corners[triangle_corners], triangle_face
+
+
+def _unique_rows(rows):
+    """Deduplicate rows of a 2D array.
+
+    Args:
+        rows (numpy.ndarray): 2D contiguous array.
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray): Index of the first instance of
+            each unique row and the inverse mapping.
+    """
+    rows = numpy.ascontiguousarray(rows)
+    packed = rows.view(
+        numpy.dtype((numpy.void, rows.dtype.itemsize * rows.shape[1]))
+    ).ravel()
+    _, first, inverse = numpy.unique(
+        packed,
+        return_index=True,
+        return_inverse=True
+    )
+    return first, inverse.ravel()
+
+
+def read_obj(obj_filepath, attrs):
+    """Read an OBJ into indexed vertex arrays, one per object.
+
+    Args:
+        obj_filepath (str): Obj file to read.
+        attrs (iterable[str]): Attribute names to read ("P", "UV", "N").
+
+    Returns:
+        list[tuple(numpy.ndarray, numpy.ndarray)]: uint32 indices and
+            flattened float32 vertices per object.
+    """
+    attrs = tuple(attrs)
+    with open(obj_filepath, "rb") as in_fp:
+        lines = [line.lstrip() for line in in_fp.read().splitlines()]
+
+    # Classify every line from its first few characters
+    heads = numpy.array(
+        [line[:3] for line in lines],
+        dtype="S3"
+    ).view(numpy.uint8).reshape((-1, 3))
+    c0 = heads[:, 0]
+    c1 = heads[:, 1]
+    ws1 = _WHITESPACE[c1]
+    ws2 = _WHITESPACE[heads[:, 2]]
+    line_kinds = {
+        b"v": (c0 == ord("v")) & ws1,
+        b"vt": (c0 == ord("v")) & (c1 == ord("t")) & ws2,
+        b"vn": (c0 == ord("v")) & (c1 == ord("n")) & ws2,
+    }
+    is_face = (c0 == ord("f")) & ws1
+    is_object = (c0 == ord("o")) & ws1
+
+    attribute_data = {}
+    for name, (prefix, count) in _OBJ_ATTRIBUTES.items():
+        attribute_data[name] = _parse_floats(
+            [lines[idx][len(prefix):] for idx in numpy.nonzero(line_kinds[prefix])[0]],
+            count
+        )
+
+    face_indices = numpy.nonzero(is_face)[0]
+    # Number of each attribute read before each face
+    face_counts = numpy.column_stack([
+        numpy.cumsum(line_kinds[prefix])[face_indices]
+        for prefix in (b"v", b"vt", b"vn")
+    ])
+    face_objects = numpy.cumsum(is_object)[face_indices]
+
+    corners, triangle_face = _parse_faces(
+        [lines[idx][1:] for idx in face_indices],
+        face_counts
+    )
+    corner_objects = numpy.repeat(face_objects[triangle_face], 3)
+
+    columns = [_OBJ_ATTRIBUTE_CORNER[attr] for attr in attrs]
+
+    mesh_data = []
+    for mesh_object in numpy.unique(corner_objects):
+        mesh_corners = corners[corner_objects == mesh_object][:, columns]
+        for column, attr in enumerate(attrs):
+            if (mesh_corners[:, column] < 0).any():
+                raise RuntimeError(
+                    "Missing attribute on mesh: {0}".format(attr)
+                )
+
+        # Cheap pass on the integer indices first, then merge any
+        # duplicate values referenced by different indices
+        first, corner_inverse = _unique_rows(mesh_corners)
+        unique_corners = mesh_corners[first]
+        vertex_data = numpy.column_stack([
+            attribute_data[attr][unique_corners[:, column]]
+            for column, attr in enumerate(attrs)
+        ])
+        # Make -0.0 and 0.0 compare the same
+        vertex_data += numpy.float32(0.0)
+        first, vertex_inverse = _unique_rows(vertex_data)
+
+        vertices = vertex_data[first].astype(numpy.float32).ravel()
+        indices = vertex_inverse[corner_inverse].astype(numpy.uint32)
+        mesh_data.append((indices, vertices))
+
+    return mesh_data
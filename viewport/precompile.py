@@ -0,0 +1,100 @@
+"""Precompile every shader program a script registers.
+
+Usage:
+    python -m viewport.precompile ssao.py sscrv.py --workers 8
+
+Scripts are imported (not run as __main__), so any programs created via
+make_permutation_program at import time get compiled, which warms the
+on-disk shader cache for the next real run.
+"""
+import argparse
+import json
+import os
+import runpy
+import sys
+import time
+
+from . import shader_loader
+from .shader_cache import get_shader_cache_stats
+
+
+def load_script(script_path):
+    """Import a script so its programs get registered.
+
+    Args:
+        script_path (str): Python file path.
+    """
+    script_path = os.path.abspath(script_path)
+    script_dir = os.path.dirname(script_path)
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+    runpy.run_path(script_path, run_name="__glref_precompile__")
+
+
+def main(script_paths, workers=None, permutations=None, sort_by_time=False):
+    for script_path in script_paths:
+        load_script(script_path)
+
+    if permutations:
+        for program in shader_loader._PERMUTATION_PROGRAMS:
+            program.declare_permutations(*permutations)
+
+    start = time.perf_counter()
+    timings = shader_loader.precompile_all(workers=workers)
+    elapsed = time.perf_counter() - start
+
+    if sort_by_time:
+        timings.sort(key=lambda timing: timing.seconds, reverse=True)
+
+    for timing in timings:
+        print("{0:8.3f}s  {1}  {2}".format(
+            timing.seconds,
+            timing.filepath,
+            "" if timing.permutation is None else json.dumps(timing.permutation)
+        ))
+
+    total = sum(timing.seconds for timing in timings)
+    print(
+        "Compiled {0} shaders in {1:.3f}s wall time "
+        "({2:.3f}s summed compile time)".format(len(timings), elapsed, total)
+    )
+    stats = get_shader_cache_stats()
+    if stats is not None:
+        print("Main process cache: {0}".format(stats))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "scripts",
+        nargs="+",
+        help="Scripts whose shader programs should be compiled."
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: cpu count)."
+    )
+    parser.add_argument(
+        "-p",
+        "--permutation",
+        action="append",
+        default=[],
+        help="JSON dict of macros to compile every program with, "
+             "can be given multiple times."
+    )
+    parser.add_argument(
+        "--sort",
+        action="store_true",
+        help="Sort the timings, slowest first."
+    )
+
+    args = parser.parse_args()
+    main(
+        args.scripts,
+        args.workers,
+        [json.loads(permutation) for permutation in args.permutation],
+        args.sort
+    )
@@ -0,0 +1,329 @@
+import distutils.spawn
+import hashlib
+import os
+import struct
+import subprocess
+import threading
+import time
+
+from .glsl_preprocessor import get_include_dependencies
+
+
+_GLSLC_EXEC = distutils.spawn.find_executable("glslc")
+_SPIRV_CROSS_EXEC = distutils.spawn.find_executable("spirv-cross")
+
+# Entry layout: <compile seconds : float64><payload>
+_ENTRY_HEADER = struct.Struct("<d")
+
+# Bump if anything about the cached output changes
+_CACHE_VERSION = 1
+
+_DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "glref", "shaders"
+)
+_DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_TOOL_VERSIONS = None
+_SHADER_CACHE = None
+
+
+def _get_tool_versions():
+    """Get a string describing the versions of glslc and spirv-cross.
+
+    Returns:
+        str: Tool version string.
+    """
+    global _TOOL_VERSIONS
+    if _TOOL_VERSIONS is None:
+        versions = []
+        for exec_path, args in (
+                (_GLSLC_EXEC, ["--version"]),
+                (_SPIRV_CROSS_EXEC, ["--revision"])):
+            if not exec_path:
+                versions.append("none")
+                continue
+            try:
+                proc = subprocess.Popen(
+                    [exec_path] + args,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    close_fds=True
+                )
+                stdout, _ = proc.communicate()
+                versions.append(stdout.decode("latin-1").strip())
+            except OSError:
+                versions.append("unknown")
+        _TOOL_VERSIONS = "\n".join(versions)
+    return _TOOL_VERSIONS
+
+
+def find_shader_dependencies(filepath):
+    """Find a shader file and every file it transitively #includes.
+
+    Args:
+        filepath (str): Shader file path.
+
+    Returns:
+        list[str]: Absolute file paths, starting with `filepath`.
+    """
+    return get_include_dependencies(filepath)
+
+
+def make_shader_cache_key(kind, filepath, macros=None):
+    """Generate a content addressed key for a shader compile.
+
+    Args:
+        kind (str): What sort of output is being cached (e.g "spirv").
+        filepath (str): Shader file path.
+        macros (dict): Macros passed to the compiler.
+
+    Returns:
+        str: Hex digest.
+    """
+    hasher = hashlib.sha256()
+    hasher.update("{0}\n{1}\n{2}\n".format(
+        _CACHE_VERSION,
+        kind,
+        _get_tool_versions()
+    ).encode("utf-8"))
+
+    for dep in find_shader_dependencies(filepath):
+        hasher.update(dep.encode("utf-8"))
+        hasher.update(b"\0")
+        try:
+            with open(dep, "rb") as in_fp:
+                hasher.update(in_fp.read())
+        except (IOError, OSError):
+            hasher.update(b"<missing>")
+        hasher.update(b"\0")
+
+    if macros:
+        for key, value in sorted(macros.items()):
+            hasher.update("-D{0}={1}\0".format(key, value).encode("utf-8"))
+
+    return hasher.hexdigest()
+
+
+class ShaderCacheStats(object):
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.compile_time = 0.0
+        self.time_saved = 0.0
+
+    def as_dict(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "compile_time": self.compile_time,
+            "time_saved": self.time_saved,
+        }
+
+    def __repr__(self):
+        return (
+            "ShaderCacheStats(hits={0}, misses={1}, evictions={2}, "
+            "compile_time={3:.3f}s, time_saved={4:.3f}s)"
+        ).format(
+            self.hits,
+            self.misses,
+            self.evictions,
+            self.compile_time,
+            self.time_saved
+        )
+
+
+class ShaderCache(object):
+
+    def __init__(self, cache_dir=None, max_bytes=_DEFAULT_MAX_BYTES):
+        """Initializer.
+
+        Args:
+            cache_dir (str): Directory to store entries in.
+            max_bytes (int): Size the cache is trimmed to, least recently
+                used entries are evicted first.
+        """
+        self.cache_dir = cache_dir or _DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.stats = ShaderCacheStats()
+        self._lock = threading.Lock()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key):
+        """Get a cached entry.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            tuple(bytes, float) or None: Payload and the time it originally
+                took to compile.
+        """
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as in_fp:
+                data = in_fp.read()
+        except (IOError, OSError):
+            return None
+        if len(data) < _ENTRY_HEADER.size:
+            return None
+        compile_time, = _ENTRY_HEADER.unpack_from(data)
+
+        # Mark as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return data[_ENTRY_HEADER.size:], compile_time
+
+    def put(self, key, payload, compile_time):
+        """Store an entry, evicting old entries if needed.
+
+        Args:
+            key (str): Cache key.
+            payload (bytes): Data to store.
+            compile_time (float): Time taken to generate the payload.
+        """
+        path = self._entry_path(key)
+        tmp_path = "{0}.{1}.{2}.tmp".format(
+            path,
+            os.getpid(),
+            threading.get_ident()
+        )
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as out_fp:
+                out_fp.write(_ENTRY_HEADER.pack(compile_time))
+                out_fp.write(payload)
+            os.replace(tmp_path, path)
+        except (IOError, OSError):
+            # A read-only or full cache shouldn't stop us rendering
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        self.trim()
+
+    def trim(self, max_bytes=None):
+        """Evict least recently used entries until the cache fits.
+
+        Args:
+            max_bytes (int): Size to trim to (Default: self.max_bytes).
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        entries = []
+        total = 0
+        for root, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        if total <= max_bytes:
+            return
+
+        entries.sort()
+        with self._lock:
+            for _, size, path in entries:
+                if total <= max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                except OSError:
+                    continue
+                total -= size
+                self.stats.evictions += 1
+
+    def clear(self):
+        """Remove every entry."""
+        self.trim(0)
+
+    def fetch(self, kind, filepath, macros, compile_func):
+        """Get a compiled shader from the cache, or compile and store it.
+
+        Args:
+            kind (str): What sort of output is being cached.
+            filepath (str): Shader file path.
+            macros (dict): Macros passed to the compiler.
+            compile_func (callable): Called with no arguments on a miss,
+                must return bytes.
+
+        Returns:
+            bytes: Compiled result.
+        """
+        start = time.perf_counter()
+        key = make_shader_cache_key(kind, filepath, macros)
+        cached = self.get(key)
+        if cached is not None:
+            payload, compile_time = cached
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stats.hits += 1
+                self.stats.time_saved += max(0.0, compile_time - elapsed)
+            return payload
+
+        compile_start = time.perf_counter()
+        payload = compile_func()
+        compile_time = time.perf_counter() - compile_start
+        with self._lock:
+            self.stats.misses += 1
+            self.stats.compile_time += compile_time
+        self.put(key, payload, compile_time)
+        return payload
+
+
+def get_shader_cache():
+    """Get the global shader cache.
+
+    The location and size can be controlled via the environment
+    variables GLREF_SHADER_CACHE_DIR and GLREF_SHADER_CACHE_MAX_MB,
+    setting GLREF_SHADER_CACHE_DIR to an empty string disables it.
+
+    Returns:
+        ShaderCache or None: Shader cache.
+    """
+    global _SHADER_CACHE
+    if _SHADER_CACHE is None:
+        cache_dir = os.environ.get("GLREF_SHADER_CACHE_DIR", _DEFAULT_CACHE_DIR)
+        if not cache_dir:
+            return None
+        max_bytes = int(float(os.environ.get(
+            "GLREF_SHADER_CACHE_MAX_MB",
+            _DEFAULT_MAX_BYTES / (1024 * 1024)
+        )) * 1024 * 1024)
+        _SHADER_CACHE = ShaderCache(cache_dir, max_bytes)
+    return _SHADER_CACHE
+
+
+def set_shader_cache(cache):
+    """Replace the global shader cache.
+
+    Args:
+        cache (ShaderCache or None): New cache, None to reset to the default.
+    """
+    global _SHADER_CACHE
+    _SHADER_CACHE = cache
+
+
+def get_shader_cache_stats():
+    """Get hit / miss / time saved stats for the global shader cache.
+
+    Returns:
+        ShaderCacheStats or None: Stats.
+    """
+    cache = get_shader_cache()
+    if cache is None:
+        return None
+    return cache.stats
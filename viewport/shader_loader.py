@@ -5,10 +5,19 @@ import subprocess
 import re
 import os
 import tempfile
+import threading
+import time
+import concurrent.futures
 
 
 from .program import generate_shader_program
 from .message_box import askyesno
+from .shader_cache import get_shader_cache
+from .glsl_preprocessor import (
+    preprocess_shader_source,
+    get_include_dependencies,
+    DEFAULT_INCLUDE_DIRS
+)
 
 
 _GLSLC_EXEC = distutils.spawn.find_executable("glslc")
@@ -16,11 +25,16 @@ _SPIRV_CROSS_EXEC = distutils.spawn.find_executable("spirv-cross")
 
 _PERMUTATION_PROGRAMS = []
 
+# Worker processes can't sensibly pop up a retry dialog
+_ALLOW_RETRY_PROMPT = True
+
 
 class _PermutationProgram(object):
 
-    def __init__(self, debugging, spirv, **shader_type_filepaths):
+    def __init__(self, debugging, spirv, permutations=None, **shader_type_filepaths):
         self._shader_type_filepaths = shader_type_filepaths
+        self._declared_permutations = []
+        self._precompiled = {}
         self._spirv = False
         if debugging:
             self._compile = load_shader_source
@@ -31,22 +45,119 @@ class _PermutationProgram(object):
             self._compile = optimize_shader_roundtrip
         self._permutations = {}
         self._one = None
+        if permutations:
+            self.declare_permutations(*permutations)
         _PERMUTATION_PROGRAMS.append(self)
 
+    def __repr__(self):
+        return "_PermutationProgram({0})".format(
+            ", ".join(
+                os.path.basename(filepath)
+                for filepath in self._shader_type_filepaths.values()
+            )
+        )
+
+    def declare_permutations(self, *permutations):
+        """Declare permutations which will be used, so they can be
+        precompiled via precompile_all.
+
+        Args:
+            permutations (dict): Macro values as passed to get(...).
+        """
+        for permutation in permutations:
+            if permutation not in self._declared_permutations:
+                self._declared_permutations.append(dict(permutation))
+
     def clear(self):
         if self._one:
             glDeleteProgram(self._one)
         for v in self._permutations.values():
             glDeleteProgram(v)
         self._permutations = {}
+        self._precompiled = {}
         self._one = None
 
+    def _compile_jobs(self, permutations):
+        """Generate the (key, shader_type, compile, filepath, macros) needed
+        to build each permutation, skipping anything already built.
+
+        Args:
+            permutations (list[dict] or None): Permutations, None meaning
+                the result of one().
+        """
+        for permutation in permutations:
+            if permutation is None:
+                key = None
+                if self._one is not None:
+                    continue
+                macros = ()
+            else:
+                key = tuple(sorted(permutation.items()))
+                if key in self._permutations:
+                    continue
+                macros = (permutation,)
+            for shader_type, filepath in self._shader_type_filepaths.items():
+                yield key, shader_type, self._compile, filepath, macros
+
+    def _sources(self, key):
+        precompiled = self._precompiled.pop(key, None)
+        if precompiled is not None:
+            return precompiled
+        return self._compile_sources(key)
+
+    def _built_keys(self):
+        """Keys of every permutation which has been built, None being one().
+
+        Called from the shader watcher thread while get() may be adding
+        permutations, copy() snapshots the dict without iterating it.
+        """
+        keys = list(self._permutations.copy())
+        if self._one is not None:
+            keys.insert(0, None)
+        return keys
+
+    def _dependencies(self):
+        """Every file this program depends upon, including #includes."""
+        dependencies = set()
+        for filepath in self._shader_type_filepaths.values():
+            dependencies.update(get_include_dependencies(filepath))
+        return dependencies
+
+    def _compile_sources(self, key):
+        macros = () if key is None else (dict(key),)
+        return {
+            shader_type: self._compile(filepath, *macros)
+            for shader_type, filepath in self._shader_type_filepaths.items()
+        }
+
+    def _swap(self, key, sources):
+        """Link new sources and replace an existing permutation, keeping
+        the old program if linking fails.
+        """
+        program = generate_shader_program(spirv=self._spirv, **sources)
+        if key is None:
+            old = self._one
+            self._one = program
+        else:
+            old = self._permutations.get(key)
+            self._permutations[key] = program
+        if old:
+            glDeleteProgram(old)
+        return program
+
+    def link_precompiled(self):
+        """Link any precompiled sources, must be called on the thread
+        owning the GL context.
+        """
+        for key in list(self._precompiled):
+            if key is None:
+                self.one()
+            else:
+                self.get(**dict(key))
+
     def one(self):
         if self._one is None:
-            kwargs = {
-                shader_type: self._compile(filepath)
-                for shader_type, filepath in self._shader_type_filepaths.items()
-            }
+            kwargs = self._sources(None)
             self._one = generate_shader_program(
                 spirv=self._spirv,
                 **kwargs
@@ -56,10 +167,7 @@ class _PermutationProgram(object):
     def get(self, **permutations):
         key = tuple(sorted(permutations.items()))
         if key not in self._permutations:
-            kwargs = {
-                shader_type: self._compile(filepath, permutations)
-                for shader_type, filepath in self._shader_type_filepaths.items()
-            }
+            kwargs = self._sources(key)
             self._permutations[key] = generate_shader_program(
                 spirv=self._spirv,
                 **kwargs
@@ -76,6 +184,8 @@ def spirv_compile(filepath, out_path, macros):
         filepath,
         "-o", out_path
     ]
+    for include_dir in DEFAULT_INCLUDE_DIRS:
+        command.append("-I{0}".format(include_dir))
     if macros:
         for key, value in macros.items():
             command.append("-D{0}={1}".format(key, value))
@@ -106,7 +216,11 @@ def spirv_compile(filepath, out_path, macros):
             message = "{0}\n\nRetry?".format(message)
 
             print(message)
-            retry = askyesno("Shader compiling failed", message)
+            retry = (
+                _ALLOW_RETRY_PROMPT
+                and threading.current_thread() is threading.main_thread()
+                and askyesno("Shader compiling failed", message)
+            )
 
             if not retry:
                 raise RuntimeError(
@@ -116,8 +230,24 @@ def spirv_compile(filepath, out_path, macros):
             break
 
 
+def _cached_compile(kind, filepath, macros, compile_func):
+    cache = get_shader_cache()
+    if cache is None:
+        return compile_func()
+    return cache.fetch(kind, filepath, macros, compile_func)
+
+
 def load_spirv_compiled(filepath, macros=None):
     """Compile directly into spirv words"""
+    return _cached_compile(
+        "spirv",
+        filepath,
+        macros,
+        lambda: _load_spirv_compiled(filepath, macros)
+    )
+
+
+def _load_spirv_compiled(filepath, macros):
     if not _GLSLC_EXEC:
         raise RuntimeError(
             "In order to use macros and includes glslc "
@@ -137,6 +267,15 @@ def optimize_shader_roundtrip(filepath, macros=None):
     """Similar to load_shader_source, except it uses glslc to optimize the input GLSL
     and then uses spriv-cross to spit out a optimized version.
     """
+    return _cached_compile(
+        "roundtrip",
+        filepath,
+        macros,
+        lambda: _optimize_shader_roundtrip(filepath, macros).encode("latin-1")
+    ).decode("latin-1")
+
+
+def _optimize_shader_roundtrip(filepath, macros):
     if not _GLSLC_EXEC:
         raise RuntimeError(
             "In order to use macros and includes glslc "
@@ -174,49 +313,131 @@ def optimize_shader_roundtrip(filepath, macros=None):
 
 
 def load_shader_source(filepath, macros=None):
-    # Avoid recquiring glslc if possible
+    """Load a shader, resolving includes and injecting macros in process
+    rather than via glslc -E.
+    """
+    # Avoid doing any work if possible
     if not macros:
         with open(filepath, "r") as in_fp:
             data = in_fp.read()
             if "#include" not in data:
                 return data
 
-    if not _GLSLC_EXEC:
-        raise RuntimeError(
-            "In order to use macros and includes glslc "
-            "is needed (install the VulkanSDK)."
-        )
-    command = [
-        _GLSLC_EXEC,
-        "--target-env=opengl4.5",
-        "-E",
-        filepath,
-        "-o", "-"
-    ]
-    if macros:
-        for key, value in macros.items():
-            command.append("-D{0}={1}".format(key, value))
+    return preprocess_shader_source(filepath, macros)
 
-    result = subprocess.Popen(
-        command,
-        stdout=subprocess.PIPE,
-        close_fds=True
-    ).stdout.read().decode("latin-1")
 
-    # Unwanted addon
-    result = result.replace("#extension GL_GOOGLE_include_directive : enable", "")
+def make_permutation_program(debugging, spirv=False, permutations=None, **shader_type_filepaths):
+    return _PermutationProgram(debugging, spirv, permutations, **shader_type_filepaths)
 
-    # Fixup up line complaints :(
-    result = re.sub("#line (\d+) .+$", lambda x: "#line {0}".format(x.group(1)), result, flags=re.MULTILINE)
 
-    return result
+def clear_compiled_shaders():
+    for program in _PERMUTATION_PROGRAMS:
+        program.clear()
 
 
-def make_permutation_program(debugging, spirv=False, **shader_type_filepaths):
-    return _PermutationProgram(debugging, spirv, **shader_type_filepaths)
 
+def _init_precompile_worker():
+    global _ALLOW_RETRY_PROMPT
+    _ALLOW_RETRY_PROMPT = False
 
-def clear_compiled_shaders():
+
+def _run_precompile_job(compile_func, filepath, macros):
+    start = time.perf_counter()
+    result = compile_func(filepath, *macros)
+    return result, time.perf_counter() - start
+
+
+class PrecompileTiming(object):
+
+    def __init__(self, program, permutation, shader_type, filepath, seconds):
+        self.program = program
+        self.permutation = permutation
+        self.shader_type = shader_type
+        self.filepath = filepath
+        self.seconds = seconds
+
+    def __repr__(self):
+        return "PrecompileTiming({0}, {1}, {2:.3f}s)".format(
+            self.filepath,
+            self.permutation,
+            self.seconds
+        )
+
+
+def precompile_all(permutations=None, workers=None, include_one=True):
+    """Run the glslc / spirv-cross steps for every registered program in a
+    process pool.
+
+    The compiled sources are held onto by each program and linked on first
+    use (or via link_precompiled), as linking needs to happen on the thread
+    which owns the GL context.
+
+    Args:
+        permutations (dict): Optional {program: [permutation, ...]} which
+            replaces the programs declared permutations.
+        workers (int): Number of worker processes (Default: cpu count).
+        include_one (bool): Also compile the macro-less one() variant.
+
+    Returns:
+        list[PrecompileTiming]: Per shader timings.
+    """
+    jobs = []
     for program in _PERMUTATION_PROGRAMS:
-        program.clear()
+        if permutations is not None and program in permutations:
+            program_permutations = list(permutations[program])
+        else:
+            program_permutations = list(program._declared_permutations)
+        if include_one:
+            program_permutations.insert(0, None)
+        for job in program._compile_jobs(program_permutations):
+            jobs.append((program,) + job)
+
+    timings = []
+    if not jobs:
+        return timings
+
+    results = {}
+    errors = []
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_precompile_worker) as executor:
+        futures = {
+            executor.submit(_run_precompile_job, compile_func, filepath, macros): (
+                program, key, shader_type, filepath
+            )
+            for program, key, shader_type, compile_func, filepath, macros in jobs
+        }
+        for future in concurrent.futures.as_completed(futures):
+            program, key, shader_type, filepath = futures[future]
+            try:
+                source, seconds = future.result()
+            except Exception as e:
+                errors.append("{0}: {1}".format(filepath, e))
+                continue
+            results.setdefault((program, key), {})[shader_type] = source
+            timings.append(PrecompileTiming(
+                program,
+                None if key is None else dict(key),
+                shader_type,
+                filepath,
+                seconds
+            ))
+
+    for (program, key), sources in results.items():
+        if len(sources) == len(program._shader_type_filepaths):
+            program._precompiled[key] = sources
+
+    if errors:
+        raise RuntimeError(
+            "Shader precompiling failed:\n{0}".format("\n".join(errors))
+        )
+
+    return timings
 
+
+def link_precompiled():
+    """Link every precompiled program, must be called on the thread
+    owning the GL context.
+    """
+    for program in _PERMUTATION_PROGRAMS:
+        program.link_precompiled()
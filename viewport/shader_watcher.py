@@ -0,0 +1,218 @@
+import os
+import threading
+import traceback
+
+from . import shader_loader
+
+
+_SHADER_WATCHER = None
+
+
+class ShaderReloadError(object):
+
+    def __init__(self, program, key, message):
+        self.program = program
+        self.key = key
+        self.message = message
+
+    def __repr__(self):
+        return "ShaderReloadError({0}, {1})".format(self.program, self.key)
+
+
+class ShaderWatcher(object):
+
+    def __init__(self, interval=0.25):
+        """Initializer.
+
+        Args:
+            interval (float): Seconds between polling for file changes.
+        """
+        self.interval = interval
+        self.errors = []
+
+        self._stamps = {}
+        self._dependents = {}
+        self._pending = []
+        self._retry = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._rebuild_dependencies()
+        self._thread = threading.Thread(
+            target=self._thread_runner,
+            name="ShaderWatcher",
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _stamp(self, filepath):
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _rebuild_dependencies(self):
+        """Map each file to the programs which depend upon it."""
+        dependents = {}
+        for program in list(shader_loader._PERMUTATION_PROGRAMS):
+            try:
+                dependencies = program._dependencies()
+            except (IOError, OSError):
+                continue
+            for filepath in dependencies:
+                dependents.setdefault(filepath, set()).add(program)
+                if filepath not in self._stamps:
+                    self._stamps[filepath] = self._stamp(filepath)
+        self._dependents = dependents
+
+    def _poll(self):
+        """Find programs whose files have changed since the last poll.
+
+        Returns:
+            set[_PermutationProgram]: Affected programs.
+        """
+        # Programs can be registered after the watcher starts
+        if any(
+                program not in self._known_programs
+                for program in shader_loader._PERMUTATION_PROGRAMS):
+            self._rebuild_dependencies()
+
+        affected = set()
+        changed = False
+        for filepath, programs in list(self._dependents.items()):
+            stamp = self._stamp(filepath)
+            if stamp != self._stamps.get(filepath):
+                self._stamps[filepath] = stamp
+                affected.update(programs)
+                changed = True
+
+        # Includes may have been added or removed
+        if changed:
+            self._rebuild_dependencies()
+        return affected
+
+    @property
+    def _known_programs(self):
+        known = set()
+        for programs in self._dependents.values():
+            known.update(programs)
+        return known
+
+    def _recompile(self, program):
+        """Recompile every built permutation of a program.
+
+        Returns:
+            bool: False if the permutations couldn't be listed, because the
+                render thread was adding one, so it should be retried.
+        """
+        try:
+            keys = program._built_keys()
+        except RuntimeError:
+            return False
+        for key in keys:
+            try:
+                sources = program._compile_sources(key)
+            except Exception:
+                error = ShaderReloadError(program, key, traceback.format_exc())
+                with self._lock:
+                    self._pending.append((program, key, None, error))
+                continue
+            with self._lock:
+                self._pending.append((program, key, sources, None))
+        return True
+
+    def _thread_runner(self):
+        while not self._stop.wait(self.interval):
+            try:
+                affected = self._poll()
+            except Exception:
+                traceback.print_exc()
+                continue
+            affected.update(self._retry)
+            self._retry = set()
+            for program in affected:
+                if self._stop.is_set():
+                    break
+                if not self._recompile(program):
+                    self._retry.add(program)
+
+    def apply_pending(self):
+        """Link and swap in any recompiled programs, this should be called
+        at a frame boundary on the thread which owns the GL context.
+
+        Returns:
+            int: Number of programs swapped.
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = []
+
+        swapped = 0
+        for program, key, sources, error in pending:
+            if error is None:
+                try:
+                    program._swap(key, sources)
+                    swapped += 1
+                    continue
+                except Exception:
+                    error = ShaderReloadError(
+                        program,
+                        key,
+                        traceback.format_exc()
+                    )
+            self.errors.append(error)
+            print("Shader reload failed for {0} {1}:\n{2}".format(
+                error.program,
+                "" if error.key is None else dict(error.key),
+                error.message
+            ))
+        return swapped
+
+
+def start_shader_watcher(interval=0.25):
+    """Start watching shader files for changes, recompiling only the
+    affected permutations in the background.
+
+    Args:
+        interval (float): Seconds between polling for file changes.
+
+    Returns:
+        ShaderWatcher: Watcher.
+    """
+    global _SHADER_WATCHER
+    if _SHADER_WATCHER is None:
+        _SHADER_WATCHER = ShaderWatcher(interval)
+    _SHADER_WATCHER.start()
+    return _SHADER_WATCHER
+
+
+def stop_shader_watcher():
+    global _SHADER_WATCHER
+    if _SHADER_WATCHER is not None:
+        _SHADER_WATCHER.stop()
+        _SHADER_WATCHER = None
+
+
+def apply_shader_reloads():
+    """Swap in any programs recompiled by the watcher, a no-op when the
+    watcher isn't running.
+
+    Returns:
+        int: Number of programs swapped.
+    """
+    if _SHADER_WATCHER is None:
+        return 0
+    return _SHADER_WATCHER.apply_pending()
@@ -1,6 +1,8 @@
 from OpenGL.GLUT import *
 from OpenGL.GL import GL_DEBUG_OUTPUT, glEnable
 
+from .shader_watcher import apply_shader_reloads
+
 
 __all__ = ("Window",)
 
@@ -66,6 +68,8 @@ class Window(object):
 
 
     def _draw(self):
+        # Frame boundary, safe to swap hot-reloaded programs
+        apply_shader_reloads()
         if self.on_draw:
             self.on_draw(self)
             glutSwapBuffers()